@@ -0,0 +1,17 @@
+-- Transactional outbox of the submissions to publish to the MQ (SubmissionDispatch): written in the
+-- same transaction as each new submission and drained by the SubmissionsDispatcher.
+USE rpl_activities;
+
+CREATE TABLE submission_dispatches (
+    id BIGINT NOT NULL AUTO_INCREMENT,
+    submission_id BIGINT NOT NULL,
+    language VARCHAR(255) NOT NULL,
+    dispatched BOOL NOT NULL DEFAULT FALSE,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    date_created DATETIME NOT NULL,
+    date_dispatched DATETIME,
+    PRIMARY KEY (id),
+    FOREIGN KEY(submission_id) REFERENCES activity_submissions (id)
+);
+
+CREATE INDEX ix_submission_dispatches_dispatched ON submission_dispatches (dispatched);
@@ -0,0 +1,19 @@
+-- Progress of the submissions reprocessing jobs (SubmissionsReprocessingJob), shared by every worker.
+-- The unique "running" column (TRUE while running, NULL afterwards) allows a single running job.
+USE rpl_activities;
+
+CREATE TABLE submissions_reprocessing_jobs (
+    id BIGINT NOT NULL AUTO_INCREMENT,
+    status VARCHAR(255) NOT NULL,
+    parameters TEXT NOT NULL,
+    running BOOL,
+    total INTEGER NOT NULL DEFAULT 0,
+    processed INTEGER NOT NULL DEFAULT 0,
+    batches INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    date_created DATETIME NOT NULL,
+    last_updated DATETIME NOT NULL,
+    date_finished DATETIME,
+    PRIMARY KEY (id),
+    UNIQUE (running)
+);
@@ -0,0 +1,7 @@
+-- Submission rplfiles stored as a delta over the activity starting files: they only hold the files that
+-- differ from (i.e. overlay) the ones of their base rplfile. Existing rplfiles are full ones (no base).
+USE rpl_activities;
+
+ALTER TABLE rpl_files
+    ADD COLUMN base_rplfile_id BIGINT,
+    ADD FOREIGN KEY(base_rplfile_id) REFERENCES rpl_files (id);
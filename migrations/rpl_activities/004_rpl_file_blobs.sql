@@ -0,0 +1,33 @@
+-- Content-addressed, deduplicated payloads of the rplfiles (RPLFileBlob). Also used by the full outputs of
+-- IO test runs and the full tests execution logs.
+USE rpl_activities;
+
+CREATE TABLE rpl_file_blobs (
+    id BIGINT NOT NULL AUTO_INCREMENT,
+    sha256 VARCHAR(255) NOT NULL,
+    size BIGINT NOT NULL,
+    storage VARCHAR(255) NOT NULL DEFAULT 'database',
+    -- Only set for blobs stored in the database (storage = 'database')
+    data LONGBLOB,
+    date_created DATETIME NOT NULL,
+    last_referenced DATETIME NOT NULL,
+    PRIMARY KEY (id),
+    UNIQUE (sha256)
+);
+
+ALTER TABLE rpl_files
+    ADD COLUMN blob_id BIGINT,
+    ADD FOREIGN KEY(blob_id) REFERENCES rpl_file_blobs (id);
+
+-- Backfill: the payload of every existing rplfile moves to its (shared) blob, keyed by the sha256 of its
+-- bytes, as RPLFilesRepository does for new ones
+INSERT INTO rpl_file_blobs (sha256, size, storage, data, date_created, last_referenced)
+SELECT SHA2(data, 256), ANY_VALUE(LENGTH(data)), 'database', ANY_VALUE(data), UTC_TIMESTAMP(), UTC_TIMESTAMP()
+FROM rpl_files
+WHERE blob_id IS NULL AND data IS NOT NULL
+GROUP BY SHA2(data, 256);
+
+UPDATE rpl_files
+JOIN rpl_file_blobs ON rpl_file_blobs.sha256 = SHA2(rpl_files.data, 256)
+SET rpl_files.blob_id = rpl_file_blobs.id, rpl_files.data = NULL
+WHERE rpl_files.blob_id IS NULL AND rpl_files.data IS NOT NULL;
@@ -0,0 +1,28 @@
+-- Immutable versions of the IO tests: new IO test runs reference the one they were run against instead of
+-- copying its name, input and expected output. Existing IO tests get theirs with
+-- `python -m rpl_activities.src.scripts.create_io_test_snapshots` (their digest can't be computed in SQL),
+-- and existing runs keep their copied columns.
+USE rpl_activities;
+
+CREATE TABLE io_test_snapshots (
+    id BIGINT NOT NULL AUTO_INCREMENT,
+    sha256 VARCHAR(255) NOT NULL,
+    name VARCHAR(500) NOT NULL,
+    test_in TEXT NOT NULL,
+    test_out TEXT NOT NULL,
+    test_out_sha256 VARCHAR(255) NOT NULL,
+    date_created DATETIME NOT NULL,
+    PRIMARY KEY (id),
+    UNIQUE (sha256)
+);
+
+ALTER TABLE io_tests
+    ADD COLUMN snapshot_id BIGINT,
+    ADD FOREIGN KEY(snapshot_id) REFERENCES io_test_snapshots (id);
+
+ALTER TABLE io_test_runs
+    ADD COLUMN io_test_snapshot_id BIGINT,
+    ADD FOREIGN KEY(io_test_snapshot_id) REFERENCES io_test_snapshots (id),
+    MODIFY test_name VARCHAR(500) NULL,
+    MODIFY test_in TEXT NULL,
+    MODIFY expected_output TEXT NULL;
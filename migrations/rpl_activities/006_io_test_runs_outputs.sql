@@ -0,0 +1,10 @@
+-- IO test runs only keep the output of failed runs (passing ones are the expected output), capped, plus
+-- its full gzipped version in a blob if it didn't fit. Existing runs keep their copied outputs.
+USE rpl_activities;
+
+ALTER TABLE io_test_runs
+    ADD COLUMN passed BOOL,
+    ADD COLUMN run_output_truncated BOOL,
+    ADD COLUMN full_run_output_blob_id BIGINT,
+    ADD FOREIGN KEY(full_run_output_blob_id) REFERENCES rpl_file_blobs (id),
+    MODIFY run_output TEXT NULL;
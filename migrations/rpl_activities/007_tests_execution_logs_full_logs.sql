@@ -0,0 +1,9 @@
+-- Stdout/stderr of tests execution logs are stored capped: the full gzipped versions of truncated ones are
+-- kept in blobs. Existing logs stay as they are.
+USE rpl_activities;
+
+ALTER TABLE tests_execution_logs
+    ADD COLUMN full_stderr_blob_id BIGINT,
+    ADD COLUMN full_stdout_blob_id BIGINT,
+    ADD FOREIGN KEY(full_stderr_blob_id) REFERENCES rpl_file_blobs (id),
+    ADD FOREIGN KEY(full_stdout_blob_id) REFERENCES rpl_file_blobs (id);
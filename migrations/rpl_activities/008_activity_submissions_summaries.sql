@@ -0,0 +1,71 @@
+-- Per (activity, user) counts of submissions by status, kept in sync with every status change, so that
+-- activity listings and stats don't aggregate the submissions. Filled here from the existing submissions
+-- (the same as `python -m rpl_activities.src.scripts.rebuild_submissions_summaries`).
+USE rpl_activities;
+
+CREATE TABLE activity_submissions_summaries (
+    id BIGINT NOT NULL AUTO_INCREMENT,
+    course_id BIGINT NOT NULL,
+    activity_id BIGINT NOT NULL,
+    user_id BIGINT NOT NULL,
+    total_submissions INTEGER NOT NULL,
+    pending_submissions INTEGER NOT NULL,
+    enqueued_submissions INTEGER NOT NULL,
+    processing_submissions INTEGER NOT NULL,
+    submissions_with_build_errors INTEGER NOT NULL,
+    submissions_with_runtime_errors INTEGER NOT NULL,
+    submissions_with_failures INTEGER NOT NULL,
+    successful_submissions INTEGER NOT NULL,
+    submissions_with_time_out INTEGER NOT NULL,
+    best_status_rank INTEGER NOT NULL,
+    first_success_date DATETIME,
+    last_submission_date DATETIME,
+    PRIMARY KEY (id),
+    UNIQUE (activity_id, user_id),
+    FOREIGN KEY(activity_id) REFERENCES activities (id)
+);
+
+CREATE INDEX ix_activity_submissions_summaries_course_id_user_id
+    ON activity_submissions_summaries (course_id, user_id);
+
+-- best_status_rank: the rank of each status, as in aux_models.SubmissionStatus
+INSERT INTO activity_submissions_summaries (
+    course_id, activity_id, user_id, total_submissions, pending_submissions, enqueued_submissions,
+    processing_submissions, submissions_with_build_errors, submissions_with_runtime_errors,
+    submissions_with_failures, successful_submissions, submissions_with_time_out, best_status_rank,
+    first_success_date, last_submission_date
+)
+SELECT
+    activities.course_id,
+    activity_submissions.activity_id,
+    activity_submissions.user_id,
+    COUNT(activity_submissions.id),
+    SUM(CASE WHEN activity_submissions.status = 'PENDING' THEN 1 ELSE 0 END),
+    SUM(CASE WHEN activity_submissions.status = 'ENQUEUED' THEN 1 ELSE 0 END),
+    SUM(CASE WHEN activity_submissions.status = 'PROCESSING' THEN 1 ELSE 0 END),
+    SUM(CASE WHEN activity_submissions.status = 'BUILD_ERROR' THEN 1 ELSE 0 END),
+    SUM(CASE WHEN activity_submissions.status = 'RUNTIME_ERROR' THEN 1 ELSE 0 END),
+    SUM(CASE WHEN activity_submissions.status = 'FAILURE' THEN 1 ELSE 0 END),
+    SUM(CASE WHEN activity_submissions.status = 'SUCCESS' THEN 1 ELSE 0 END),
+    SUM(CASE WHEN activity_submissions.status = 'TIME_OUT' THEN 1 ELSE 0 END),
+    COALESCE(
+        MAX(
+            CASE activity_submissions.status
+                WHEN 'PENDING' THEN 1
+                WHEN 'ENQUEUED' THEN 2
+                WHEN 'PROCESSING' THEN 3
+                WHEN 'BUILD_ERROR' THEN 4
+                WHEN 'RUNTIME_ERROR' THEN 5
+                WHEN 'FAILURE' THEN 6
+                WHEN 'SUCCESS' THEN 7
+                WHEN 'TIME_OUT' THEN 8
+                ELSE 0
+            END
+        ),
+        0
+    ),
+    MIN(CASE WHEN activity_submissions.status = 'SUCCESS' THEN activity_submissions.date_created END),
+    MAX(activity_submissions.date_created)
+FROM activity_submissions
+JOIN activities ON activities.id = activity_submissions.activity_id
+GROUP BY activities.course_id, activity_submissions.activity_id, activity_submissions.user_id;
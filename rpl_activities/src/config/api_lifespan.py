@@ -1,13 +1,39 @@
 from contextlib import asynccontextmanager
+from datetime import timedelta
 from fastapi import FastAPI
 import httpx
 from rpl_activities.src.config import env
+from rpl_activities.src.deps.database import SessionLocal
+from rpl_activities.src.deps.mq_sender import MQSender
+from rpl_activities.src.deps.submission_status_notifier import create_status_relay, submission_status_notifier
+from rpl_activities.src.services.submissions_dispatcher import SubmissionsDispatcher
 
 
 @asynccontextmanager
-async def users_api_conn_lifespan(app: FastAPI):
-    async with httpx.AsyncClient(
-        base_url=env.USERS_API_URL,
-        timeout=httpx.Timeout(60.0),
-    ) as client:
-        yield {"users_api_client": client}
+async def api_lifespan(app: FastAPI):
+    mq_sender = MQSender(
+        pool_size=env.MQ_SENDER_POOL_SIZE, acquire_timeout_seconds=env.MQ_SENDER_ACQUIRE_TIMEOUT_SECONDS
+    )
+    submissions_dispatcher = SubmissionsDispatcher(
+        mq_sender,
+        SessionLocal,
+        batch_size=env.SUBMISSION_DISPATCH_BATCH_SIZE,
+        poll_interval_seconds=env.SUBMISSION_DISPATCH_INTERVAL_SECONDS,
+        max_attempts=env.SUBMISSION_DISPATCH_MAX_ATTEMPTS,
+        max_backoff_seconds=env.SUBMISSION_DISPATCH_MAX_BACKOFF_SECONDS,
+        retention=timedelta(hours=env.SUBMISSION_DISPATCH_RETENTION_HOURS),
+    )
+    submissions_dispatcher.start()
+    status_relay = create_status_relay(env.SUBMISSION_STATUS_BROKER, submission_status_notifier)
+    if status_relay is not None:
+        submission_status_notifier.relay = status_relay
+        status_relay.start()
+    try:
+        async with httpx.AsyncClient(base_url=env.USERS_API_URL, timeout=httpx.Timeout(60.0)) as client:
+            yield {"users_api_client": client, "mq_sender": mq_sender}
+    finally:
+        if status_relay is not None:
+            submission_status_notifier.relay = None
+            status_relay.stop()
+        submissions_dispatcher.stop()
+        mq_sender.close()
@@ -2,6 +2,7 @@ FASTAPI_METADATA = {
     "title": "RPL ACTIVITIES API",
     "version": "3.0.0",
     "openapi_tags": [
+        {"name": "Auth", "description": "Endpoints to inspect and expire the cached authentication of users."},
         {"name": "Activities", "description": "Endpoints to get, create, modify, and delete activities."},
         {
             "name": "Activity Categories",
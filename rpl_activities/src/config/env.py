@@ -12,3 +12,58 @@ RUNNER_API_KEY = os.getenv("RUNNER_API_KEY")
 
 if not all([DB_URL, QUEUE_URL, USERS_API_URL, RUNNER_API_KEY]):
     raise ValueError("Missing environment variables")
+
+# Optional settings ==========================
+
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "30"))
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000"))
+
+STARTING_FILES_CACHE_MAX_BYTES = int(os.getenv("STARTING_FILES_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# "delta": submission rplfiles only store the student-writable files, over the activity starting rplfile.
+# "full": submission rplfiles store every file (starting files included).
+SUBMISSION_FILES_STORAGE_MODE = os.getenv("SUBMISSION_FILES_STORAGE_MODE", "delta")
+
+# Where new RPLFile payloads are stored: "database", "filesystem" (RPLFILES_STORAGE_DIR) or "s3" (requires boto3;
+# credentials are taken from the standard AWS_* variables, RPLFILES_S3_ENDPOINT_URL allows S3-compatible services).
+RPLFILES_STORAGE_BACKEND = os.getenv("RPLFILES_STORAGE_BACKEND", "database")
+RPLFILES_STORAGE_DIR = os.getenv("RPLFILES_STORAGE_DIR", "/var/lib/rpl_activities/rplfiles")
+RPLFILES_S3_BUCKET = os.getenv("RPLFILES_S3_BUCKET")
+RPLFILES_S3_ENDPOINT_URL = os.getenv("RPLFILES_S3_ENDPOINT_URL")
+RPLFILES_S3_PREFIX = os.getenv("RPLFILES_S3_PREFIX", "rplfiles/")
+
+# Failed IO test runs store at most this many chars of the student output (passing ones store none, it's the
+# expected output). If enabled, the full output of truncated ones is kept compressed in the blob storage.
+IO_TEST_RUN_OUTPUT_MAX_CHARS = int(os.getenv("IO_TEST_RUN_OUTPUT_MAX_CHARS", "16384"))
+IO_TEST_RUN_KEEP_FULL_OUTPUT = os.getenv("IO_TEST_RUN_KEEP_FULL_OUTPUT", "true").lower() == "true"
+# Stdout/stderr of tests execution logs are stored (and returned in submission results) capped at this many
+# chars. If enabled, the full logs of truncated ones are kept compressed in the blob storage.
+TESTS_EXECUTION_LOG_MAX_CHARS = int(os.getenv("TESTS_EXECUTION_LOG_MAX_CHARS", "16384"))
+TESTS_EXECUTION_LOG_KEEP_FULL = os.getenv("TESTS_EXECUTION_LOG_KEEP_FULL", "true").lower() == "true"
+# "local" (in-process only: a single replica) or "rabbitmq" (fanout exchange relaying updates between replicas)
+SUBMISSION_STATUS_BROKER = os.getenv("SUBMISSION_STATUS_BROKER", "local")
+SUBMISSION_STATUS_STREAM_MAX_SECONDS = float(os.getenv("SUBMISSION_STATUS_STREAM_MAX_SECONDS", "300"))
+SUBMISSION_STATUS_STREAM_KEEPALIVE_SECONDS = float(
+    os.getenv("SUBMISSION_STATUS_STREAM_KEEPALIVE_SECONDS", "15")
+)
+
+# If set (> 0), the stats of teacher dashboards are computed from an in-process columnar index of the
+# submissions of each course (requires numpy) instead of by the database. Memory budget of the whole index
+# (courses are LRU evicted).
+SUBMISSIONS_ANALYTICS_INDEX_MAX_BYTES = int(os.getenv("SUBMISSIONS_ANALYTICS_INDEX_MAX_BYTES", "0"))
+
+MQ_SENDER_POOL_SIZE = int(os.getenv("MQ_SENDER_POOL_SIZE", "4"))
+MQ_SENDER_ACQUIRE_TIMEOUT_SECONDS = float(os.getenv("MQ_SENDER_ACQUIRE_TIMEOUT_SECONDS", "5"))
+
+SUBMISSION_DISPATCH_BATCH_SIZE = int(os.getenv("SUBMISSION_DISPATCH_BATCH_SIZE", "100"))
+SUBMISSION_DISPATCH_INTERVAL_SECONDS = float(os.getenv("SUBMISSION_DISPATCH_INTERVAL_SECONDS", "0.5"))
+SUBMISSION_DISPATCH_MAX_ATTEMPTS = int(os.getenv("SUBMISSION_DISPATCH_MAX_ATTEMPTS", "5"))
+# Cap of the exponential backoff between dispatch rounds while the broker is unavailable
+SUBMISSION_DISPATCH_MAX_BACKOFF_SECONDS = float(os.getenv("SUBMISSION_DISPATCH_MAX_BACKOFF_SECONDS", "30"))
+# Dispatched rows of the outbox are deleted once they are older than this
+SUBMISSION_DISPATCH_RETENTION_HOURS = float(os.getenv("SUBMISSION_DISPATCH_RETENTION_HOURS", "168"))
+
+# If set, access tokens are verified locally (same algorithm as the users API) instead of by the users API.
+# The key is either the shared secret (HS*) or the public key (RS*/ES*) matching the users API signing key.
+JWT_ALGORITHM = os.getenv("JWT_ALGORITHM")
+JWT_VERIFICATION_KEY = os.getenv("JWT_PUBLIC_KEY") or os.getenv("JWT_SECRET")
@@ -5,7 +5,13 @@ from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 import httpx
 
 from rpl_activities.src.config import env
-from rpl_activities.src.dtos.auth_dtos import CourseUserResponseDTO, CurrentMainUserResponseDTO
+from rpl_activities.src.deps import security
+from rpl_activities.src.deps.auth_cache import AuthCache, hash_token
+from rpl_activities.src.dtos.auth_dtos import (
+    CourseCapabilityClaimsDTO,
+    CourseUserResponseDTO,
+    CurrentMainUserResponseDTO,
+)
 
 
 # Dependencies =============================
@@ -13,6 +19,19 @@ from rpl_activities.src.dtos.auth_dtos import CourseUserResponseDTO, CurrentMain
 auth_handler = HTTPBearer()
 AuthDependency = Annotated[HTTPAuthorizationCredentials, Depends(auth_handler)]
 
+users_auth_cache = AuthCache(max_entries=env.AUTH_CACHE_MAX_ENTRIES, ttl_seconds=env.AUTH_CACHE_TTL_SECONDS)
+
+# ==========================================
+
+
+def __get_auth_cache_identity(auth_header: AuthDependency) -> str:
+    # With local verification the token is checked on every request, so the users API data can be
+    # cached per user (shared by all of their tokens) and only membership data requires a network call.
+    if security.is_local_token_verification_enabled():
+        return f"user:{security.verify_access_token(auth_header.credentials)}"
+    return hash_token(auth_header.credentials)
+
+
 # ==========================================
 
 
@@ -30,6 +49,11 @@ class CurrentMainUser:
 
 
 async def get_current_main_user(auth_header: AuthDependency, request: Request) -> CurrentMainUser:
+    cache_key = (__get_auth_cache_identity(auth_header), None)
+    cached_main_user: Optional[CurrentMainUser] = users_auth_cache.get(cache_key)
+    if cached_main_user:
+        return cached_main_user
+
     users_api_client: httpx.AsyncClient = request.state.users_api_client
     try:
         res = await users_api_client.get(
@@ -50,7 +74,9 @@ async def get_current_main_user(auth_header: AuthDependency, request: Request) -
             status_code=res.status_code, detail=f"Failed to authenticate current user: {res.text}"
         )
     user_data = CurrentMainUserResponseDTO(**res.json())
-    return CurrentMainUser(user_data)
+    current_main_user = CurrentMainUser(user_data)
+    users_auth_cache.put(cache_key, current_main_user, current_main_user.id)
+    return current_main_user
 
 
 CurrentMainUserDependency = Annotated[CurrentMainUser, Depends(get_current_main_user)]
@@ -71,6 +97,21 @@ class CurrentCourseUser:
         self.student_id = user_data.student_id
         self.permissions = user_data.permissions
 
+    @classmethod
+    def from_course_capability(cls, claims: CourseCapabilityClaimsDTO) -> "CurrentCourseUser":
+        # Capabilities only carry what is needed to authorize the request, not the user profile
+        current_course_user = cls.__new__(cls)
+        current_course_user.id = claims.course_user_id
+        current_course_user.user_id = int(claims.sub)
+        current_course_user.course_id = claims.course_id
+        current_course_user.username = None
+        current_course_user.email = None
+        current_course_user.name = None
+        current_course_user.surname = None
+        current_course_user.student_id = None
+        current_course_user.permissions = claims.permissions
+        return current_course_user
+
     def has_authority(self, authority: str) -> bool:
         return authority in self.permissions
 
@@ -92,9 +133,31 @@ def __basic_request_param_checks(course_id: Optional[str]) -> int:
     return course_id
 
 
+def __get_course_user_from_capability(
+    auth_header: AuthDependency, course_capability: str, course_id: int
+) -> Optional[CurrentCourseUser]:
+    # The capability must belong to the bearer of the access token and to the requested course
+    user_id = security.verify_access_token(auth_header.credentials)
+    claims = security.verify_course_capability_token(course_capability)
+    if claims is None or claims.sub != user_id or claims.course_id != course_id:
+        return None
+    return CurrentCourseUser.from_course_capability(claims)
+
+
 async def get_current_course_user(auth_header: AuthDependency, request: Request) -> CurrentCourseUser:
-    users_api_client: httpx.AsyncClient = request.state.users_api_client
     course_id = __basic_request_param_checks(request.path_params.get("course_id"))
+    course_capability = request.headers.get(security.COURSE_CAPABILITY_HEADER)
+    if course_capability and security.is_local_token_verification_enabled():
+        current_course_user = __get_course_user_from_capability(auth_header, course_capability, course_id)
+        if current_course_user:
+            return current_course_user
+
+    cache_key = (__get_auth_cache_identity(auth_header), course_id)
+    cached_course_user: Optional[CurrentCourseUser] = users_auth_cache.get(cache_key)
+    if cached_course_user:
+        return cached_course_user
+
+    users_api_client: httpx.AsyncClient = request.state.users_api_client
     try:
         res = await users_api_client.get(
             "/api/v3/auth/externalCourseUserAuth",
@@ -115,7 +178,9 @@ async def get_current_course_user(auth_header: AuthDependency, request: Request)
             status_code=res.status_code, detail=f"Failed to authenticate current course user: {res.text}"
         )
     course_user_data = CourseUserResponseDTO(**res.json())
-    return CurrentCourseUser(course_user_data)
+    current_course_user = CurrentCourseUser(course_user_data)
+    users_auth_cache.put(cache_key, current_course_user, current_course_user.user_id)
+    return current_course_user
 
 
 CurrentCourseUserDependency = Annotated[CurrentCourseUser, Depends(get_current_course_user)]
@@ -0,0 +1,107 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+# (token hash or locally verified user identity, course_id or None for main user auth)
+type AuthCacheKey = tuple[str, Optional[int]]
+
+
+def hash_token(token: str) -> str:
+    # Raw bearer tokens are never kept in memory as cache keys
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class _AuthCacheEntry:
+    __slots__ = ("value", "user_id", "course_id", "expires_at")
+
+    def __init__(self, value: Any, user_id: int, course_id: Optional[int], expires_at: float):
+        self.value = value
+        self.user_id = user_id
+        self.course_id = course_id
+        self.expires_at = expires_at
+
+
+class AuthCache:
+    """
+    Bounded, TTL-based, in-process LRU cache for the authenticated users returned by the users API.
+    It is shared by every request of the worker, so all operations are guarded by a lock.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries: OrderedDict[Hashable, _AuthCacheEntry] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl_seconds > 0
+
+    def get(self, key: AuthCacheKey) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry.expires_at <= time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.value
+
+    def put(self, key: AuthCacheKey, value: Any, user_id: int, ttl_seconds: Optional[float] = None):
+        if not self.enabled:
+            return
+        ttl_seconds = self.ttl_seconds if ttl_seconds is None else min(ttl_seconds, self.ttl_seconds)
+        if ttl_seconds <= 0:
+            return
+        with self._lock:
+            self._entries[key] = _AuthCacheEntry(value, user_id, key[1], time.monotonic() + ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, course_id: Optional[int] = None, user_id: Optional[int] = None) -> int:
+        with self._lock:
+            keys_to_remove = [
+                key
+                for key, entry in self._entries.items()
+                if (course_id is None or entry.course_id == course_id)
+                and (user_id is None or entry.user_id == user_id)
+            ]
+            for key in keys_to_remove:
+                del self._entries[key]
+            self.invalidations += len(keys_to_remove)
+            return len(keys_to_remove)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+            self.invalidations = 0
+
+    def stats(self) -> dict[str, int | float]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
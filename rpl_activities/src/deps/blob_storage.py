@@ -0,0 +1,130 @@
+import os
+import tempfile
+from abc import ABC, abstractmethod
+from typing import Any, Iterator, Optional
+
+from rpl_activities.src.config import env
+
+DATABASE_STORAGE = "database"
+FILESYSTEM_STORAGE = "filesystem"
+S3_STORAGE = "s3"
+
+CHUNK_SIZE = 256 * 1024
+
+
+class BlobStorage(ABC):
+    """
+    Storage for the (content-addressed) RPLFile blobs that are kept out of the database.
+    Keys are blob sha256 digests, so a put of an existing key is a no-op rewrite of the same bytes.
+    """
+
+    name: str
+
+    @abstractmethod
+    def put(self, key: str, data: bytes):
+        pass
+
+    @abstractmethod
+    def iter_chunks(self, key: str, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        # Must fail right away (not on the first next()) if the blob doesn't exist
+        pass
+
+    @abstractmethod
+    def delete(self, key: str):
+        pass
+
+    def get(self, key: str) -> bytes:
+        return b"".join(self.iter_chunks(key))
+
+
+class FileSystemBlobStorage(BlobStorage):
+    name = FILESYSTEM_STORAGE
+
+    def __init__(self, root_dir: str):
+        self.root_dir = root_dir
+
+    def __path_of(self, key: str) -> str:
+        # Fan out by prefix so that no directory ends up with millions of entries
+        return os.path.join(self.root_dir, key[:2], key[2:4], key)
+
+    def put(self, key: str, data: bytes):
+        path = self.__path_of(key)
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Written to a temp file and then renamed: readers never see a partially written blob
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, "wb") as tmp_file:
+                tmp_file.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def iter_chunks(self, key: str, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        blob_file = open(self.__path_of(key), "rb")
+
+        def read_chunks():
+            with blob_file:
+                while chunk := blob_file.read(chunk_size):
+                    yield chunk
+
+        return read_chunks()
+
+    def delete(self, key: str):
+        try:
+            os.remove(self.__path_of(key))
+        except FileNotFoundError:
+            pass
+
+
+class S3BlobStorage(BlobStorage):
+    # Works with any S3-compatible client (boto3, or anything exposing the same object operations,
+    # e.g. pointed to a local MinIO through RPLFILES_S3_ENDPOINT_URL).
+    name = S3_STORAGE
+
+    def __init__(self, client: Any, bucket: str, prefix: str = ""):
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def put(self, key: str, data: bytes):
+        self.client.put_object(Bucket=self.bucket, Key=self.prefix + key, Body=data)
+
+    def iter_chunks(self, key: str, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        body = self.client.get_object(Bucket=self.bucket, Key=self.prefix + key)["Body"]
+        return body.iter_chunks(chunk_size)
+
+    def delete(self, key: str):
+        self.client.delete_object(Bucket=self.bucket, Key=self.prefix + key)
+
+
+# ==============================================================================
+
+
+def create_blob_storage(backend: str) -> Optional[BlobStorage]:
+    if backend == DATABASE_STORAGE:
+        return None
+    if backend == FILESYSTEM_STORAGE:
+        return FileSystemBlobStorage(env.RPLFILES_STORAGE_DIR)
+    if backend == S3_STORAGE:
+        try:
+            import boto3
+        except ImportError:
+            raise ValueError("RPLFILES_STORAGE_BACKEND=s3 requires boto3 to be installed")
+        if not env.RPLFILES_S3_BUCKET:
+            raise ValueError("Missing RPLFILES_S3_BUCKET environment variable")
+        client = boto3.client("s3", endpoint_url=env.RPLFILES_S3_ENDPOINT_URL)
+        return S3BlobStorage(client, env.RPLFILES_S3_BUCKET, env.RPLFILES_S3_PREFIX)
+    raise ValueError(f"Unknown RPLFILES_STORAGE_BACKEND: {backend}")
+
+
+# None: new blobs are stored in the database (rpl_file_blobs.data)
+rplfiles_storage: Optional[BlobStorage] = create_blob_storage(env.RPLFILES_STORAGE_BACKEND)
+
+
+def get_rplfiles_storage(name: str) -> BlobStorage:
+    if rplfiles_storage is None or rplfiles_storage.name != name:
+        raise RuntimeError(f"RPLFile blobs stored in '{name}' but the configured storage is a different one")
+    return rplfiles_storage
@@ -0,0 +1,98 @@
+import json
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from rpl_activities.src.config import env
+from rpl_activities.src.deps import tar_utils
+from rpl_activities.src.repositories.models.rpl_file import RPLFile
+
+# (rplfile id, rplfile last_updated)
+type ExtractedFilesCacheKey = tuple[int, datetime]
+
+
+class ExtractedStartingFiles:
+    # Shared by every request that hits the cache: must be treated as read-only
+    __slots__ = ("files", "metadata", "size_bytes")
+
+    def __init__(self, files: tar_utils.ExtractedFilesDict):
+        self.files = files
+        self.metadata: dict[str, dict] = {}
+        raw_metadata = files.get(tar_utils.METADATA_FILENAME)
+        if raw_metadata:
+            try:
+                self.metadata = json.loads(raw_metadata)
+            except json.JSONDecodeError:
+                logging.warning(f"Could not parse {tar_utils.METADATA_FILENAME} of starting files.")
+        self.size_bytes = sum(len(name) + len(content) for name, content in files.items())
+
+
+class ExtractedFilesCache:
+    """
+    Bounded (by total size of the decoded files), in-process LRU cache of extracted starting files.
+    Entries are keyed by the rplfile last_updated too, so an update done by another replica is never
+    served stale; update_rplfile also drops the entry right away to free memory.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[ExtractedFilesCacheKey, ExtractedStartingFiles] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_extract(self, rplfile: RPLFile) -> ExtractedStartingFiles:
+        key = (rplfile.id, rplfile.last_updated)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        entry = ExtractedStartingFiles(tar_utils.extract_tar_gz_to_dict_of_files(rplfile.data))
+        if entry.size_bytes > self.max_bytes:
+            return entry
+        with self._lock:
+            self.__remove_entries_of(rplfile.id)
+            self._entries[key] = entry
+            self.size_bytes += entry.size_bytes
+            while self.size_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size_bytes -= evicted.size_bytes
+                self.evictions += 1
+        return entry
+
+    def __remove_entries_of(self, rplfile_id: int):
+        for key in [key for key in self._entries if key[0] == rplfile_id]:
+            self.size_bytes -= self._entries.pop(key).size_bytes
+
+    def invalidate(self, rplfile_id: int):
+        with self._lock:
+            self.__remove_entries_of(rplfile_id)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size_bytes = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "size_bytes": self.size_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+starting_files_cache = ExtractedFilesCache(max_bytes=env.STARTING_FILES_CACHE_MAX_BYTES)
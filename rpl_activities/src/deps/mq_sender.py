@@ -1,57 +1,209 @@
 import logging
-from typing import Annotated
-from fastapi import Depends
+import queue
+import threading
+import time
+from collections import deque
+from typing import Annotated, Callable, Optional
+from fastapi import Depends, Request
 import pika
+import pika.adapters.blocking_connection
 import pika.exceptions
 from rpl_activities.src.config import env
 from fastapi import HTTPException, status
 
 MSG_TTL = 3600000  # 1 hour in ms
+SUBMISSIONS_QUEUE = "hello"
+
+
+def default_connection_factory() -> pika.BlockingConnection:
+    return pika.BlockingConnection([pika.URLParameters(env.QUEUE_URL)])
+
+
+class _PooledChannel:
+    # pika's BlockingConnection is not thread-safe, so every pooled channel owns its connection
+    # and is used by a single thread at a time (whoever took it from the pool).
+    __slots__ = ("connection", "channel")
 
-class MQSender:
     def __init__(self):
-        self.connection = pika.BlockingConnection(
-            [pika.URLParameters(env.QUEUE_URL)]
+        self.connection: Optional[pika.BlockingConnection] = None
+        self.channel: Optional[pika.adapters.blocking_connection.BlockingChannel] = None
+
+    @property
+    def is_open(self) -> bool:
+        return bool(self.connection and self.connection.is_open and self.channel and self.channel.is_open)
+
+    def close(self):
+        try:
+            if self.connection and self.connection.is_open:
+                self.connection.close()
+        except pika.exceptions.AMQPError:
+            pass
+        self.channel = None
+        self.connection = None
+
+
+class MQSender:
+    """
+    Long-lived publisher shared by every request of the worker (owned by the app lifespan).
+    Connections are opened lazily, kept in a small pool and transparently re-opened when the broker
+    drops them (restarts, missed heartbeats, etc).
+    """
+
+    def __init__(
+        self,
+        pool_size: int = 4,
+        acquire_timeout_seconds: float = 5.0,
+        connection_factory: Callable[[], pika.BlockingConnection] = default_connection_factory,
+    ):
+        self.pool_size = pool_size
+        self.acquire_timeout_seconds = acquire_timeout_seconds
+        self.connection_factory = connection_factory
+        self._pool: queue.LifoQueue[_PooledChannel] = queue.LifoQueue(maxsize=pool_size)
+        for _ in range(pool_size):
+            self._pool.put(_PooledChannel())
+        self._closed = False
+        self._closing_lock = threading.Lock()
+
+        self._metrics_lock = threading.Lock()
+        self.published = 0
+        self.failed = 0
+        self.reconnects = 0
+        self._latencies_ms: deque[float] = deque(maxlen=1000)
+
+    # ==============================================================================
+
+    def __connect(self, pooled_channel: _PooledChannel):
+        if pooled_channel.connection is not None:
+            pooled_channel.close()
+            with self._metrics_lock:
+                self.reconnects += 1
+        pooled_channel.connection = self.connection_factory()
+        pooled_channel.channel = pooled_channel.connection.channel()
+        # Publisher confirms: basic_publish only returns once the broker has taken the message
+        pooled_channel.channel.confirm_delivery()
+        pooled_channel.channel.queue_declare(
+            queue=SUBMISSIONS_QUEUE, durable=True, arguments={"x-message-ttl": MSG_TTL}
         )
-        self.channel = self.connection.channel()
-        self.channel.queue_declare(queue="hello", durable=True, arguments={"x-message-ttl": MSG_TTL})
 
-    def send_submission(self, submission_id: int, language_with_version: str):
-        message = f"{submission_id} {language_with_version}"
-        self.channel.basic_publish(
+    def __ensure_open(self, pooled_channel: _PooledChannel):
+        if pooled_channel.is_open:
+            try:
+                # Idle blocking connections only answer heartbeats while processing events
+                pooled_channel.connection.process_data_events(time_limit=0)
+                return
+            except pika.exceptions.AMQPError:
+                pass
+        self.__connect(pooled_channel)
+
+    def __publish(self, pooled_channel: _PooledChannel, message: str):
+        pooled_channel.channel.basic_publish(
             exchange="",
-            routing_key="hello",
+            routing_key=SUBMISSIONS_QUEUE,
             body=message,
             properties=pika.BasicProperties(delivery_mode=pika.DeliveryMode.Persistent),
         )
 
+    def __release(self, pooled_channel: _PooledChannel):
+        # Channels in use while closing (by requests or the dispatcher) are closed as they are returned
+        with self._closing_lock:
+            if not self._closed:
+                self._pool.put(pooled_channel)
+                return
+        pooled_channel.close()
+
+    def __record_publish(self, started_at: float, succeeded: bool):
+        with self._metrics_lock:
+            if succeeded:
+                self.published += 1
+                self._latencies_ms.append((time.perf_counter() - started_at) * 1000)
+            else:
+                self.failed += 1
+
+    # ==============================================================================
+
+    def send_submission(self, submission_id: int, language_with_version: str):
+        if not self.send_submissions([(submission_id, language_with_version)]):
+            raise pika.exceptions.AMQPError(f"Submission {submission_id} was rejected by the broker")
+
+    def send_submissions(self, submissions: list[tuple[int, str]]) -> list[int]:
+        # Publishes a batch on a single pooled channel and returns the ids confirmed by the broker.
+        # Messages nacked by the broker are skipped; a broken connection aborts the rest of the batch.
+        if self._closed:
+            raise pika.exceptions.AMQPError("MQSender is closed")
+        try:
+            pooled_channel = self._pool.get(timeout=self.acquire_timeout_seconds)
+        except queue.Empty:
+            self.__record_publish(0, succeeded=False)
+            raise pika.exceptions.AMQPError("Timed out waiting for a free MQ channel")
+
+        sent_submission_ids = []
+        try:
+            try:
+                self.__ensure_open(pooled_channel)
+            except Exception:
+                self.__record_publish(0, succeeded=False)
+                raise
+            for submission_id, language_with_version in submissions:
+                message = f"{submission_id} {language_with_version}"
+                started_at = time.perf_counter()
+                try:
+                    try:
+                        self.__publish(pooled_channel, message)
+                    except (pika.exceptions.AMQPConnectionError, pika.exceptions.AMQPChannelError):
+                        # The connection may have died since it was last used: retry once on a fresh one
+                        self.__connect(pooled_channel)
+                        self.__publish(pooled_channel, message)
+                except pika.exceptions.NackError:
+                    self.__record_publish(started_at, succeeded=False)
+                    continue
+                except Exception:
+                    self.__record_publish(started_at, succeeded=False)
+                    raise
+                self.__record_publish(started_at, succeeded=True)
+                sent_submission_ids.append(submission_id)
+        except Exception:
+            pooled_channel.close()
+            if not sent_submission_ids:
+                raise
+            logging.getLogger("uvicorn.error").error(
+                f"MQ connection lost after publishing {len(sent_submission_ids)}/{len(submissions)} submissions"
+            )
+        finally:
+            self.__release(pooled_channel)
+        return sent_submission_ids
+
     def close(self):
-        if self.connection.is_open:
-            self.connection.close()
-        self.channel = None
-        self.connection = None
+        with self._closing_lock:
+            self._closed = True
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
 
+    def stats(self) -> dict[str, int | float]:
+        with self._metrics_lock:
+            latencies = sorted(self._latencies_ms)
+            return {
+                "pool_size": self.pool_size,
+                "published": self.published,
+                "failed": self.failed,
+                "reconnects": self.reconnects,
+                "publish_latency_ms_avg": (sum(latencies) / len(latencies)) if latencies else 0.0,
+                "publish_latency_ms_p95": latencies[int(len(latencies) * 0.95)] if latencies else 0.0,
+                "publish_latency_ms_max": latencies[-1] if latencies else 0.0,
+            }
 
-def get_mq_sender():
-    try:
-        mq_sender = MQSender()
-        yield mq_sender
-        if mq_sender and mq_sender.connection.is_open:
-            mq_sender.close()
-    except pika.exceptions.AMQPError as e:
-        logging.error(f"Failed to connect to MQ: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE, 
-            detail="Message Queue service is currently unavailable. Wait a few seconds and try again."
-        )
-    except Exception as e:
-        logging.getLogger("uvicorn.error").error(
-            f"An error occurred while using MQSender: {e}"
-        )
+
+def get_mq_sender(request: Request) -> MQSender:
+    mq_sender: Optional[MQSender] = getattr(request.state, "mq_sender", None)
+    if mq_sender is None:
+        logging.getLogger("uvicorn.error").error("MQSender was not initialized by the app lifespan")
         raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE, 
-            detail="MQ service is currently unavailable. Wait a few seconds and try again."
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="MQ service is currently unavailable. Wait a few seconds and try again.",
         )
+    return mq_sender
 
 
 MQSenderDependency = Annotated[MQSender, Depends(get_mq_sender)]
@@ -0,0 +1,43 @@
+import jwt
+from typing import Optional
+from fastapi import HTTPException, status
+
+from rpl_activities.src.config import env
+from rpl_activities.src.dtos.auth_dtos import CourseCapabilityClaimsDTO
+
+
+# Must match rpl_users.src.deps.security.COURSE_CAPABILITY_AUDIENCE
+COURSE_CAPABILITY_AUDIENCE = "rpl_activities_api"
+COURSE_CAPABILITY_HEADER = "X-Course-Capability"
+
+
+def is_local_token_verification_enabled() -> bool:
+    return bool(env.JWT_ALGORITHM and env.JWT_VERIFICATION_KEY)
+
+
+def verify_access_token(token: str) -> str:
+    # Mirrors rpl_users.src.deps.security.verify_access_token, without the round trip to the users API
+    try:
+        payload = jwt.decode(
+            token, env.JWT_VERIFICATION_KEY, algorithms=[env.JWT_ALGORITHM], options={"require": ["sub", "exp"]}
+        )
+        return payload["sub"]
+    except jwt.ExpiredSignatureError:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Expired JWT token")
+    except jwt.PyJWTError:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid JWT token")
+
+
+def verify_course_capability_token(token: str) -> Optional[CourseCapabilityClaimsDTO]:
+    # An invalid or expired capability is not an error: the caller falls back to asking the users API
+    try:
+        payload = jwt.decode(
+            token,
+            env.JWT_VERIFICATION_KEY,
+            algorithms=[env.JWT_ALGORITHM],
+            audience=COURSE_CAPABILITY_AUDIENCE,
+            options={"require": ["sub", "aud", "exp"]},
+        )
+        return CourseCapabilityClaimsDTO(**payload)
+    except (jwt.PyJWTError, ValueError):
+        return None
@@ -0,0 +1,244 @@
+import asyncio
+import json
+import logging
+import threading
+from collections import deque
+from typing import Callable, Optional
+import pika
+import pika.adapters.blocking_connection
+import pika.exceptions
+
+from rpl_activities.src.deps.mq_sender import default_connection_factory
+
+LOCAL_BROKER = "local"
+RABBITMQ_BROKER = "rabbitmq"
+
+SUBMISSION_STATUS_EXCHANGE = "submission_status_updates"
+
+
+class SubmissionStatusSubscription:
+    """
+    Status updates of a single submission, delivered from any thread (the sync request handlers run in a
+    threadpool) and awaited from the event loop. Updates published before the first wait are buffered.
+    """
+
+    def __init__(self, notifier: "SubmissionStatusNotifier", submission_id: int):
+        self.notifier = notifier
+        self.submission_id = submission_id
+        self._lock = threading.Lock()
+        self._pending: deque[str] = deque()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def deliver(self, new_status: str):
+        with self._lock:
+            self._pending.append(new_status)
+            loop, wakeup = self._loop, self._wakeup
+        if loop is not None:
+            try:
+                loop.call_soon_threadsafe(wakeup.set)
+            except RuntimeError:
+                # The loop that was waiting is already closed
+                pass
+
+    async def next_status(self, timeout_seconds: float) -> Optional[str]:
+        # None if no update arrived in time
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout_seconds
+        while True:
+            with self._lock:
+                if self._loop is None:
+                    self._loop = loop
+                    self._wakeup = asyncio.Event()
+                if self._pending:
+                    return self._pending.popleft()
+                # The update behind a wakeup may have been popped already: wait again for a new one
+                self._wakeup.clear()
+            remaining_seconds = deadline - loop.time()
+            if remaining_seconds <= 0:
+                return None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), remaining_seconds)
+            except TimeoutError:
+                pass
+
+    def close(self):
+        self.notifier.unsubscribe(self)
+
+    def __enter__(self) -> "SubmissionStatusSubscription":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class SubmissionStatusNotifier:
+    """
+    In-process pub/sub of submission status updates. With a relay (i.e. a cross-replica broker) updates
+    are published through it and delivered back to the subscribers of every replica, this one included.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions: dict[int, set[SubmissionStatusSubscription]] = {}
+        self.relay: Optional["RabbitMQStatusRelay"] = None
+        self.published = 0
+        self.delivered = 0
+
+    def subscribe(self, submission_id: int) -> SubmissionStatusSubscription:
+        subscription = SubmissionStatusSubscription(self, submission_id)
+        with self._lock:
+            self._subscriptions.setdefault(submission_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: SubmissionStatusSubscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.submission_id)
+            if subscriptions is None:
+                return
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscriptions[subscription.submission_id]
+
+    def publish(self, submission_id: int, new_status: str):
+        with self._lock:
+            self.published += 1
+        if self.relay is not None and self.relay.publish(submission_id, new_status):
+            return
+        # No relay (or it's down): at least the subscribers of this replica get it
+        self.deliver_locally(submission_id, new_status)
+
+    def deliver_locally(self, submission_id: int, new_status: str):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(submission_id, ()))
+            self.delivered += len(subscriptions)
+        for subscription in subscriptions:
+            subscription.deliver(new_status)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "subscribed_submissions": len(self._subscriptions),
+                "subscriptions": sum(len(subscriptions) for subscriptions in self._subscriptions.values()),
+                "published": self.published,
+                "delivered": self.delivered,
+            }
+
+
+class RabbitMQStatusRelay:
+    """
+    Relays status updates between replicas through a fanout exchange. Every replica consumes it through
+    its own exclusive (auto-deleted) queue in a background thread, and delivers the updates to its local
+    subscribers. Publishing uses a separate connection, since pika connections are not thread-safe.
+    """
+
+    def __init__(
+        self,
+        notifier: SubmissionStatusNotifier,
+        connection_factory: Callable[[], pika.BlockingConnection] = default_connection_factory,
+        reconnect_delay_seconds: float = 1.0,
+    ):
+        self.notifier = notifier
+        self.connection_factory = connection_factory
+        self.reconnect_delay_seconds = reconnect_delay_seconds
+        self._publish_lock = threading.Lock()
+        self._publish_connection: Optional[pika.BlockingConnection] = None
+        self._publish_channel: Optional[pika.adapters.blocking_connection.BlockingChannel] = None
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def __open_channel(
+        self,
+    ) -> tuple[pika.BlockingConnection, pika.adapters.blocking_connection.BlockingChannel]:
+        connection = self.connection_factory()
+        channel = connection.channel()
+        channel.exchange_declare(exchange=SUBMISSION_STATUS_EXCHANGE, exchange_type="fanout")
+        return connection, channel
+
+    def __close_publish_connection(self):
+        try:
+            if self._publish_connection is not None and self._publish_connection.is_open:
+                self._publish_connection.close()
+        except pika.exceptions.AMQPError:
+            pass
+        self._publish_connection = None
+        self._publish_channel = None
+
+    def publish(self, submission_id: int, new_status: str) -> bool:
+        message = json.dumps({"submission_id": submission_id, "status": new_status})
+        with self._publish_lock:
+            for _ in range(2):
+                try:
+                    if self._publish_connection is None or not self._publish_connection.is_open:
+                        self._publish_connection, self._publish_channel = self.__open_channel()
+                    self._publish_channel.basic_publish(
+                        exchange=SUBMISSION_STATUS_EXCHANGE, routing_key="", body=message
+                    )
+                    return True
+                except pika.exceptions.AMQPError:
+                    # The connection may have died since it was last used: retry once on a fresh one
+                    self.__close_publish_connection()
+        logging.getLogger("uvicorn.error").error(
+            f"Could not relay the status update of submission {submission_id}"
+        )
+        return False
+
+    def __on_message(self, channel, method, properties, body: bytes):
+        try:
+            update = json.loads(body)
+            self.notifier.deliver_locally(int(update["submission_id"]), update["status"])
+        except (ValueError, KeyError, TypeError):
+            logging.getLogger("uvicorn.error").warning(
+                f"Ignoring malformed submission status update: {body!r}"
+            )
+
+    def __consume(self):
+        connection, channel = self.__open_channel()
+        try:
+            queue_name = channel.queue_declare(queue="", exclusive=True, auto_delete=True).method.queue
+            channel.queue_bind(queue=queue_name, exchange=SUBMISSION_STATUS_EXCHANGE)
+            channel.basic_consume(queue=queue_name, on_message_callback=self.__on_message, auto_ack=True)
+            while not self._stop_event.is_set():
+                connection.process_data_events(time_limit=1)
+        finally:
+            try:
+                if connection.is_open:
+                    connection.close()
+            except pika.exceptions.AMQPError:
+                pass
+
+    def __run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.__consume()
+            except Exception as e:
+                # Updates relayed while reconnecting are missed: clients re-read the status when they reconnect
+                logging.getLogger("uvicorn.error").error(f"Submission status relay disconnected: {e}")
+                self._stop_event.wait(self.reconnect_delay_seconds)
+
+    def start(self):
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self.__run, name="submission-status-relay", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout_seconds: float = 5.0):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=timeout_seconds)
+            self._thread = None
+        with self._publish_lock:
+            self.__close_publish_connection()
+
+
+# ==============================================================================
+
+
+def create_status_relay(broker: str, notifier: SubmissionStatusNotifier) -> Optional[RabbitMQStatusRelay]:
+    if broker == LOCAL_BROKER:
+        return None
+    if broker == RABBITMQ_BROKER:
+        return RabbitMQStatusRelay(notifier)
+    raise ValueError(f"Unknown SUBMISSION_STATUS_BROKER: {broker}")
+
+
+submission_status_notifier = SubmissionStatusNotifier()
@@ -0,0 +1,258 @@
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+from typing import Callable, Optional
+
+from rpl_activities.src.config import env
+from rpl_activities.src.repositories.models import aux_models
+
+try:
+    import numpy as np
+except ImportError:
+    # Optional: only required if the index is enabled
+    np = None
+
+# Changes are synced from the last_updated of the submissions. One can be committed after others made later,
+# so the ones updated up to this long before the last synced change are read again.
+SYNC_OVERLAP = timedelta(seconds=60)
+
+UNKNOWN_STATUS_CODE = -1
+
+# Given the last_updated to sync from (None: every submission), the (id, user_id, activity_id, status,
+# date_created, last_updated) rows of the course submissions
+type CourseSubmissionsLoader = Callable[[Optional[datetime]], list]
+
+
+class CourseSubmissionsColumns:
+    """
+    Submissions of a course as NumPy columns, sorted by submission id. Every use syncs them first with the
+    submissions updated since the last sync: new ones are appended, and the others get their new status.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.submission_ids = np.empty(0, dtype=np.int64)
+        self.user_ids = np.empty(0, dtype=np.int64)
+        self.activity_ids = np.empty(0, dtype=np.int64)
+        self.status_codes = np.empty(0, dtype=np.int8)
+        self.days = np.empty(0, dtype="datetime64[D]")
+        self.last_updated: Optional[datetime] = None
+        # Only handled by the SubmissionsAnalyticsIndex (under its lock)
+        self.accounted_bytes = 0
+
+    @property
+    def size_bytes(self) -> int:
+        return (
+            self.submission_ids.nbytes
+            + self.user_ids.nbytes
+            + self.activity_ids.nbytes
+            + self.status_codes.nbytes
+            + self.days.nbytes
+        )
+
+    def __status_code(self, status: str) -> int:
+        try:
+            return aux_models.SubmissionStatus(status).rank
+        except ValueError:
+            return UNKNOWN_STATUS_CODE
+
+    def sync(self, load_submissions: CourseSubmissionsLoader):
+        rows = load_submissions(None if self.last_updated is None else self.last_updated - SYNC_OVERLAP)
+        if not rows:
+            return
+        submission_ids = np.fromiter((row.id for row in rows), dtype=np.int64, count=len(rows))
+        status_codes = np.fromiter(
+            (self.__status_code(row.status) for row in rows), dtype=np.int8, count=len(rows)
+        )
+        positions = np.searchsorted(self.submission_ids, submission_ids)
+        is_known = positions < len(self.submission_ids)
+        is_known[is_known] = self.submission_ids[positions[is_known]] == submission_ids[is_known]
+        self.status_codes[positions[is_known]] = status_codes[is_known]
+
+        if not is_known.all():
+            new_rows = [row for row, row_is_known in zip(rows, is_known) if not row_is_known]
+            previous_max_submission_id = self.submission_ids[-1] if len(self.submission_ids) else None
+            self.submission_ids = np.concatenate([self.submission_ids, submission_ids[~is_known]])
+            self.status_codes = np.concatenate([self.status_codes, status_codes[~is_known]])
+            self.user_ids = np.concatenate(
+                [self.user_ids, np.fromiter((row.user_id for row in new_rows), dtype=np.int64)]
+            )
+            self.activity_ids = np.concatenate(
+                [self.activity_ids, np.fromiter((row.activity_id for row in new_rows), dtype=np.int64)]
+            )
+            self.days = np.concatenate(
+                [self.days, np.array([row.date_created.date() for row in new_rows], dtype="datetime64[D]")]
+            )
+            if (
+                previous_max_submission_id is not None
+                and submission_ids[~is_known].min() < previous_max_submission_id
+            ):
+                # Committed after a later one (already synced): back in order of id
+                order = np.argsort(self.submission_ids, kind="stable")
+                self.submission_ids = self.submission_ids[order]
+                self.status_codes = self.status_codes[order]
+                self.user_ids = self.user_ids[order]
+                self.activity_ids = self.activity_ids[order]
+                self.days = self.days[order]
+
+        last_updated = max(row.last_updated for row in rows)
+        if self.last_updated is None or last_updated > self.last_updated:
+            self.last_updated = last_updated
+
+    def get_submissions_stats(
+        self,
+        user_ids: list[int],
+        activity_ids: list[int],
+        date_filter: Optional[date],
+        group_by: Optional[str],
+    ) -> list[SimpleNamespace]:
+        # Same rows as SubmissionsRepository.get_submissions_stats
+        selected = np.isin(self.user_ids, user_ids) & np.isin(self.activity_ids, activity_ids)
+        if date_filter is not None:
+            selected &= self.days == np.datetime64(date_filter, "D")
+        if not selected.any():
+            return []
+        user_ids_column = self.user_ids[selected]
+        status_codes = self.status_codes[selected]
+        if group_by == "activity":
+            group_keys = self.activity_ids[selected]
+        elif group_by == "user":
+            group_keys = user_ids_column
+        elif group_by == "date":
+            group_keys = self.days[selected]
+        else:
+            group_keys = np.zeros(len(user_ids_column), dtype=np.int8)
+
+        groups, group_of_submission = np.unique(group_keys, return_inverse=True)
+        group_of_submission = group_of_submission.reshape(-1)
+        submitters, submitter_of_submission = np.unique(
+            np.stack([group_of_submission, user_ids_column]), axis=1, return_inverse=True
+        )
+        submitter_of_submission = submitter_of_submission.reshape(-1)
+        group_of_submitter = submitters[0]
+
+        def count_by_group(group_indexes, weights=None) -> list[int]:
+            return (
+                np.bincount(group_indexes, weights=weights, minlength=len(groups)).astype(np.int64).tolist()
+            )
+
+        def count_submissions_with_status(status: aux_models.SubmissionStatus) -> list[int]:
+            return count_by_group(group_of_submission, status_codes == status.rank)
+
+        is_successful = status_codes == aux_models.SubmissionStatus.SUCCESS.rank
+        submitter_has_success = (
+            np.bincount(submitter_of_submission, weights=is_successful, minlength=submitters.shape[1]) > 0
+        )
+        columns = {
+            "group_key": groups.astype(object).tolist(),
+            "total_submissions": count_by_group(group_of_submission),
+            "successful_submissions": count_submissions_with_status(aux_models.SubmissionStatus.SUCCESS),
+            "submissions_with_runtime_errors": count_submissions_with_status(
+                aux_models.SubmissionStatus.RUNTIME_ERROR
+            ),
+            "submissions_with_build_errors": count_submissions_with_status(
+                aux_models.SubmissionStatus.BUILD_ERROR
+            ),
+            "submissions_with_failures": count_submissions_with_status(aux_models.SubmissionStatus.FAILURE),
+            "total_submitters": count_by_group(group_of_submitter),
+            "total_submitters_with_at_least_one_successful_submission": count_by_group(
+                group_of_submitter, submitter_has_success
+            ),
+        }
+        return [
+            SimpleNamespace(**{column: values[i] for column, values in columns.items()})
+            for i in range(len(groups))
+        ]
+
+
+class SubmissionsAnalyticsIndex:
+    """
+    Bounded (by the total size of the columns), in-process LRU cache of the submissions of each course as
+    NumPy columns, for the stats of teacher dashboards: their filters and group-bys become vectorized
+    operations over memory instead of aggregations by the database. Courses are loaded on first use.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._courses: OrderedDict[int, CourseSubmissionsColumns] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_submissions_stats(
+        self,
+        course_id: int,
+        load_submissions: CourseSubmissionsLoader,
+        user_ids: list[int],
+        activity_ids: list[int],
+        date_filter: Optional[date] = None,
+        group_by: Optional[str] = None,
+    ) -> list[SimpleNamespace]:
+        with self._lock:
+            columns = self._courses.get(course_id)
+            if columns is not None:
+                self._courses.move_to_end(course_id)
+                self.hits += 1
+            else:
+                columns = self._courses[course_id] = CourseSubmissionsColumns()
+                self.misses += 1
+
+        # Only requests of the same course wait for each other (e.g. while it's loaded)
+        with columns.lock:
+            columns.sync(load_submissions)
+            stats_rows = columns.get_submissions_stats(user_ids, activity_ids, date_filter, group_by)
+            size_bytes = columns.size_bytes
+
+        with self._lock:
+            if self._courses.get(course_id) is columns:
+                self.size_bytes += size_bytes - columns.accounted_bytes
+                columns.accounted_bytes = size_bytes
+                if size_bytes > self.max_bytes:
+                    # Never fits: loaded again on each use
+                    self.__evict(course_id)
+                while self.size_bytes > self.max_bytes:
+                    self.__evict(next(iter(self._courses)))
+        return stats_rows
+
+    def __evict(self, course_id: int):
+        self.size_bytes -= self._courses.pop(course_id).accounted_bytes
+        self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._courses.clear()
+            self.size_bytes = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "courses": len(self._courses),
+                "size_bytes": self.size_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+# ==============================================================================
+
+
+def create_submissions_analytics_index(max_bytes: int) -> Optional[SubmissionsAnalyticsIndex]:
+    if max_bytes <= 0:
+        return None
+    if np is None:
+        raise ValueError("SUBMISSIONS_ANALYTICS_INDEX_MAX_BYTES requires numpy to be installed")
+    return SubmissionsAnalyticsIndex(max_bytes)
+
+
+# None: the stats are aggregated by the database
+course_submissions_index: Optional[SubmissionsAnalyticsIndex] = create_submissions_analytics_index(
+    env.SUBMISSIONS_ANALYTICS_INDEX_MAX_BYTES
+)
@@ -1,9 +1,10 @@
+import gzip
 import io
 import logging
 import os
 
 import tarfile
-from typing import IO
+from typing import IO, Iterator
 
 from fastapi import UploadFile
 
@@ -55,9 +56,14 @@ def get_raw_files_from_uploadfiles(uploadfiles_from_request: list[UploadFile]) -
 
 
 def compress_files_dict_to_tar_gz(files_dict: dict[str, bytes]) -> bytes:
+    # Deterministic output (sorted members, no gzip timestamp): same files, same bytes. This is what
+    # lets the content-addressed blob storage deduplicate identical uploads.
     with io.BytesIO() as tar_gz_buffer:
-        with tarfile.open(fileobj=tar_gz_buffer, mode="w:gz") as tar:
-            for filename, file_content in files_dict.items():
+        with (
+            gzip.GzipFile(fileobj=tar_gz_buffer, mode="wb", mtime=0) as gz,
+            tarfile.open(fileobj=gz, mode="w") as tar,
+        ):
+            for filename, file_content in sorted(files_dict.items()):
                 fileobj = io.BytesIO(file_content)
                 tarinfo = tarfile.TarInfo(name=filename)
                 tarinfo.size = len(file_content)
@@ -65,6 +71,34 @@ def compress_files_dict_to_tar_gz(files_dict: dict[str, bytes]) -> bytes:
         return tar_gz_buffer.getvalue()
 
 
+def merge_tar_gz(base_data: bytes, overlay_data: bytes) -> bytes:
+    # Raw bytes are kept as they are (no decoding), files from the overlay replace the ones in the base
+    files: dict[str, bytes] = {}
+    for data in (base_data, overlay_data):
+        with tarfile.open(fileobj=io.BytesIO(data), mode="r") as tar:
+            for member in tar.getmembers():
+                if member.isfile():
+                    file = tar.extractfile(member)
+                    if file:
+                        with file:
+                            files[os.path.basename(member.name)] = file.read()
+    return compress_files_dict_to_tar_gz(files)
+
+
+def iter_tar_of_files(files: list[tuple[str, bytes]]) -> Iterator[bytes]:
+    # Uncompressed tar (members are usually tar.gz already), yielded as each member gets written
+    with io.BytesIO() as tar_buffer:
+        with tarfile.open(fileobj=tar_buffer, mode="w|") as tar:
+            for filename, file_content in files:
+                tarinfo = tarfile.TarInfo(name=filename)
+                tarinfo.size = len(file_content)
+                tar.addfile(tarinfo, io.BytesIO(file_content))
+                yield tar_buffer.getvalue()
+                tar_buffer.seek(0)
+                tar_buffer.truncate()
+        yield tar_buffer.getvalue()
+
+
 def compress_uploadfiles_to_tar_gz(uploadfiles_from_request: list[UploadFile]) -> bytes:
     files = get_raw_files_from_uploadfiles(uploadfiles_from_request)
     return compress_files_dict_to_tar_gz(files)
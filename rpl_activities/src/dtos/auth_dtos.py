@@ -32,3 +32,10 @@ class CurrentMainUserResponseDTO(BaseModel):
     degree: str
     university: str
     is_admin: bool
+
+
+class CourseCapabilityClaimsDTO(BaseModel):
+    sub: str
+    course_id: int
+    course_user_id: int
+    permissions: list[str]
@@ -1,10 +1,15 @@
 from datetime import datetime
 from typing import List, Optional
 from fastapi import File, UploadFile
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 from rpl_activities.src.repositories.models import aux_models
 
+RUNNER_BATCH_MAX_SIZE = 100
+SUBMISSIONS_HISTORY_MAX_PAGE_SIZE = 100
+SUBMISSIONS_HISTORY_NEXT_CURSOR_HEADER = "X-Next-Cursor"
+SUBMISSION_RESULT_MAX_WAIT_SECONDS = 60
+
 
 # ==============================================================================
 # User-facing DTOs
@@ -26,6 +31,8 @@ class IOTestRunResultDTO(BaseModel):
     test_in: str
     expected_output: str
     run_output: str
+    # run_output is only a prefix: the full one (if it was kept) is fetched on its own
+    run_output_truncated: bool = False
 
 
 class UnitTestRunResultDTO(BaseModel):
@@ -58,6 +65,44 @@ class SubmissionResultResponseDTO(BaseModel):
     unit_tests_run_results: Optional[List[UnitTestRunResultDTO]] = None
 
 
+class SubmissionResultSummaryResponseDTO(BaseModel):
+    # Submission history rows: the full result is fetched by id when needed
+    id: int
+    activity_id: int
+    submission_status: aux_models.SubmissionStatus
+    is_final_solution: bool
+    submission_date: datetime
+    exit_message: Optional[str] = None
+
+
+class SubmissionStatusEventDTO(BaseModel):
+    submission_id: int
+    status: aux_models.SubmissionStatus
+
+
+class SubmissionsReprocessingRequestDTO(BaseModel):
+    statuses: List[aux_models.SubmissionStatus] = [
+        aux_models.SubmissionStatus.PENDING,
+        aux_models.SubmissionStatus.PROCESSING,
+    ]
+    course_id: Optional[int] = None
+    activity_id: Optional[int] = None
+    min_age_minutes: Optional[int] = Field(default=None, ge=0)
+    max_per_second: Optional[float] = Field(default=None, gt=0)
+    batch_size: int = Field(default=500, gt=0, le=5000)
+
+
+class SubmissionsReprocessingProgressResponseDTO(BaseModel):
+    job_id: int
+    status: aux_models.SubmissionsReprocessingJobStatus
+    total: int
+    processed: int
+    batches: int
+    started_at: datetime
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
+
+
 # ==============================================================================
 # Runner-facing DTOs
 
@@ -81,6 +126,20 @@ class UpdateSubmissionStatusRequestDTO(BaseModel):
     status: aux_models.SubmissionStatus
 
 
+class SubmissionStatusUpdateDTO(BaseModel):
+    submission_id: int
+    status: aux_models.SubmissionStatus
+
+
+class UpdateSubmissionsStatusesRequestDTO(BaseModel):
+    updates: List[SubmissionStatusUpdateDTO] = Field(min_length=1, max_length=RUNNER_BATCH_MAX_SIZE)
+
+
+class UpdateSubmissionsStatusesResponseDTO(BaseModel):
+    updated_submission_ids: List[int]
+    not_found_submission_ids: List[int]
+
+
 class SingleUnitTestRunReportDTO(BaseModel):
     name: str
     status: str
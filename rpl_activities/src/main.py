@@ -3,16 +3,17 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import RedirectResponse
 
 from rpl_activities.src.config.api_metadata import FASTAPI_METADATA
-from rpl_activities.src.config.api_lifespan import users_api_conn_lifespan
+from rpl_activities.src.config.api_lifespan import api_lifespan
 from rpl_activities.src.routers.categories import router as categories_router
 from rpl_activities.src.routers.rpl_files import router as rplfiles_router
 from rpl_activities.src.routers.activities import router as activities_router
 from rpl_activities.src.routers.activity_tests import router as activity_tests_router
 from rpl_activities.src.routers.submissions import router as submissions_router
 from rpl_activities.src.routers.stats import router as stats_router
+from rpl_activities.src.routers.auth_cache import router as auth_cache_router
 
 
-app = FastAPI(lifespan=users_api_conn_lifespan, **FASTAPI_METADATA)
+app = FastAPI(lifespan=api_lifespan, **FASTAPI_METADATA)
 
 
 app.add_middleware(
@@ -25,6 +26,7 @@ app.include_router(activities_router)
 app.include_router(activity_tests_router)
 app.include_router(submissions_router)
 app.include_router(stats_router)
+app.include_router(auth_cache_router)
 
 
 # ==============================================================================
@@ -1,31 +1,44 @@
 from datetime import datetime, timezone
+import gzip
+import hashlib
+import json
 import logging
 from typing import Optional
 
+from rpl_activities.src.config import env
 from rpl_activities.src.dtos.activity_dtos import UnitTestSuiteCreationRequestDTO, IOTestRequestDTO
 from rpl_activities.src.dtos.submission_dtos import TestsExecutionLogDTO
 from rpl_activities.src.repositories.base import BaseRepository
 import sqlalchemy as sa
+from sqlalchemy.exc import IntegrityError
 
 from rpl_activities.src.repositories.models import aux_models
 from rpl_activities.src.repositories.rpl_files import RPLFilesRepository
+from rpl_activities.src.repositories.submissions_summaries import SubmissionsSummariesRepository
 
 from .models.activity import Activity
 from .models.rpl_file import RPLFile
 from .models.unit_test_suite import UnitTestSuite
 from .models.io_test import IOTest
+from .models.io_test_snapshot import IOTestSnapshot
 from .models.unit_test_run import UnitTestRun
 from .models.io_test_run import IOTestRun
 from .models.test_execution_log import TestsExecutionLog
 from .models.activity_submission import ActivitySubmission
 
 UNIT_TEST_RUN_PASS = "PASSED"
+TRUNCATED_LOG_MARKER = "\n[... {omitted_chars} more chars truncated: fetch the full log on its own ...]"
+
+
+def sha256_of_text(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
 
 
 class TestsRepository(BaseRepository):
     def __init__(self, db):
         super().__init__(db)
         self.rplfiles_repo = RPLFilesRepository(db)
+        self.summaries_repo = SubmissionsSummariesRepository(db)
 
     def get_io_test_by_id_and_activity_id(self, io_test_id: int, activity_id: int) -> Optional[IOTest]:
         return (
@@ -50,12 +63,66 @@ class TestsRepository(BaseRepository):
             .one_or_none()
         )
 
+    def __get_io_test_snapshot_by_sha256(self, sha256: str) -> Optional[IOTestSnapshot]:
+        return (
+            self.db_session.execute(sa.select(IOTestSnapshot).where(IOTestSnapshot.sha256 == sha256))
+            .scalars()
+            .one_or_none()
+        )
+
+    def __get_or_create_io_test_snapshot(self, name: str, test_in: str, test_out: str) -> IOTestSnapshot:
+        sha256 = hashlib.sha256(json.dumps([name, test_in, test_out]).encode()).hexdigest()
+        snapshot = self.__get_io_test_snapshot_by_sha256(sha256)
+        if snapshot is None:
+            try:
+                with self.db_session.begin_nested():
+                    snapshot = IOTestSnapshot(
+                        sha256=sha256,
+                        name=name,
+                        test_in=test_in,
+                        test_out=test_out,
+                        test_out_sha256=sha256_of_text(test_out),
+                    )
+                    self.db_session.add(snapshot)
+            except IntegrityError:
+                # Created concurrently with the same content
+                snapshot = self.__get_io_test_snapshot_by_sha256(sha256)
+        return snapshot
+
+    def create_missing_io_test_snapshots(self, batch_size: int) -> int:
+        # Migration of existing rows: IO tests created before snapshots existed get theirs (the same as on
+        # their first run). Commits once per batch, and returns how many IO tests were updated.
+        updated = 0
+        while True:
+            legacy_io_tests = (
+                self.db_session.execute(
+                    sa.select(IOTest)
+                    .where(IOTest.snapshot_id.is_(None))
+                    .order_by(IOTest.id)
+                    .limit(batch_size)
+                )
+                .scalars()
+                .all()
+            )
+            if not legacy_io_tests:
+                break
+            for io_test in legacy_io_tests:
+                io_test.snapshot = self.__get_or_create_io_test_snapshot(
+                    io_test.name, io_test.test_in, io_test.test_out
+                )
+            self.db_session.commit()
+            updated += len(legacy_io_tests)
+        return updated
+
     def create_io_test_for_activity(self, new_io_test_data: IOTestRequestDTO, activity: Activity) -> IOTest:
         io_test = IOTest(
             activity_id=activity.id,
             name=new_io_test_data.name,
             test_in=new_io_test_data.test_in,
             test_out=new_io_test_data.test_out,
+            snapshot=self.__get_or_create_io_test_snapshot(
+                new_io_test_data.name, new_io_test_data.test_in, new_io_test_data.test_out
+            ),
             date_created=datetime.now(timezone.utc),
             last_updated=datetime.now(timezone.utc),
         )
@@ -70,6 +137,7 @@ class TestsRepository(BaseRepository):
             name=io_test.name,
             test_in=io_test.test_in,
             test_out=io_test.test_out,
+            snapshot_id=io_test.snapshot_id,
             date_created=datetime.now(timezone.utc),
             last_updated=datetime.now(timezone.utc),
         )
@@ -84,6 +152,10 @@ class TestsRepository(BaseRepository):
         io_test.name = new_io_test_data.name
         io_test.test_in = new_io_test_data.test_in
         io_test.test_out = new_io_test_data.test_out
+        # Previous snapshot is kept as is: past runs keep showing what they were tested against
+        io_test.snapshot = self.__get_or_create_io_test_snapshot(
+            new_io_test_data.name, new_io_test_data.test_in, new_io_test_data.test_out
+        )
         io_test.last_updated = datetime.now(timezone.utc)
         self.db_session.commit()
         self.db_session.refresh(io_test)
@@ -149,76 +221,151 @@ class TestsRepository(BaseRepository):
 
     # ==============================================================================
 
-    def save_tests_execution_log_for_submission(
-        self, new_execution_log_data: TestsExecutionLogDTO, submission: ActivitySubmission
-    ) -> tuple[TestsExecutionLog, ActivitySubmission]:
-        test_execution_log = TestsExecutionLog(
-            activity_submission_id=submission.id,
-            success=(
-                new_execution_log_data.tests_execution_result_status
-                == aux_models.TestsExecutionResultStatus.SUCCESS
-            ),
-            exit_message=new_execution_log_data.tests_execution_exit_message,
-            stderr=new_execution_log_data.tests_execution_stderr,
-            stdout=new_execution_log_data.tests_execution_stdout,
-            date_created=datetime.now(timezone.utc),
-            last_updated=datetime.now(timezone.utc),
-        )
-        self.db_session.add(test_execution_log)
-        self.db_session.commit()
-        self.db_session.refresh(test_execution_log)
-        self.db_session.refresh(submission)
-        return test_execution_log, submission
+    def __get_expected_output_sha256(self, io_test: IOTest) -> str:
+        if io_test.snapshot is not None:
+            return io_test.snapshot.test_out_sha256
+        return sha256_of_text(io_test.test_out)
 
-    def __check_if_all_io_tests_passed(self, io_tests: list[IOTest], io_test_runs: list[IOTestRun]) -> bool:
-        if len(io_tests) != len(io_test_runs):
+    def check_if_all_io_tests_passed(
+        self, io_tests: list[IOTest], new_execution_log_data: TestsExecutionLogDTO
+    ) -> bool:
+        student_outputs_per_run = new_execution_log_data.all_student_only_outputs_from_iotests_runs or []
+        if len(student_outputs_per_run) < len(io_tests):
             # Not all IO tests were run
             return False
+        return all(
+            sha256_of_text(student_output) == self.__get_expected_output_sha256(io_test)
+            for io_test, student_output in zip(io_tests, student_outputs_per_run)
+        )
 
-        for io_test_run in io_test_runs:
-            if io_test_run.run_output != io_test_run.expected_output:
-                return False
-        return True
+    def __build_io_test_run(self, io_test: IOTest, student_output: str) -> dict:
+        if sha256_of_text(student_output) == io_test.snapshot.test_out_sha256:
+            return {
+                "io_test_snapshot_id": io_test.snapshot_id,
+                "passed": True,
+                "run_output": None,
+                "run_output_truncated": False,
+                "full_run_output_blob_id": None,
+            }
+        run_output = student_output[: env.IO_TEST_RUN_OUTPUT_MAX_CHARS]
+        run_output_truncated = len(run_output) < len(student_output)
+        full_run_output_blob_id = None
+        if run_output_truncated and env.IO_TEST_RUN_KEEP_FULL_OUTPUT:
+            full_run_output_blob = self.rplfiles_repo.store_blob(
+                gzip.compress(student_output.encode(), mtime=0)
+            )
+            full_run_output_blob_id = full_run_output_blob.id
+        return {
+            "io_test_snapshot_id": io_test.snapshot_id,
+            "passed": False,
+            "run_output": run_output,
+            "run_output_truncated": run_output_truncated,
+            "full_run_output_blob_id": full_run_output_blob_id,
+        }
 
-    def save_io_test_runs_from_exec_log_and_check_if_all_passed(
+    def check_if_all_unit_tests_passed(self, new_execution_log_data: TestsExecutionLogDTO) -> bool:
+        suite_summary = new_execution_log_data.unit_test_suite_result_summary
+        if not suite_summary:
+            return False
+        return suite_summary.amount_failed == 0 and suite_summary.amount_errored == 0
+
+    def __build_io_test_runs(
         self, io_tests: list[IOTest], test_execution_log_id: int, new_execution_log_data: TestsExecutionLogDTO
-    ) -> bool:
-        student_outputs_per_run = new_execution_log_data.all_student_only_outputs_from_iotests_runs
+    ) -> list[dict]:
+        now = datetime.now(timezone.utc)
+        student_outputs_per_run = new_execution_log_data.all_student_only_outputs_from_iotests_runs or []
+        legacy_io_tests = [io_test for io_test in io_tests if io_test.snapshot_id is None]
+        for io_test in legacy_io_tests:
+            # IO tests created before snapshots existed get theirs on their first run
+            io_test.snapshot = self.__get_or_create_io_test_snapshot(
+                io_test.name, io_test.test_in, io_test.test_out
+            )
+        if legacy_io_tests:
+            self.db_session.flush()
+        # Inputs and expected outputs are read from the snapshot, and only outputs of failed runs are kept
         io_test_runs = []
         for io_test, student_output in zip(io_tests, student_outputs_per_run):
-            io_test_run = IOTestRun(
-                tests_execution_log_id=test_execution_log_id,
-                test_name=io_test.name,
-                test_in=io_test.test_in,
-                expected_output=io_test.test_out,
-                run_output=student_output,
-                date_created=datetime.now(timezone.utc),
+            io_test_run = self.__build_io_test_run(io_test, student_output)
+            io_test_runs.append(
+                {"tests_execution_log_id": test_execution_log_id, "date_created": now, **io_test_run}
             )
-            io_test_runs.append(io_test_run)
-
-        self.db_session.add_all(io_test_runs)
-        self.db_session.commit()
-        return self.__check_if_all_io_tests_passed(io_tests, io_test_runs)
+        return io_test_runs
 
-    def save_unit_test_runs_from_exec_log_and_check_if_all_passed(
+    def __build_unit_test_runs(
         self, test_execution_log_id: int, new_execution_log_data: TestsExecutionLogDTO
-    ) -> bool:
+    ) -> list[dict]:
+        now = datetime.now(timezone.utc)
         suite_summary = new_execution_log_data.unit_test_suite_result_summary
         if not suite_summary:
-            return False
+            return []
+        return [
+            {
+                "tests_execution_log_id": test_execution_log_id,
+                "test_name": single_test_report.name,
+                "passed": single_test_report.status == UNIT_TEST_RUN_PASS,
+                "error_messages": single_test_report.messages or "",
+                "date_created": now,
+            }
+            for single_test_report in suite_summary.single_test_reports
+        ]
 
-        unit_test_runs = []
-        for single_test_report in suite_summary.single_test_reports:
-            unit_test_run = UnitTestRun(
-                tests_execution_log_id=test_execution_log_id,
-                test_name=single_test_report.name,
-                passed=(single_test_report.status == UNIT_TEST_RUN_PASS),
-                error_messages=single_test_report.messages or "",
-                date_created=datetime.now(timezone.utc),
-            )
-            unit_test_runs.append(unit_test_run)
-        self.db_session.add_all(unit_test_runs)
-        self.db_session.commit()
+    def __build_capped_log(self, log: str) -> tuple[str, Optional[int]]:
+        # (capped log, id of the blob with the full one if it was truncated and has to be kept)
+        if len(log) <= env.TESTS_EXECUTION_LOG_MAX_CHARS:
+            return log, None
+        capped_log = log[: env.TESTS_EXECUTION_LOG_MAX_CHARS] + TRUNCATED_LOG_MARKER.format(
+            omitted_chars=len(log) - env.TESTS_EXECUTION_LOG_MAX_CHARS
+        )
+        if not env.TESTS_EXECUTION_LOG_KEEP_FULL:
+            return capped_log, None
+        return capped_log, self.rplfiles_repo.store_blob(gzip.compress(log.encode(), mtime=0)).id
 
-        passed_all_tests = suite_summary.amount_failed == 0 and suite_summary.amount_errored == 0
-        return passed_all_tests
+    def save_tests_execution_log_for_submission(
+        self,
+        new_execution_log_data: TestsExecutionLogDTO,
+        submission: ActivitySubmission,
+        new_submission_status: aux_models.SubmissionStatus,
+    ) -> TestsExecutionLog:
+        # Single unit of work: the log, its test runs and the new submission status are committed together,
+        # and the test runs are bulk inserted (one executemany, however many tests there are).
+        now = datetime.now(timezone.utc)
+        stderr, full_stderr_blob_id = self.__build_capped_log(new_execution_log_data.tests_execution_stderr)
+        stdout, full_stdout_blob_id = self.__build_capped_log(new_execution_log_data.tests_execution_stdout)
+        test_execution_log = TestsExecutionLog(
+            activity_submission_id=submission.id,
+            success=(
+                new_execution_log_data.tests_execution_result_status
+                == aux_models.TestsExecutionResultStatus.SUCCESS
+            ),
+            exit_message=new_execution_log_data.tests_execution_exit_message,
+            stderr=stderr,
+            stdout=stdout,
+            full_stderr_blob_id=full_stderr_blob_id,
+            full_stdout_blob_id=full_stdout_blob_id,
+            date_created=now,
+            last_updated=now,
+        )
+        self.db_session.add(test_execution_log)
+        self.db_session.flush()
+
+        if (
+            new_execution_log_data.tests_execution_result_status
+            != aux_models.TestsExecutionResultStatus.ERROR
+        ):
+            if submission.activity.is_io_tested:
+                io_test_runs = self.__build_io_test_runs(
+                    submission.activity.io_tests, test_execution_log.id, new_execution_log_data
+                )
+                if io_test_runs:
+                    self.db_session.execute(sa.insert(IOTestRun), io_test_runs)
+            elif submission.activity.unit_test_suite:
+                unit_test_runs = self.__build_unit_test_runs(test_execution_log.id, new_execution_log_data)
+                if unit_test_runs:
+                    self.db_session.execute(sa.insert(UnitTestRun), unit_test_runs)
+
+        previous_status = submission.status
+        submission.status = new_submission_status
+        submission.last_updated = now
+        self.summaries_repo.apply_status_change(submission, previous_status)
+        self.db_session.commit()
+        return test_execution_log
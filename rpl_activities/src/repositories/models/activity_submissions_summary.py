@@ -0,0 +1,51 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import ForeignKey, Index, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+
+from . import aux_models
+from .base_model import Base, BigInt, IntPK
+
+# Column of the summary that counts the submissions in each status
+SUBMISSIONS_COUNT_COLUMN_BY_STATUS = {
+    aux_models.SubmissionStatus.PENDING: "pending_submissions",
+    aux_models.SubmissionStatus.ENQUEUED: "enqueued_submissions",
+    aux_models.SubmissionStatus.PROCESSING: "processing_submissions",
+    aux_models.SubmissionStatus.BUILD_ERROR: "submissions_with_build_errors",
+    aux_models.SubmissionStatus.RUNTIME_ERROR: "submissions_with_runtime_errors",
+    aux_models.SubmissionStatus.FAILURE: "submissions_with_failures",
+    aux_models.SubmissionStatus.SUCCESS: "successful_submissions",
+    aux_models.SubmissionStatus.TIME_OUT: "submissions_with_time_out",
+}
+
+
+class ActivitySubmissionsSummary(Base):
+    # Submissions of a user at an activity, kept up to date in the same transaction as the submissions
+    # themselves (see SubmissionsSummariesRepository). Can be regenerated with the rebuild script.
+    __tablename__ = "activity_submissions_summaries"
+    __table_args__ = (
+        UniqueConstraint("activity_id", "user_id"),
+        Index("ix_activity_submissions_summaries_course_id_user_id", "course_id", "user_id"),
+    )
+
+    id: Mapped[IntPK]
+    course_id: Mapped[BigInt]
+    activity_id: Mapped[BigInt] = mapped_column(ForeignKey("activities.id"))
+    user_id: Mapped[BigInt]
+    total_submissions: Mapped[int] = mapped_column(default=0)
+    pending_submissions: Mapped[int] = mapped_column(default=0)
+    enqueued_submissions: Mapped[int] = mapped_column(default=0)
+    processing_submissions: Mapped[int] = mapped_column(default=0)
+    submissions_with_build_errors: Mapped[int] = mapped_column(default=0)
+    submissions_with_runtime_errors: Mapped[int] = mapped_column(default=0)
+    submissions_with_failures: Mapped[int] = mapped_column(default=0)
+    successful_submissions: Mapped[int] = mapped_column(default=0)
+    submissions_with_time_out: Mapped[int] = mapped_column(default=0)
+    best_status_rank: Mapped[int] = mapped_column(default=0)
+    first_success_date: Mapped[Optional[datetime]]
+    last_submission_date: Mapped[Optional[datetime]]
+
+    @property
+    def best_status(self) -> aux_models.SubmissionStatus:
+        return aux_models.SubmissionStatus.from_rank(self.best_status_rank)
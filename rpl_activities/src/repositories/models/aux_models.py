@@ -54,6 +54,19 @@ class SubmissionStatus(str, Enum):
     SUCCESS = "SUCCESS"
     TIME_OUT = "TIME_OUT"
 
+    @property
+    def has_finished(self) -> bool:
+        return self not in (SubmissionStatus.PENDING, SubmissionStatus.ENQUEUED, SubmissionStatus.PROCESSING)
+
+    @property
+    def rank(self) -> int:
+        # The "best" status of many submissions is the one with the highest rank
+        return list(SubmissionStatus).index(self)
+
+    @classmethod
+    def from_rank(cls, rank: int) -> "SubmissionStatus":
+        return list(cls)[rank]
+
     @classmethod
     def from_tests_execution_errored_stage(cls, tests_execution_stage: str) -> "SubmissionStatus":
         if tests_execution_stage == "BUILD":
@@ -68,6 +81,17 @@ class TestsExecutionResultStatus(str, Enum):
     TIME_OUT = "TIME_OUT"
 
 
+class TestsExecutionLogStream(str, Enum):
+    STDOUT = "stdout"
+    STDERR = "stderr"
+
+
+class SubmissionsReprocessingJobStatus(str, Enum):
+    RUNNING = "RUNNING"
+    FINISHED = "FINISHED"
+    FAILED = "FAILED"
+
+
 class RPLFileType(str, Enum):
     GZIP = "application/gzip"
     TEXT = "text"
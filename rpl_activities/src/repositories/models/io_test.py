@@ -1,7 +1,9 @@
+from typing import Optional
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
     from rpl_activities.src.repositories.models.activity import Activity
+    from rpl_activities.src.repositories.models.io_test_snapshot import IOTestSnapshot
 
 from sqlalchemy import ForeignKey
 from sqlalchemy.orm import Mapped, mapped_column, relationship
@@ -17,7 +19,10 @@ class IOTest(Base):
     name: Mapped[LargeStr]
     test_in: Mapped[TextStr]
     test_out: Mapped[TextStr]
+    # Current (immutable) version of name, test_in and test_out: the one referenced by new IO test runs
+    snapshot_id: Mapped[Optional[BigInt]] = mapped_column(ForeignKey("io_test_snapshots.id"))
     date_created: Mapped[AutoDateTime]
     last_updated: Mapped[AutoDateTime]
 
     activity: Mapped["Activity"] = relationship(back_populates="io_tests")
+    snapshot: Mapped[Optional["IOTestSnapshot"]] = relationship(lazy="joined")
@@ -2,6 +2,8 @@ from typing import Optional
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
+    from rpl_activities.src.repositories.models.io_test_snapshot import IOTestSnapshot
+    from rpl_activities.src.repositories.models.rpl_file_blob import RPLFileBlob
     from rpl_activities.src.repositories.models.test_execution_log import TestsExecutionLog
 
 from sqlalchemy import ForeignKey
@@ -15,10 +17,20 @@ class IOTestRun(Base):
 
     id: Mapped[IntPK]
     tests_execution_log_id: Mapped[BigInt] = mapped_column(ForeignKey("tests_execution_logs.id"))
-    test_name: Mapped[LargeStr]
+    io_test_snapshot_id: Mapped[Optional[BigInt]] = mapped_column(ForeignKey("io_test_snapshots.id"))
+    # Only set in runs saved before IO test snapshots existed (newer ones use io_test_snapshot instead)
+    test_name: Mapped[Optional[LargeStr]]
     test_in: Mapped[Optional[TextStr]]
-    expected_output: Mapped[TextStr]
-    run_output: Mapped[TextStr]
+    expected_output: Mapped[Optional[TextStr]]
+    # None in passing runs (the output is the expected one). Failed ones keep a bounded prefix of it,
+    # and its full (gzipped) version if it didn't fit.
+    run_output: Mapped[Optional[TextStr]]
+    # Whether run_output is only a prefix of the output (whether or not the full one was kept)
+    run_output_truncated: Mapped[Optional[bool]]
+    passed: Mapped[Optional[bool]]
+    full_run_output_blob_id: Mapped[Optional[BigInt]] = mapped_column(ForeignKey("rpl_file_blobs.id"))
     date_created: Mapped[AutoDateTime]
 
     tests_execution_log: Mapped["TestsExecutionLog"] = relationship(back_populates="io_test_runs")
+    io_test_snapshot: Mapped[Optional["IOTestSnapshot"]] = relationship(lazy="selectin")
+    full_run_output_blob: Mapped[Optional["RPLFileBlob"]] = relationship()
@@ -0,0 +1,17 @@
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .base_model import Base, AutoDateTime, IntPK, LargeStr, Str, TextStr
+
+
+class IOTestSnapshot(Base):
+    # Immutable version of an IO test, shared by every IOTestRun made against that same content
+    __tablename__ = "io_test_snapshots"
+
+    id: Mapped[IntPK]
+    sha256: Mapped[Str] = mapped_column(unique=True)
+    name: Mapped[LargeStr]
+    test_in: Mapped[TextStr]
+    test_out: Mapped[TextStr]
+    # IO test runs are compared against this digest instead of the full expected output
+    test_out_sha256: Mapped[Str]
+    date_created: Mapped[AutoDateTime]
@@ -8,3 +8,8 @@ from .rpl_file import RPLFile
 from .test_execution_log import TestsExecutionLog
 from .unit_test_run import UnitTestRun
 from .unit_test_suite import UnitTestSuite
+from .submission_dispatch import SubmissionDispatch
+from .rpl_file_blob import RPLFileBlob
+from .io_test_snapshot import IOTestSnapshot
+from .activity_submissions_summary import ActivitySubmissionsSummary
+from .submissions_reprocessing_job import SubmissionsReprocessingJob
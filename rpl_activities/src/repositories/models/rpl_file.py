@@ -4,13 +4,15 @@ from typing import TYPE_CHECKING
 if TYPE_CHECKING:
     from rpl_activities.src.repositories.models.activity import Activity
     from rpl_activities.src.repositories.models.activity_submission import ActivitySubmission
+    from rpl_activities.src.repositories.models.rpl_file_blob import RPLFileBlob
     from rpl_activities.src.repositories.models.unit_test_suite import UnitTestSuite
 
 
-from sqlalchemy.orm import Mapped, relationship
+from sqlalchemy import ForeignKey
+from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 
-from .base_model import Base, AutoDateTime, IntPK, Str
+from .base_model import Base, AutoDateTime, BigInt, IntPK, Str
 
 
 class RPLFile(Base):
@@ -19,10 +21,26 @@ class RPLFile(Base):
     id: Mapped[IntPK]
     file_name: Mapped[Str]
     file_type: Mapped[Str]
-    data: Mapped[Optional[bytes]]
+    # Rows created before the blob storage keep their payload inline
+    stored_data: Mapped[Optional[bytes]] = mapped_column("data", deferred=True)
+    blob_id: Mapped[Optional[BigInt]] = mapped_column(ForeignKey("rpl_file_blobs.id"))
+    # If set, data only holds the files that differ from (i.e. overlay) the ones of this base rplfile
+    base_rplfile_id: Mapped[Optional[BigInt]] = mapped_column(ForeignKey("rpl_files.id"))
     date_created: Mapped[AutoDateTime]
     last_updated: Mapped[AutoDateTime]
 
     activity: Mapped[Optional["Activity"]] = relationship(back_populates="starting_rplfile")
     submission: Mapped[Optional["ActivitySubmission"]] = relationship(back_populates="solution_rplfile")
     unit_test_suite: Mapped[Optional["UnitTestSuite"]] = relationship(back_populates="test_rplfile")
+    base_rplfile: Mapped[Optional["RPLFile"]] = relationship(remote_side="RPLFile.id")
+    blob: Mapped[Optional["RPLFileBlob"]] = relationship()
+
+    @property
+    def data(self) -> Optional[bytes]:
+        return self.blob.read_data() if self.blob is not None else self.stored_data
+
+    @data.setter
+    def data(self, value: Optional[bytes]):
+        # Inline storage. RPLFilesRepository stores new payloads as (deduplicated) blobs instead
+        self.blob = None
+        self.stored_data = value
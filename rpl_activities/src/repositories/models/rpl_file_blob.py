@@ -0,0 +1,29 @@
+from typing import Optional
+
+from sqlalchemy.orm import Mapped, mapped_column
+
+from rpl_activities.src.deps import blob_storage
+from .base_model import Base, AutoDateTime, BigInt, IntPK, Str
+
+
+class RPLFileBlob(Base):
+    # Content-addressed payload shared by every RPLFile with the same bytes (clones, identical uploads)
+    __tablename__ = "rpl_file_blobs"
+
+    id: Mapped[IntPK]
+    sha256: Mapped[Str] = mapped_column(unique=True)
+    size: Mapped[BigInt]
+    # Where the payload lives: "database" (data column) or an external blob storage (keyed by sha256)
+    storage: Mapped[Str] = mapped_column(default=blob_storage.DATABASE_STORAGE)
+    data: Mapped[Optional[bytes]] = mapped_column(deferred=True)
+    date_created: Mapped[AutoDateTime]
+    last_referenced: Mapped[AutoDateTime]
+
+    @property
+    def is_external(self) -> bool:
+        return self.storage != blob_storage.DATABASE_STORAGE
+
+    def read_data(self) -> bytes:
+        if not self.is_external:
+            return self.data
+        return blob_storage.get_rplfiles_storage(self.storage).get(self.sha256)
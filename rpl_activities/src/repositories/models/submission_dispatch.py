@@ -0,0 +1,26 @@
+from datetime import datetime
+from typing import Optional
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from rpl_activities.src.repositories.models.activity_submission import ActivitySubmission
+
+from sqlalchemy import ForeignKey
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+
+from .base_model import Base, BigInt, AutoDateTime, IntPK, Str
+
+
+class SubmissionDispatch(Base):
+    # Transactional outbox: written together with the submission, drained by the SubmissionsDispatcher
+    __tablename__ = "submission_dispatches"
+
+    id: Mapped[IntPK]
+    submission_id: Mapped[BigInt] = mapped_column(ForeignKey("activity_submissions.id"))
+    language: Mapped[Str]
+    dispatched: Mapped[bool] = mapped_column(default=False, index=True)
+    attempts: Mapped[int] = mapped_column(default=0)
+    date_created: Mapped[AutoDateTime]
+    date_dispatched: Mapped[Optional[datetime]]
+
+    submission: Mapped["ActivitySubmission"] = relationship()
@@ -0,0 +1,26 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .base_model import Base, AutoDateTime, IntPK, Str, TextStr
+
+
+class SubmissionsReprocessingJob(Base):
+    # Progress of a reprocessing run in the background by one of the workers, readable from any of them
+    __tablename__ = "submissions_reprocessing_jobs"
+
+    id: Mapped[IntPK]
+    status: Mapped[Str]
+    # The SubmissionsReprocessingRequestDTO (as JSON) it was started with
+    parameters: Mapped[TextStr]
+    # True while running, None afterwards: being unique, only one job can be running at a time
+    running: Mapped[Optional[bool]] = mapped_column(unique=True)
+    total: Mapped[int] = mapped_column(default=0)
+    processed: Mapped[int] = mapped_column(default=0)
+    batches: Mapped[int] = mapped_column(default=0)
+    error: Mapped[Optional[TextStr]]
+    date_created: Mapped[AutoDateTime]
+    # Updated on every batch: running jobs not updated for a while were interrupted (e.g. by a restart)
+    last_updated: Mapped[AutoDateTime]
+    date_finished: Mapped[Optional[datetime]]
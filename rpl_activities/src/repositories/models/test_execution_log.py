@@ -4,6 +4,7 @@ from typing import TYPE_CHECKING
 if TYPE_CHECKING:
     from rpl_activities.src.repositories.models.activity_submission import ActivitySubmission
     from rpl_activities.src.repositories.models.io_test_run import IOTestRun
+    from rpl_activities.src.repositories.models.rpl_file_blob import RPLFileBlob
     from rpl_activities.src.repositories.models.unit_test_run import UnitTestRun
 
 from sqlalchemy import ForeignKey
@@ -19,11 +20,17 @@ class TestsExecutionLog(Base):
     activity_submission_id: Mapped[BigInt] = mapped_column(ForeignKey("activity_submissions.id"))
     success: Mapped[bool]
     exit_message: Mapped[Str]
+    # Capped at TESTS_EXECUTION_LOG_MAX_CHARS (with a truncation marker). The full (gzipped) logs of
+    # truncated ones are kept in the blob storage, and only read by the full log endpoint.
     stderr: Mapped[Optional[TextStr]]
     stdout: Mapped[Optional[TextStr]]
+    full_stderr_blob_id: Mapped[Optional[BigInt]] = mapped_column(ForeignKey("rpl_file_blobs.id"))
+    full_stdout_blob_id: Mapped[Optional[BigInt]] = mapped_column(ForeignKey("rpl_file_blobs.id"))
     date_created: Mapped[AutoDateTime]
     last_updated: Mapped[AutoDateTime]
 
     submission: Mapped["ActivitySubmission"] = relationship(back_populates="tests_execution_log")
     io_test_runs: Mapped[List["IOTestRun"]] = relationship(back_populates="tests_execution_log")
     unit_test_runs: Mapped[List["UnitTestRun"]] = relationship(back_populates="tests_execution_log")
+    full_stderr_blob: Mapped[Optional["RPLFileBlob"]] = relationship(foreign_keys=[full_stderr_blob_id])
+    full_stdout_blob: Mapped[Optional["RPLFileBlob"]] = relationship(foreign_keys=[full_stdout_blob_id])
@@ -1,7 +1,15 @@
-from typing import Optional
+from datetime import datetime, timezone
+import hashlib
+from typing import Iterator, Optional
+from sqlalchemy.exc import IntegrityError
+from rpl_activities.src.deps import blob_storage, tar_utils
+from rpl_activities.src.deps.extracted_files_cache import starting_files_cache
 from rpl_activities.src.repositories.base import BaseRepository
 import sqlalchemy as sa
+from .models.io_test_run import IOTestRun
 from .models.rpl_file import RPLFile
+from .models.rpl_file_blob import RPLFileBlob
+from .models.test_execution_log import TestsExecutionLog
 
 
 class RPLFilesRepository(BaseRepository):
@@ -11,25 +19,236 @@ class RPLFilesRepository(BaseRepository):
             self.db_session.execute(sa.select(RPLFile).where(RPLFile.id == file_id)).scalars().one_or_none()
         )
 
-    def create_rplfile(self, file_name: str, file_type: str, data: bytes) -> RPLFile:
-        rplfile = RPLFile(file_name=file_name, file_type=file_type, data=data)
+    # =================================================================
+
+    def __get_blob_by_sha256(self, sha256: str) -> Optional[RPLFileBlob]:
+        # Shared lock: the blob can't be collected while the new reference to it is being committed
+        return (
+            self.db_session.execute(
+                sa.select(RPLFileBlob).where(RPLFileBlob.sha256 == sha256).with_for_update(read=True)
+            )
+            .scalars()
+            .one_or_none()
+        )
+
+    def __get_or_create_blob(self, data: bytes) -> RPLFileBlob:
+        sha256 = hashlib.sha256(data).hexdigest()
+        blob = self.__get_blob_by_sha256(sha256)
+        if blob is None:
+            # Stored before the row exists: a committed blob always points to an existing payload
+            storage = blob_storage.rplfiles_storage
+            if storage is not None:
+                storage.put(sha256, data)
+            try:
+                with self.db_session.begin_nested():
+                    blob = RPLFileBlob(sha256=sha256, size=len(data))
+                    if storage is None:
+                        blob.data = data
+                    else:
+                        blob.storage = storage.name
+                    self.db_session.add(blob)
+            except IntegrityError:
+                # Created concurrently by another request with the same content
+                blob = self.__get_blob_by_sha256(sha256)
+        blob.last_referenced = datetime.now(timezone.utc)
+        return blob
+
+    def __get_or_create_blob_of(self, rplfile: RPLFile) -> RPLFileBlob:
+        if rplfile.blob is None:
+            # Inline (legacy) payload: moved to the blob storage so that it is shared from now on
+            rplfile.blob = self.__get_or_create_blob(rplfile.stored_data or b"")
+            rplfile.stored_data = None
+        return rplfile.blob
+
+    def store_blob(self, data: bytes) -> RPLFileBlob:
+        # For payloads referenced by other tables (not committed: it's up to the caller)
+        return self.__get_or_create_blob(data)
+
+    def __blob_is_unreferenced(self) -> sa.ColumnElement[bool]:
+        return sa.and_(
+            ~sa.exists().where(RPLFile.blob_id == RPLFileBlob.id),
+            ~sa.exists().where(IOTestRun.full_run_output_blob_id == RPLFileBlob.id),
+            ~sa.exists().where(
+                sa.or_(
+                    TestsExecutionLog.full_stdout_blob_id == RPLFileBlob.id,
+                    TestsExecutionLog.full_stderr_blob_id == RPLFileBlob.id,
+                )
+            ),
+        )
+
+    def __delete_blob_if_unreferenced(self, blob_id: Optional[int]):
+        # Only for blobs stored in the database. External payloads could be re-put by a concurrent
+        # upload of the same content, so they are left to delete_unreferenced_blobs (with a grace period).
+        if blob_id is None:
+            return
+        self.db_session.flush()
+        self.db_session.execute(
+            sa.delete(RPLFileBlob)
+            .where(
+                RPLFileBlob.id == blob_id,
+                RPLFileBlob.storage == blob_storage.DATABASE_STORAGE,
+                self.__blob_is_unreferenced(),
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+    def delete_unreferenced_blobs(self, last_referenced_before: datetime) -> int:
+        # Full sweep. Reusing a blob updates its last_referenced, so recently (re)used ones are kept.
+        unreferenced_blobs = self.db_session.execute(
+            sa.select(RPLFileBlob.id, RPLFileBlob.sha256, RPLFileBlob.storage).where(
+                RPLFileBlob.last_referenced < last_referenced_before, self.__blob_is_unreferenced()
+            )
+        ).all()
+        if not unreferenced_blobs:
+            return 0
+        self.db_session.execute(
+            sa.delete(RPLFileBlob)
+            .where(RPLFileBlob.id.in_([blob.id for blob in unreferenced_blobs]))
+            .execution_options(synchronize_session=False)
+        )
+        self.db_session.commit()
+        for blob in unreferenced_blobs:
+            if blob.storage != blob_storage.DATABASE_STORAGE:
+                blob_storage.get_rplfiles_storage(blob.storage).delete(blob.sha256)
+        return len(unreferenced_blobs)
+
+    def move_payloads_to_current_storage(self, batch_size: int) -> dict[str, int]:
+        # Migration of existing rows: inline (legacy) rplfiles are moved to blobs, and blobs stored in
+        # the database are moved to the configured external storage (if any). Commits once per batch.
+        moved = {"inline_rplfiles": 0, "database_blobs": 0}
+        while True:
+            inline_rplfiles = (
+                self.db_session.execute(
+                    sa.select(RPLFile)
+                    .where(RPLFile.blob_id.is_(None), RPLFile.stored_data.is_not(None))
+                    .order_by(RPLFile.id)
+                    .limit(batch_size)
+                )
+                .scalars()
+                .all()
+            )
+            if not inline_rplfiles:
+                break
+            for rplfile in inline_rplfiles:
+                self.__get_or_create_blob_of(rplfile)
+            self.db_session.commit()
+            moved["inline_rplfiles"] += len(inline_rplfiles)
+
+        storage = blob_storage.rplfiles_storage
+        while storage is not None:
+            database_blobs = (
+                self.db_session.execute(
+                    sa.select(RPLFileBlob)
+                    .where(RPLFileBlob.storage == blob_storage.DATABASE_STORAGE)
+                    .order_by(RPLFileBlob.id)
+                    .limit(batch_size)
+                )
+                .scalars()
+                .all()
+            )
+            if not database_blobs:
+                break
+            for blob in database_blobs:
+                storage.put(blob.sha256, blob.data)
+                blob.storage = storage.name
+                blob.data = None
+            self.db_session.commit()
+            moved["database_blobs"] += len(database_blobs)
+        return moved
+
+    # =================================================================
+
+    def create_rplfile(
+        self, file_name: str, file_type: str, data: bytes, base_rplfile_id: Optional[int] = None
+    ) -> RPLFile:
+        rplfile = RPLFile(
+            file_name=file_name,
+            file_type=file_type,
+            blob=self.__get_or_create_blob(data),
+            base_rplfile_id=base_rplfile_id,
+        )
         self.db_session.add(rplfile)
         self.db_session.commit()
         self.db_session.refresh(rplfile)
         return rplfile
 
     def clone_rplfile(self, rplfile: RPLFile) -> RPLFile:
-        new_rplfile = RPLFile(file_name=rplfile.file_name, file_type=rplfile.file_type, data=rplfile.data)
+        # Only metadata is copied: both rplfiles point to the same blob
+        new_rplfile = RPLFile(
+            file_name=rplfile.file_name,
+            file_type=rplfile.file_type,
+            blob=self.__get_or_create_blob_of(rplfile),
+            base_rplfile_id=rplfile.base_rplfile_id,
+        )
         self.db_session.add(new_rplfile)
         self.db_session.commit()
         self.db_session.refresh(new_rplfile)
         return new_rplfile
 
+    def __freeze_rplfile_for_its_overlays(self, rplfile: RPLFile):
+        # Overlays (i.e. delta submissions) must keep seeing the files they were created over, so
+        # they are moved to a snapshot of the current content before it gets overwritten.
+        has_overlays = self.db_session.execute(
+            sa.select(sa.exists().where(RPLFile.base_rplfile_id == rplfile.id))
+        ).scalar()
+        if not has_overlays:
+            return
+        snapshot = RPLFile(
+            file_name=rplfile.file_name,
+            file_type=rplfile.file_type,
+            blob=self.__get_or_create_blob_of(rplfile),
+        )
+        self.db_session.add(snapshot)
+        self.db_session.flush()
+        self.db_session.execute(
+            sa.update(RPLFile)
+            .where(RPLFile.base_rplfile_id == rplfile.id)
+            .values(base_rplfile_id=snapshot.id)
+            .execution_options(synchronize_session=False)
+        )
+
     def update_rplfile(self, rplfile_id: int, file_name: str, file_type: str, data: bytes) -> RPLFile:
         rplfile = self.get_by_id(rplfile_id)
+        self.__freeze_rplfile_for_its_overlays(rplfile)
+        previous_blob_id = rplfile.blob_id
         rplfile.file_name = file_name
         rplfile.file_type = file_type
-        rplfile.data = data
+        rplfile.blob = self.__get_or_create_blob(data)
+        rplfile.stored_data = None
+        rplfile.last_updated = datetime.now(timezone.utc)
+        self.__delete_blob_if_unreferenced(previous_blob_id)
         self.db_session.commit()
+        starting_files_cache.invalidate(rplfile_id)
         self.db_session.refresh(rplfile)
         return rplfile
+
+    # =================================================================
+
+    def get_materialized_data(self, rplfile: RPLFile) -> bytes:
+        if rplfile.base_rplfile_id is None:
+            return rplfile.data
+        return tar_utils.merge_tar_gz(self.get_materialized_data(rplfile.base_rplfile), rplfile.data)
+
+    def get_content_digest(self, rplfile: RPLFile) -> str:
+        # Identifies the materialized content without reading it (except for legacy inline rplfiles)
+        if rplfile.blob is not None:
+            digest = rplfile.blob.sha256
+        else:
+            digest = hashlib.sha256(rplfile.stored_data or b"").hexdigest()
+        if rplfile.base_rplfile_id is not None:
+            base_digest = self.get_content_digest(rplfile.base_rplfile)
+            digest = hashlib.sha256(f"{base_digest}:{digest}".encode()).hexdigest()
+        return digest
+
+    def iter_materialized_data(self, rplfile: RPLFile) -> Iterator[bytes]:
+        # Externally stored payloads are streamed as they are read, without loading them whole
+        if rplfile.base_rplfile_id is None and rplfile.blob is not None and rplfile.blob.is_external:
+            return blob_storage.get_rplfiles_storage(rplfile.blob.storage).iter_chunks(rplfile.blob.sha256)
+        return iter([self.get_materialized_data(rplfile)])
+
+    def get_extracted_files(self, rplfile: RPLFile) -> tar_utils.ExtractedFilesDict:
+        if rplfile.base_rplfile_id is None:
+            return tar_utils.extract_tar_gz_to_dict_of_files(rplfile.data)
+        # Bases are starting files shared by many submissions, so they are served from the cache
+        base_files = starting_files_cache.get_or_extract(rplfile.base_rplfile).files
+        return {**base_files, **tar_utils.extract_tar_gz_to_dict_of_files(rplfile.data)}
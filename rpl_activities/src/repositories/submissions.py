@@ -1,9 +1,10 @@
-from datetime import datetime, timedelta, timezone
-import json
+from datetime import date, datetime, time, timedelta, timezone
+import gzip
 import logging
 from typing import Optional
 from fastapi import UploadFile
 
+from rpl_activities.src.config import env
 from rpl_activities.src.deps.auth import CurrentCourseUser
 from rpl_activities.src.dtos.submission_dtos import (
     IOTestRunResultDTO,
@@ -12,77 +13,129 @@ from rpl_activities.src.dtos.submission_dtos import (
 )
 from rpl_activities.src.repositories.base import BaseRepository
 import sqlalchemy as sa
+from sqlalchemy.orm import selectinload
 
 from rpl_activities.src.repositories.models import aux_models
 from rpl_activities.src.repositories.models.activity import Activity
 from rpl_activities.src.repositories.rpl_files import RPLFilesRepository
+from rpl_activities.src.repositories.submissions_summaries import SubmissionsSummariesRepository
 from rpl_activities.src.deps import tar_utils
+from rpl_activities.src.deps.extracted_files_cache import ExtractedStartingFiles, starting_files_cache
 from .models.activity_submission import ActivitySubmission
+from .models.io_test_run import IOTestRun
+from .models.rpl_file import RPLFile
+from .models.submission_dispatch import SubmissionDispatch
+from .models.test_execution_log import TestsExecutionLog
+from .models.unit_test_suite import UnitTestSuite
 
 
 class SubmissionsRepository(BaseRepository):
     def __init__(self, db):
         super().__init__(db)
         self.rplfiles_repo = RPLFilesRepository(db)
+        self.summaries_repo = SubmissionsSummariesRepository(db)
 
     # =================================================================
 
-    def get_best_submission_status_by_user_at_activity(
-        self, user_id: int, activity: Activity, current_user_submissions_at_activity: list[ActivitySubmission]
-    ) -> aux_models.SubmissionStatus:
-        if len(current_user_submissions_at_activity) == 0:
-            return aux_models.SubmissionStatus.NO_SUBMISSIONS
+    def __count_submissions_with_status(self, status: aux_models.SubmissionStatus) -> sa.ColumnElement[int]:
+        return sa.func.sum(sa.case((ActivitySubmission.status == status, 1), else_=0))
 
-        statuses = [submission.status for submission in current_user_submissions_at_activity]
+    def __submissions_stats_group_key(self, group_by: Optional[str]) -> Optional[sa.ColumnElement]:
+        if group_by == "activity":
+            return ActivitySubmission.activity_id
+        if group_by == "user":
+            return ActivitySubmission.user_id
+        if group_by == "date":
+            return sa.func.date(ActivitySubmission.date_created, type_=sa.Date)
+        return None
 
-        status_order = list(aux_models.SubmissionStatus)
-        best_status = max(statuses, key=lambda status: status_order.index(status))
-        return best_status
-
-    def get_last_submission_date_by_user_at_activity(
-        self, user_id: int, activity: Activity, current_user_submissions_at_activity: list[ActivitySubmission]
-    ) -> Optional[datetime]:
-        if len(current_user_submissions_at_activity) == 0:
-            return None
-        last_submission = max(
-            current_user_submissions_at_activity, key=lambda submission: submission.date_created
-        )
-        return last_submission.date_created - timedelta(hours=3)
-
-    def get_all_submissions_by_user_at_activities(
-        self, user_id: int, activities: list[Activity]
-    ) -> list[ActivitySubmission]:
-        if len(activities) == 0:
+    def get_submissions_stats(
+        self,
+        user_ids: list[int],
+        activity_ids: list[int],
+        date_filter: Optional[date] = None,
+        group_by: Optional[str] = None,
+    ) -> list[sa.Row]:
+        # Computed by the DB: one row per group (ordered by group_key), or a single one if not grouping.
+        # Submissions are first aggregated per submitter, to count submitters with(out) a successful one.
+        if not user_ids or not activity_ids:
             return []
-        return (
-            self.db_session.execute(
-                sa.select(ActivitySubmission).where(
-                    ActivitySubmission.user_id == user_id,
-                    ActivitySubmission.activity_id.in_([activity.id for activity in activities]),
-                )
+        group_key = self.__submissions_stats_group_key(group_by)
+        group_key_columns = [group_key.label("group_key")] if group_key is not None else []
+        conditions = [
+            ActivitySubmission.user_id.in_(user_ids),
+            ActivitySubmission.activity_id.in_(activity_ids),
+        ]
+        if date_filter is not None:
+            day_start = datetime.combine(date_filter, time.min)
+            conditions += [
+                ActivitySubmission.date_created >= day_start,
+                ActivitySubmission.date_created < day_start + timedelta(days=1),
+            ]
+        per_submitter = (
+            sa.select(
+                *group_key_columns,
+                ActivitySubmission.user_id,
+                sa.func.count().label("total_submissions"),
+                self.__count_submissions_with_status(aux_models.SubmissionStatus.SUCCESS).label(
+                    "successful_submissions"
+                ),
+                self.__count_submissions_with_status(aux_models.SubmissionStatus.RUNTIME_ERROR).label(
+                    "submissions_with_runtime_errors"
+                ),
+                self.__count_submissions_with_status(aux_models.SubmissionStatus.BUILD_ERROR).label(
+                    "submissions_with_build_errors"
+                ),
+                self.__count_submissions_with_status(aux_models.SubmissionStatus.FAILURE).label(
+                    "submissions_with_failures"
+                ),
             )
-            .scalars()
-            .all()
+            .where(*conditions)
+            .group_by(*group_key_columns, ActivitySubmission.user_id)
+            .subquery()
         )
-
-    def get_all_submissions_by_users_at_activities(
-        self, user_ids: list[int], activities: list[Activity]
-    ) -> list[ActivitySubmission]:
-        if len(activities) == 0 or len(user_ids) == 0:
-            return []
-        return (
-            self.db_session.execute(
-                sa.select(ActivitySubmission).where(
-                    ActivitySubmission.user_id.in_(user_ids),
-                    ActivitySubmission.activity_id.in_([activity.id for activity in activities]),
-                )
-            )
-            .scalars()
-            .all()
+        per_group_key_columns = [per_submitter.c.group_key] if group_key is not None else []
+        query = sa.select(
+            *per_group_key_columns,
+            sa.func.sum(per_submitter.c.total_submissions).label("total_submissions"),
+            sa.func.sum(per_submitter.c.successful_submissions).label("successful_submissions"),
+            sa.func.sum(per_submitter.c.submissions_with_runtime_errors).label(
+                "submissions_with_runtime_errors"
+            ),
+            sa.func.sum(per_submitter.c.submissions_with_build_errors).label("submissions_with_build_errors"),
+            sa.func.sum(per_submitter.c.submissions_with_failures).label("submissions_with_failures"),
+            sa.func.count().label("total_submitters"),
+            sa.func.sum(sa.case((per_submitter.c.successful_submissions > 0, 1), else_=0)).label(
+                "total_submitters_with_at_least_one_successful_submission"
+            ),
         )
+        if group_key is not None:
+            query = query.group_by(per_submitter.c.group_key).order_by(per_submitter.c.group_key)
+        return self.db_session.execute(query).all()
 
     # =================================================================
 
+    def get_submissions_columns_of_course(
+        self, course_id: int, updated_since: Optional[datetime] = None
+    ) -> list[sa.Row]:
+        # For the in-memory analytics index (see deps/submissions_analytics_index), ordered by id
+        query = (
+            sa.select(
+                ActivitySubmission.id,
+                ActivitySubmission.user_id,
+                ActivitySubmission.activity_id,
+                ActivitySubmission.status,
+                ActivitySubmission.date_created,
+                ActivitySubmission.last_updated,
+            )
+            .join(Activity, Activity.id == ActivitySubmission.activity_id)
+            .where(Activity.course_id == course_id)
+            .order_by(ActivitySubmission.id)
+        )
+        if updated_since is not None:
+            query = query.where(ActivitySubmission.last_updated >= updated_since)
+        return self.db_session.execute(query).all()
+
     def get_unit_tests_data_from_submission(self, submission: ActivitySubmission) -> str:
         return (
             submission.activity.unit_test_suite.test_rplfile.data.decode()
@@ -107,12 +160,24 @@ class SubmissionsRepository(BaseRepository):
         ):
             return []
         return [
-            IOTestRunResultDTO(
-                id=run.id,
-                name=run.test_name,
-                test_in=run.test_in,
-                expected_output=run.expected_output,
-                run_output=run.run_output,
+            (
+                IOTestRunResultDTO(
+                    id=run.id,
+                    name=run.io_test_snapshot.name,
+                    test_in=run.io_test_snapshot.test_in,
+                    expected_output=run.io_test_snapshot.test_out,
+                    # Capped output of failed runs: the full one is fetched on demand
+                    run_output=run.io_test_snapshot.test_out if run.passed else run.run_output,
+                    run_output_truncated=bool(run.run_output_truncated),
+                )
+                if run.io_test_snapshot is not None
+                else IOTestRunResultDTO(
+                    id=run.id,
+                    name=run.test_name,
+                    test_in=run.test_in,
+                    expected_output=run.expected_output,
+                    run_output=run.run_output,
+                )
             )
             for run in submission.tests_execution_log.io_test_runs
         ]
@@ -141,6 +206,43 @@ class SubmissionsRepository(BaseRepository):
             return "", ""
         return (submission.tests_execution_log.stdout or "", submission.tests_execution_log.stderr or "")
 
+    def get_tests_execution_full_log_from_submission(
+        self, submission: ActivitySubmission, log_stream: aux_models.TestsExecutionLogStream
+    ) -> str:
+        tests_execution_log = submission.tests_execution_log
+        if not tests_execution_log:
+            return ""
+        if log_stream == aux_models.TestsExecutionLogStream.STDOUT:
+            capped_log, full_log_blob = tests_execution_log.stdout, tests_execution_log.full_stdout_blob
+        else:
+            capped_log, full_log_blob = tests_execution_log.stderr, tests_execution_log.full_stderr_blob
+        if full_log_blob is None:
+            return capped_log or ""
+        return gzip.decompress(full_log_blob.read_data()).decode()
+
+    def get_io_test_run_full_output_from_submission(
+        self, submission: ActivitySubmission, io_test_run_id: int
+    ) -> Optional[str]:
+        # None if the submission has no IO test run with that id
+        run = (
+            self.db_session.execute(
+                sa.select(IOTestRun)
+                .join(TestsExecutionLog, TestsExecutionLog.id == IOTestRun.tests_execution_log_id)
+                .where(
+                    IOTestRun.id == io_test_run_id, TestsExecutionLog.activity_submission_id == submission.id
+                )
+            )
+            .scalars()
+            .one_or_none()
+        )
+        if run is None:
+            return None
+        if run.passed:
+            return run.io_test_snapshot.test_out
+        if run.full_run_output_blob is not None:
+            return gzip.decompress(run.full_run_output_blob.read_data()).decode()
+        return run.run_output or ""
+
     def get_by_id(self, submission_id: int) -> ActivitySubmission | None:
         return (
             self.db_session.execute(
@@ -150,30 +252,39 @@ class SubmissionsRepository(BaseRepository):
             .one_or_none()
         )
 
-    def __get_verified_submission_files_to_compress(
-        self, extracted_starting_files: tar_utils.ExtractedFilesDict, submission_uploadfiles: list[UploadFile]
+    def get_by_ids(self, submission_ids: list[int]) -> list[ActivitySubmission]:
+        # Everything needed to build the runner responses is loaded upfront (a few queries in total,
+        # instead of a few per submission)
+        return (
+            self.db_session.execute(
+                sa.select(ActivitySubmission)
+                .where(ActivitySubmission.id.in_(submission_ids))
+                .order_by(ActivitySubmission.id)
+                .options(
+                    selectinload(ActivitySubmission.solution_rplfile),
+                    selectinload(ActivitySubmission.activity).selectinload(Activity.starting_rplfile),
+                    selectinload(ActivitySubmission.activity).selectinload(Activity.io_tests),
+                    selectinload(ActivitySubmission.activity)
+                    .selectinload(Activity.unit_test_suite)
+                    .selectinload(UnitTestSuite.test_rplfile),
+                )
+            )
+            .scalars()
+            .all()
+        )
+
+    def __get_student_writable_submission_files(
+        self, starting_files: ExtractedStartingFiles, submission_uploadfiles: list[UploadFile]
     ) -> dict[str, bytes]:
-        starting_files_metadata = extracted_starting_files.get("files_metadata")
-        if not starting_files_metadata:
-            return tar_utils.compress_uploadfiles_to_tar_gz(submission_uploadfiles)
-        starting_files_metadata: dict[str, str] = json.loads(starting_files_metadata)
-        files_to_compress = {}
+        # Uploaded files that are "read" or "hidden" in the starting files can't be overwritten by students
+        writable_files = {}
         for uploadfile in submission_uploadfiles:
-            if uploadfile.filename in starting_files_metadata.keys():
-                if starting_files_metadata[uploadfile.filename]["display"] == "read_write":
-                    files_to_compress[uploadfile.filename] = uploadfile.file.read()
-                else:
-                    files_to_compress[uploadfile.filename] = extracted_starting_files[
-                        uploadfile.filename
-                    ].encode()
-            else:
-                files_to_compress[uploadfile.filename] = uploadfile.file.read()
-
-        for starting_file_name, starting_file_content in extracted_starting_files.items():
-            if starting_file_name not in files_to_compress.keys():
-                files_to_compress[starting_file_name] = starting_file_content.encode()
-
-        return files_to_compress
+            if uploadfile.filename == tar_utils.METADATA_FILENAME:
+                continue
+            file_metadata = starting_files.metadata.get(uploadfile.filename)
+            if file_metadata is None or file_metadata.get("display") == "read_write":
+                writable_files[uploadfile.filename] = uploadfile.file.read()
+        return writable_files
 
     def create_submission_for_activity(
         self,
@@ -181,15 +292,29 @@ class SubmissionsRepository(BaseRepository):
         activity: Activity,
         current_course_user: CurrentCourseUser,
     ) -> ActivitySubmission:
-        extracted_starting_files = tar_utils.extract_tar_gz_to_dict_of_files(activity.starting_rplfile.data)
-        verified_raw_submission_files = self.__get_verified_submission_files_to_compress(
-            extracted_starting_files, new_submission_data.submission_files
-        )
+        starting_files = starting_files_cache.get_or_extract(activity.starting_rplfile)
+        base_rplfile_id = None
+        if not starting_files.files.get(tar_utils.METADATA_FILENAME):
+            verified_raw_submission_files = tar_utils.get_raw_files_from_uploadfiles(
+                new_submission_data.submission_files
+            )
+        else:
+            verified_raw_submission_files = self.__get_student_writable_submission_files(
+                starting_files, new_submission_data.submission_files
+            )
+            if env.SUBMISSION_FILES_STORAGE_MODE == "delta":
+                base_rplfile_id = activity.starting_rplfile_id
+            else:
+                verified_raw_submission_files = {
+                    **{name: content.encode() for name, content in starting_files.files.items()},
+                    **verified_raw_submission_files,
+                }
         compressed_submission_files = tar_utils.compress_files_dict_to_tar_gz(verified_raw_submission_files)
         rplfile = self.rplfiles_repo.create_rplfile(
             file_name=f"{datetime.today().strftime('%Y-%m-%d')}__{current_course_user.course_id}__{activity.id}__{current_course_user.user_id}_SUBM.tar.gz",
             file_type=aux_models.RPLFileType.GZIP,
             data=compressed_submission_files,
+            base_rplfile_id=base_rplfile_id,
         )
         submission = ActivitySubmission(
             is_final_solution=False,
@@ -201,6 +326,10 @@ class SubmissionsRepository(BaseRepository):
             last_updated=datetime.now(timezone.utc),
         )
         self.db_session.add(submission)
+        self.db_session.flush()
+        # Same transaction as the submission: it can never be saved without being dispatched later on
+        self.db_session.add(SubmissionDispatch(submission_id=submission.id, language=activity.language))
+        self.summaries_repo.apply_status_change(submission, previous_status=None)
         self.db_session.commit()
         self.db_session.refresh(submission)
         return submission
@@ -208,12 +337,90 @@ class SubmissionsRepository(BaseRepository):
     def update_submission_status(
         self, submission: ActivitySubmission, new_status: aux_models.SubmissionStatus
     ) -> ActivitySubmission:
+        previous_status = submission.status
         submission.status = new_status
         submission.last_updated = datetime.now(timezone.utc)
+        self.summaries_repo.apply_status_change(submission, previous_status)
         self.db_session.commit()
         self.db_session.refresh(submission)
         return submission
 
+    def __get_submissions_status_data(self, *conditions) -> list[sa.Row]:
+        # What the summaries need to apply the status changes of these submissions (to be bulk updated). They
+        # are locked until the commit, so that their statuses can't change in between.
+        return self.db_session.execute(
+            sa.select(
+                ActivitySubmission.id,
+                ActivitySubmission.activity_id,
+                ActivitySubmission.user_id,
+                ActivitySubmission.status,
+                ActivitySubmission.date_created,
+                Activity.course_id,
+            )
+            .join(Activity, Activity.id == ActivitySubmission.activity_id)
+            .where(*conditions)
+            .order_by(ActivitySubmission.id)
+            .with_for_update(of=ActivitySubmission)
+        ).all()
+
+    def __apply_summaries_status_change(
+        self, submissions: list[sa.Row], new_status: aux_models.SubmissionStatus
+    ):
+        self.summaries_repo.apply_status_changes(
+            [
+                (
+                    submission.course_id,
+                    submission.activity_id,
+                    submission.user_id,
+                    submission.date_created,
+                    submission.status,
+                    new_status,
+                )
+                for submission in submissions
+                if submission.status != new_status
+            ]
+        )
+
+    def update_submissions_statuses(
+        self, new_statuses_by_submission_id: dict[int, aux_models.SubmissionStatus]
+    ) -> list[int]:
+        # Single UPDATE (and commit) for the whole batch. Returns the ids of the submissions that exist.
+        existing_submissions = self.__get_submissions_status_data(
+            ActivitySubmission.id.in_(list(new_statuses_by_submission_id))
+        )
+        existing_ids = [submission.id for submission in existing_submissions]
+        if existing_ids:
+            self.db_session.execute(
+                sa.update(ActivitySubmission)
+                .where(ActivitySubmission.id.in_(existing_ids))
+                .values(
+                    status=sa.case(
+                        {
+                            submission_id: new_statuses_by_submission_id[submission_id]
+                            for submission_id in existing_ids
+                        },
+                        value=ActivitySubmission.id,
+                    ),
+                    last_updated=datetime.now(timezone.utc),
+                )
+                .execution_options(synchronize_session=False)
+            )
+            self.summaries_repo.apply_status_changes(
+                [
+                    (
+                        submission.course_id,
+                        submission.activity_id,
+                        submission.user_id,
+                        submission.date_created,
+                        submission.status,
+                        new_statuses_by_submission_id[submission.id],
+                    )
+                    for submission in existing_submissions
+                ]
+            )
+        self.db_session.commit()
+        return sorted(existing_ids)
+
     def mark_submission_as_final_solution(self, submission: ActivitySubmission) -> ActivitySubmission:
         submission.is_final_solution = True
         submission.last_updated = datetime.now(timezone.utc)
@@ -248,28 +455,203 @@ class SubmissionsRepository(BaseRepository):
             .all()
         )
 
+    def __submission_results_loader_options(self) -> list:
+        # Everything read to build submission results, loaded with one query per relationship (whatever the
+        # amount of submissions). File payloads are deferred: only the unit tests source is actually read.
+        return [
+            selectinload(ActivitySubmission.solution_rplfile),
+            selectinload(ActivitySubmission.activity).selectinload(Activity.starting_rplfile),
+            selectinload(ActivitySubmission.activity).selectinload(Activity.io_tests),
+            selectinload(ActivitySubmission.activity)
+            .selectinload(Activity.unit_test_suite)
+            .selectinload(UnitTestSuite.test_rplfile)
+            .selectinload(RPLFile.blob),
+            selectinload(ActivitySubmission.tests_execution_log).selectinload(TestsExecutionLog.io_test_runs),
+            selectinload(ActivitySubmission.tests_execution_log).selectinload(
+                TestsExecutionLog.unit_test_runs
+            ),
+        ]
+
     def get_all_submissions_from_activity_id_and_user_id(
-        self, activity_id: int, user_id: int
+        self,
+        activity_id: int,
+        user_id: int,
+        limit: Optional[int] = None,
+        before: Optional[tuple[datetime, int]] = None,
+        summary_only: bool = False,
     ) -> list[ActivitySubmission]:
+        # Pages (limit and/or before) go newest first, and are fetched by keyset: the (date_created, id) of the
+        # last submission of the previous page, instead of an offset. Without paging, all of them are returned
+        # oldest first, as before pages existed.
+        query = sa.select(ActivitySubmission).where(
+            ActivitySubmission.activity_id == activity_id, ActivitySubmission.user_id == user_id
+        )
+        if limit is None and before is None:
+            query = query.order_by(ActivitySubmission.date_created, ActivitySubmission.id)
+        else:
+            query = query.order_by(ActivitySubmission.date_created.desc(), ActivitySubmission.id.desc())
+        if before is not None:
+            before_date, before_id = before
+            query = query.where(
+                sa.or_(
+                    ActivitySubmission.date_created < before_date,
+                    sa.and_(
+                        ActivitySubmission.date_created == before_date, ActivitySubmission.id < before_id
+                    ),
+                )
+            )
+        if limit is not None:
+            query = query.limit(limit)
+        if summary_only:
+            query = query.options(
+                selectinload(ActivitySubmission.tests_execution_log).load_only(TestsExecutionLog.exit_message)
+            )
+        else:
+            query = query.options(*self.__submission_results_loader_options())
+        return self.db_session.execute(query).scalars().all()
+
+    # =================================================================
+
+    def __submissions_to_reprocess_conditions(
+        self,
+        statuses: list[aux_models.SubmissionStatus],
+        course_id: Optional[int],
+        activity_id: Optional[int],
+        last_updated_before: Optional[datetime],
+        max_dispatch_attempts: int,
+    ) -> list:
+        conditions = [
+            ActivitySubmission.status.in_(statuses),
+            # Submissions still waiting in the outbox would be dispatched twice
+            ~sa.exists().where(
+                SubmissionDispatch.submission_id == ActivitySubmission.id,
+                SubmissionDispatch.dispatched.is_(False),
+                SubmissionDispatch.attempts < max_dispatch_attempts,
+            ),
+        ]
+        if course_id is not None:
+            conditions.append(Activity.course_id == course_id)
+        if activity_id is not None:
+            conditions.append(ActivitySubmission.activity_id == activity_id)
+        if last_updated_before is not None:
+            conditions.append(ActivitySubmission.last_updated <= last_updated_before)
+        return conditions
+
+    def count_submissions_to_reprocess(self, **filters) -> int:
+        return self.db_session.execute(
+            sa.select(sa.func.count(ActivitySubmission.id))
+            .join(Activity, ActivitySubmission.activity_id == Activity.id)
+            .where(*self.__submissions_to_reprocess_conditions(**filters))
+        ).scalar_one()
+
+    def get_next_submissions_to_reprocess(
+        self, after_id: int, limit: int, **filters
+    ) -> list[tuple[int, str]]:
+        # Keyset pagination: only (id, language) rows are loaded, a page at a time
         return (
             self.db_session.execute(
-                sa.select(ActivitySubmission).where(
-                    ActivitySubmission.activity_id == activity_id, ActivitySubmission.user_id == user_id
+                sa.select(ActivitySubmission.id, Activity.language)
+                .join(Activity, ActivitySubmission.activity_id == Activity.id)
+                .where(
+                    ActivitySubmission.id > after_id, *self.__submissions_to_reprocess_conditions(**filters)
                 )
+                .order_by(ActivitySubmission.id)
+                .limit(limit)
             )
-            .scalars()
+            .tuples()
             .all()
         )
 
-    def get_all_pending_and_stuck_submissions(self) -> list[ActivitySubmission]:
+    def create_dispatches_for_submissions(self, submissions: list[tuple[int, str]]):
+        # One bulk UPDATE plus one bulk INSERT (and a single commit, with the summaries) for the whole batch
+        now = datetime.now(timezone.utc)
+        submission_ids = [submission_id for submission_id, _ in submissions]
+        previous_submissions = self.__get_submissions_status_data(ActivitySubmission.id.in_(submission_ids))
+        self.db_session.execute(
+            sa.update(ActivitySubmission)
+            .where(ActivitySubmission.id.in_(submission_ids))
+            .values(status=aux_models.SubmissionStatus.PENDING, last_updated=now),
+            execution_options={"synchronize_session": False},
+        )
+        self.__apply_summaries_status_change(previous_submissions, aux_models.SubmissionStatus.PENDING)
+        self.db_session.execute(
+            sa.insert(SubmissionDispatch),
+            [
+                {"submission_id": submission_id, "language": language, "date_created": now}
+                for submission_id, language in submissions
+            ],
+        )
+        self.db_session.commit()
+
+    def get_pending_submission_dispatches(self, limit: int, max_attempts: int) -> list[SubmissionDispatch]:
+        # Rows locked by another dispatcher (i.e. another replica) are skipped instead of waited for
         return (
             self.db_session.execute(
-                sa.select(ActivitySubmission).where(
-                    ActivitySubmission.status.in_(
-                        [aux_models.SubmissionStatus.PENDING, aux_models.SubmissionStatus.PROCESSING]
-                    )
-                )
+                sa.select(SubmissionDispatch)
+                .where(SubmissionDispatch.dispatched.is_(False), SubmissionDispatch.attempts < max_attempts)
+                .order_by(SubmissionDispatch.id)
+                .limit(limit)
+                .with_for_update(skip_locked=True)
             )
             .scalars()
             .all()
         )
+
+    def delete_dispatched_submission_dispatches(self, dispatched_before: datetime, batch_size: int) -> int:
+        # The outbox only needs its rows until they are dispatched (and for a while after, to inspect them).
+        # Rows never dispatched are kept. Deleted in batches, each one in its own transaction.
+        deleted = 0
+        while True:
+            dispatch_ids = (
+                self.db_session.execute(
+                    sa.select(SubmissionDispatch.id)
+                    .where(
+                        SubmissionDispatch.dispatched.is_(True),
+                        SubmissionDispatch.date_dispatched < dispatched_before,
+                    )
+                    .order_by(SubmissionDispatch.id)
+                    .limit(batch_size)
+                )
+                .scalars()
+                .all()
+            )
+            if not dispatch_ids:
+                return deleted
+            self.db_session.execute(
+                sa.delete(SubmissionDispatch).where(SubmissionDispatch.id.in_(dispatch_ids)),
+                execution_options={"synchronize_session": False},
+            )
+            self.db_session.commit()
+            deleted += len(dispatch_ids)
+
+    def mark_submission_dispatches_as_done(
+        self, dispatched: list[SubmissionDispatch], failed: list[SubmissionDispatch]
+    ):
+        now = datetime.now(timezone.utc)
+        for dispatch in dispatched:
+            dispatch.dispatched = True
+            dispatch.attempts += 1
+            dispatch.date_dispatched = now
+        for dispatch in failed:
+            dispatch.attempts += 1
+        # Only the ones still pending: the runner may have already picked up (and updated) the others
+        pending_submissions = (
+            self.__get_submissions_status_data(
+                ActivitySubmission.id.in_([dispatch.submission_id for dispatch in dispatched]),
+                ActivitySubmission.status == aux_models.SubmissionStatus.PENDING,
+            )
+            if dispatched
+            else []
+        )
+        if pending_submissions:
+            self.db_session.execute(
+                sa.update(ActivitySubmission)
+                .where(
+                    ActivitySubmission.id.in_([submission.id for submission in pending_submissions]),
+                    ActivitySubmission.status == aux_models.SubmissionStatus.PENDING,
+                )
+                .values(status=aux_models.SubmissionStatus.ENQUEUED, last_updated=now)
+                .execution_options(synchronize_session=False)
+            )
+            self.__apply_summaries_status_change(pending_submissions, aux_models.SubmissionStatus.ENQUEUED)
+        self.db_session.commit()
@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+import sqlalchemy as sa
+from sqlalchemy.exc import IntegrityError
+
+from rpl_activities.src.repositories.base import BaseRepository
+from rpl_activities.src.repositories.models import aux_models
+from .models.submissions_reprocessing_job import SubmissionsReprocessingJob
+
+INTERRUPTED_JOB_ERROR = "Interrupted: its worker stopped before finishing it."
+
+
+class SubmissionsReprocessingJobsRepository(BaseRepository):
+
+    def get_by_id(self, job_id: int) -> Optional[SubmissionsReprocessingJob]:
+        return self.db_session.get(SubmissionsReprocessingJob, job_id)
+
+    def fail_interrupted_jobs(self, not_updated_for: timedelta):
+        now = datetime.now(timezone.utc)
+        self.db_session.execute(
+            sa.update(SubmissionsReprocessingJob)
+            .where(
+                SubmissionsReprocessingJob.running.is_(True),
+                SubmissionsReprocessingJob.last_updated < now - not_updated_for,
+            )
+            .values(
+                status=aux_models.SubmissionsReprocessingJobStatus.FAILED,
+                running=None,
+                error=INTERRUPTED_JOB_ERROR,
+                date_finished=now,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        self.db_session.commit()
+
+    def create_running_job(self, parameters: str) -> Optional[SubmissionsReprocessingJob]:
+        # None if another job is still running (in this worker or any other one)
+        now = datetime.now(timezone.utc)
+        job = SubmissionsReprocessingJob(
+            status=aux_models.SubmissionsReprocessingJobStatus.RUNNING,
+            parameters=parameters,
+            running=True,
+            date_created=now,
+            last_updated=now,
+        )
+        try:
+            with self.db_session.begin_nested():
+                self.db_session.add(job)
+        except IntegrityError:
+            return None
+        self.db_session.commit()
+        self.db_session.refresh(job)
+        return job
+
+    def update_progress(self, job: SubmissionsReprocessingJob, processed: int, batches: int):
+        # Not committed: it's saved along with the batch
+        job.processed += processed
+        job.batches += batches
+        job.last_updated = datetime.now(timezone.utc)
+
+    def finish(
+        self,
+        job: SubmissionsReprocessingJob,
+        status: aux_models.SubmissionsReprocessingJobStatus,
+        error: Optional[str] = None,
+    ):
+        now = datetime.now(timezone.utc)
+        job.status = status
+        job.running = None
+        job.error = error
+        job.last_updated = now
+        job.date_finished = now
+        self.db_session.commit()
@@ -0,0 +1,236 @@
+from datetime import datetime, timezone
+from typing import Optional
+import sqlalchemy as sa
+from sqlalchemy.exc import IntegrityError
+
+from rpl_activities.src.repositories.base import BaseRepository
+from rpl_activities.src.repositories.models import aux_models
+from .models.activity import Activity
+from .models.activity_submission import ActivitySubmission
+from .models.activity_submissions_summary import (
+    ActivitySubmissionsSummary,
+    SUBMISSIONS_COUNT_COLUMN_BY_STATUS,
+)
+
+# (course id, activity id, user id, submission date_created, previous status or None if new, new status)
+type SubmissionStatusChange = tuple[int, int, int, datetime, Optional[str], str]
+
+# (activity id, user id)
+type SummaryKey = tuple[int, int]
+
+
+class SubmissionsSummariesRepository(BaseRepository):
+    # Nothing is committed here: summaries change in the same transaction as the submissions they count
+
+    def __summaries_select(self) -> sa.Select:
+        # Summaries computed from scratch, with the columns named after the ones of the table
+        status_counts = [
+            sa.func.sum(sa.case((ActivitySubmission.status == status, 1), else_=0)).label(column)
+            for status, column in SUBMISSIONS_COUNT_COLUMN_BY_STATUS.items()
+        ]
+        return (
+            sa.select(
+                Activity.course_id.label("course_id"),
+                ActivitySubmission.activity_id.label("activity_id"),
+                ActivitySubmission.user_id.label("user_id"),
+                sa.func.count(ActivitySubmission.id).label("total_submissions"),
+                *status_counts,
+                sa.func.coalesce(
+                    sa.func.max(
+                        sa.case(
+                            {status.value: status.rank for status in aux_models.SubmissionStatus},
+                            value=ActivitySubmission.status,
+                            else_=0,
+                        )
+                    ),
+                    0,
+                ).label("best_status_rank"),
+                sa.func.min(
+                    sa.case(
+                        (
+                            ActivitySubmission.status == aux_models.SubmissionStatus.SUCCESS,
+                            ActivitySubmission.date_created,
+                        ),
+                        else_=None,
+                    )
+                ).label("first_success_date"),
+                sa.func.max(ActivitySubmission.date_created).label("last_submission_date"),
+            )
+            .join(Activity, Activity.id == ActivitySubmission.activity_id)
+            .group_by(Activity.course_id, ActivitySubmission.activity_id, ActivitySubmission.user_id)
+        )
+
+    def __get_summaries_for_update(
+        self, keys: set[SummaryKey]
+    ) -> dict[SummaryKey, ActivitySubmissionsSummary]:
+        summaries = (
+            self.db_session.execute(
+                sa.select(ActivitySubmissionsSummary)
+                .where(
+                    ActivitySubmissionsSummary.activity_id.in_({activity_id for activity_id, _ in keys}),
+                    ActivitySubmissionsSummary.user_id.in_({user_id for _, user_id in keys}),
+                )
+                .with_for_update()
+                .execution_options(populate_existing=True)
+            )
+            .scalars()
+            .all()
+        )
+        return {
+            (summary.activity_id, summary.user_id): summary
+            for summary in summaries
+            if (summary.activity_id, summary.user_id) in keys
+        }
+
+    def __create_summary_from_submissions(self, key: SummaryKey) -> Optional[ActivitySubmissionsSummary]:
+        # None if it was created concurrently (without this transaction's changes, still to be applied)
+        activity_id, user_id = key
+        stats_row = self.db_session.execute(
+            self.__summaries_select().where(
+                ActivitySubmission.activity_id == activity_id, ActivitySubmission.user_id == user_id
+            )
+        ).one()
+        try:
+            with self.db_session.begin_nested():
+                summary = ActivitySubmissionsSummary(**stats_row._asdict())
+                self.db_session.add(summary)
+        except IntegrityError:
+            return None
+        return summary
+
+    def __as_naive_utc(self, date: datetime) -> datetime:
+        # As they are read back from the database
+        return date.astimezone(timezone.utc).replace(tzinfo=None) if date.tzinfo else date
+
+    def __add_to_status_count(self, summary: ActivitySubmissionsSummary, status: str, amount: int):
+        column = SUBMISSIONS_COUNT_COLUMN_BY_STATUS.get(status)
+        if column is not None:
+            setattr(summary, column, getattr(summary, column) + amount)
+
+    def __get_first_success_date(self, key: SummaryKey) -> Optional[datetime]:
+        activity_id, user_id = key
+        return self.db_session.execute(
+            sa.select(sa.func.min(ActivitySubmission.date_created)).where(
+                ActivitySubmission.activity_id == activity_id,
+                ActivitySubmission.user_id == user_id,
+                ActivitySubmission.status == aux_models.SubmissionStatus.SUCCESS,
+            )
+        ).scalar()
+
+    def apply_status_changes(self, changes: list[SubmissionStatusChange]):
+        # The changes must already be made to the submissions: a missing summary (e.g. never rebuilt for
+        # older submissions) is created from them, with the changes already counted.
+        if not changes:
+            return
+        self.db_session.flush()
+        keys = {(activity_id, user_id) for _, activity_id, user_id, *_ in changes}
+        summaries = self.__get_summaries_for_update(keys)
+        for key in keys - summaries.keys():
+            summary = self.__create_summary_from_submissions(key)
+            if summary is None:
+                summaries[key] = self.__get_summaries_for_update({key})[key]
+            else:
+                keys.discard(key)
+
+        summaries_losing_a_success = set()
+        for _, activity_id, user_id, submission_date, previous_status, new_status in changes:
+            key = (activity_id, user_id)
+            if key not in keys:
+                continue
+            summary = summaries[key]
+            submission_date = self.__as_naive_utc(submission_date)
+            if previous_status is None:
+                summary.total_submissions += 1
+                if summary.last_submission_date is None or submission_date > summary.last_submission_date:
+                    summary.last_submission_date = submission_date
+            else:
+                self.__add_to_status_count(summary, previous_status, -1)
+            self.__add_to_status_count(summary, new_status, 1)
+            if new_status == aux_models.SubmissionStatus.SUCCESS:
+                if summary.first_success_date is None or submission_date < summary.first_success_date:
+                    summary.first_success_date = submission_date
+            elif previous_status == aux_models.SubmissionStatus.SUCCESS:
+                summaries_losing_a_success.add(key)
+
+        for key in keys:
+            summary = summaries[key]
+            if key in summaries_losing_a_success:
+                summary.first_success_date = self.__get_first_success_date(key)
+            summary.best_status_rank = max(
+                (
+                    status.rank
+                    for status, column in SUBMISSIONS_COUNT_COLUMN_BY_STATUS.items()
+                    if getattr(summary, column) > 0
+                ),
+                default=aux_models.SubmissionStatus.NO_SUBMISSIONS.rank,
+            )
+
+    def apply_status_change(self, submission: ActivitySubmission, previous_status: Optional[str]):
+        self.db_session.flush()
+        self.apply_status_changes(
+            [
+                (
+                    submission.activity.course_id,
+                    submission.activity_id,
+                    submission.user_id,
+                    submission.date_created,
+                    previous_status,
+                    submission.status,
+                )
+            ]
+        )
+
+    # =================================================================
+
+    def get_summaries_by_user_at_activities(
+        self, user_id: int, activity_ids: list[int]
+    ) -> dict[int, ActivitySubmissionsSummary]:
+        if not activity_ids:
+            return {}
+        summaries = (
+            self.db_session.execute(
+                sa.select(ActivitySubmissionsSummary).where(
+                    ActivitySubmissionsSummary.user_id == user_id,
+                    ActivitySubmissionsSummary.activity_id.in_(activity_ids),
+                )
+            )
+            .scalars()
+            .all()
+        )
+        return {summary.activity_id: summary for summary in summaries}
+
+    def get_summaries_with_success_by_users_at_activities(
+        self, user_ids: list[int], activity_ids: list[int]
+    ) -> list[ActivitySubmissionsSummary]:
+        if not user_ids or not activity_ids:
+            return []
+        return (
+            self.db_session.execute(
+                sa.select(ActivitySubmissionsSummary).where(
+                    ActivitySubmissionsSummary.user_id.in_(user_ids),
+                    ActivitySubmissionsSummary.activity_id.in_(activity_ids),
+                    ActivitySubmissionsSummary.successful_submissions > 0,
+                )
+            )
+            .scalars()
+            .all()
+        )
+
+    # =================================================================
+
+    def rebuild_summaries(self, course_id: Optional[int] = None) -> int:
+        # Regenerates the summaries (of every course or only of one) from the submissions, in a single
+        # transaction. Returns how many were created.
+        delete_statement = sa.delete(ActivitySubmissionsSummary)
+        summaries_select = self.__summaries_select()
+        if course_id is not None:
+            delete_statement = delete_statement.where(ActivitySubmissionsSummary.course_id == course_id)
+            summaries_select = summaries_select.where(Activity.course_id == course_id)
+        self.db_session.execute(delete_statement.execution_options(synchronize_session=False))
+        result = self.db_session.execute(
+            sa.insert(ActivitySubmissionsSummary).from_select(
+                [column.name for column in summaries_select.selected_columns], summaries_select
+            )
+        )
+        self.db_session.commit()
+        return result.rowcount
@@ -0,0 +1,32 @@
+from fastapi import APIRouter, HTTPException, status
+
+from rpl_activities.src.deps.auth import (
+    CurrentCourseUserDependency,
+    CurrentMainUserDependency,
+    users_auth_cache,
+)
+
+
+router = APIRouter(prefix="/api/v3", tags=["Auth"])
+
+# ==============================================================================
+
+
+@router.delete("/courses/{course_id}/authCache/users/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
+def expire_course_user_auth(course_id: int, user_id: int, current_course_user: CurrentCourseUserDependency):
+    # Called by the users API whenever the role, acceptance or membership of a course user changes
+    if current_course_user.user_id != user_id and not current_course_user.has_authority("user_manage"):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You do not have permission to manage users on this course",
+        )
+    users_auth_cache.invalidate(course_id=course_id, user_id=user_id)
+
+
+@router.get("/authCache/stats")
+def get_auth_cache_stats(current_main_user: CurrentMainUserDependency):
+    if not current_main_user.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Only admins can view the auth cache stats."
+        )
+    return users_auth_cache.stats()
@@ -1,17 +1,21 @@
-from typing import Optional
-from fastapi import APIRouter, status
+from typing import Annotated, Optional
+from fastapi import APIRouter, Header, status
 
 from rpl_activities.src.deps.auth import CurrentCourseUserDependency, RunnerAuthDependency
 from rpl_activities.src.deps.database import DBSessionDependency
 from rpl_activities.src.services.rpl_files import RPLFilesService
 
-
 router = APIRouter(prefix="/api/v3", tags=["RPLFiles"])
 
 
 @router.get("/RPLFile/{rplfile_id}")
-def get_raw_rplfile(rplfile_id: int, runner_auth: RunnerAuthDependency, db: DBSessionDependency):
-    return RPLFilesService(db).get_raw_rplfile_for_runner(rplfile_id)
+def get_raw_rplfile(
+    rplfile_id: int,
+    runner_auth: RunnerAuthDependency,
+    db: DBSessionDependency,
+    if_none_match: Annotated[Optional[str], Header()] = None,
+):
+    return RPLFilesService(db).get_raw_rplfile_for_runner(rplfile_id, if_none_match)
 
 
 @router.get("/courses/{course_id}/extractedRPLFile/{rplfile_id}")
@@ -1,5 +1,5 @@
 from typing import List, Optional, Union
-from fastapi import APIRouter, Form, status
+from fastapi import APIRouter, Form, Query, Response, status
 from rpl_activities.src.deps.auth import (
     CurrentCourseUserDependency,
     CurrentMainUserDependency,
@@ -12,13 +12,21 @@ from rpl_activities.src.dtos.submission_dtos import (
     SubmissionCreationRequestDTO,
     AllFinalSubmissionsResponseDTO,
     SubmissionResultResponseDTO,
+    SubmissionResultSummaryResponseDTO,
     SubmissionResponseDTO,
     UpdateSubmissionStatusRequestDTO,
     TestsExecutionLogDTO,
     SubmissionWithMetadataOnlyResponseDTO,
+    SubmissionsReprocessingRequestDTO,
+    SubmissionsReprocessingProgressResponseDTO,
+    UpdateSubmissionsStatusesRequestDTO,
+    UpdateSubmissionsStatusesResponseDTO,
+    SUBMISSIONS_HISTORY_MAX_PAGE_SIZE,
+    SUBMISSIONS_HISTORY_NEXT_CURSOR_HEADER,
+    SUBMISSION_RESULT_MAX_WAIT_SECONDS,
 )
-from rpl_activities.src.services.submissions import SubmissionsService
-
+from rpl_activities.src.repositories.models import aux_models
+from rpl_activities.src.services.submissions import SubmissionsHistoryPage, SubmissionsService
 
 router = APIRouter(prefix="/api/v3", tags=["Activity Submissions"])
 
@@ -33,10 +41,9 @@ def create_submission(
     activity_id: int,
     current_course_user: CurrentCourseUserDependency,
     db: DBSessionDependency,
-    mq_sender: MQSenderDependency,
     new_submission_data: SubmissionCreationRequestDTO = Form(..., media_type="multipart/form-data"),
 ):
-    return SubmissionsService(db, mq_sender).create_submission(
+    return SubmissionsService(db).create_submission(
         course_id, activity_id, new_submission_data, current_course_user
     )
 
@@ -87,34 +94,100 @@ def get_all_final_submissions_from_activity(
     )
 
 
-@router.get("/courses/{course_id}/submissions/{submission_id}/result", response_model=SubmissionResultResponseDTO)
-def get_submission_execution_result(
-    course_id: int, 
-    submission_id: int, 
-    current_course_user: CurrentCourseUserDependency, 
-    db: DBSessionDependency
+@router.get(
+    "/courses/{course_id}/submissions/{submission_id}/result", response_model=SubmissionResultResponseDTO
+)
+async def get_submission_execution_result(
+    course_id: int,
+    submission_id: int,
+    current_course_user: CurrentCourseUserDependency,
+    db: DBSessionDependency,
+    wait: Optional[float] = Query(None, ge=0, le=SUBMISSION_RESULT_MAX_WAIT_SECONDS),
 ):
-    return SubmissionsService(db).get_submission_execution_result(submission_id, current_course_user)
+    return await SubmissionsService(db).wait_for_submission_execution_result(
+        submission_id, current_course_user, wait or 0
+    )
+
+
+@router.get("/courses/{course_id}/submissions/{submission_id}/result/{log_stream}")
+def get_submission_execution_full_log(
+    course_id: int,
+    submission_id: int,
+    log_stream: aux_models.TestsExecutionLogStream,
+    current_course_user: CurrentCourseUserDependency,
+    db: DBSessionDependency,
+):
+    return SubmissionsService(db).get_submission_execution_full_log(
+        submission_id, log_stream, current_course_user
+    )
+
+
+@router.get("/courses/{course_id}/submissions/{submission_id}/result/ioTestRuns/{io_test_run_id}/output")
+def get_submission_io_test_run_full_output(
+    course_id: int,
+    submission_id: int,
+    io_test_run_id: int,
+    current_course_user: CurrentCourseUserDependency,
+    db: DBSessionDependency,
+):
+    return SubmissionsService(db).get_submission_io_test_run_full_output(
+        submission_id, io_test_run_id, current_course_user
+    )
+
+
+SUBMISSIONS_HISTORY_DESCRIPTION = f"""
+Without `limit` nor `cursor`, every submission is returned, oldest first.
+
+With `limit` (or `cursor`, whose default page size is {SUBMISSIONS_HISTORY_MAX_PAGE_SIZE}), they are paginated
+newest first, and the body stays a plain list. While a page is full, the
+`{SUBMISSIONS_HISTORY_NEXT_CURSOR_HEADER}` header holds the `cursor` of the next one: if the amount of
+submissions is a multiple of `limit`, the last page is an empty list (without that header).
+"""
+
+
+def __submissions_history_page_response(response: Response, page: SubmissionsHistoryPage):
+    # The body stays a plain list (as when not paginating): the next page cursor goes in a header
+    results, next_cursor = page
+    if next_cursor is not None:
+        response.headers[SUBMISSIONS_HISTORY_NEXT_CURSOR_HEADER] = next_cursor
+    return results
+
+
+@router.get("/courses/{course_id}/submissions/{submission_id}/statusStream")
+def stream_submission_status(
+    course_id: int,
+    submission_id: int,
+    current_course_user: CurrentCourseUserDependency,
+    db: DBSessionDependency,
+):
+    return SubmissionsService(db).stream_submission_status(submission_id, current_course_user)
 
 
 @router.get(
     "/courses/{course_id}/activities/{activity_id}/submissions",
-    response_model=List[SubmissionResultResponseDTO],
+    response_model=Union[List[SubmissionResultResponseDTO], List[SubmissionResultSummaryResponseDTO]],
+    description=SUBMISSIONS_HISTORY_DESCRIPTION,
 )
 def get_all_current_user_submissions_results_from_activity(
     course_id: int,
     activity_id: int,
     current_course_user: CurrentCourseUserDependency,
     db: DBSessionDependency,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=SUBMISSIONS_HISTORY_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    summary: bool = False,
 ):
-    return SubmissionsService(db).get_all_current_user_submissions_results_from_activity(
-        course_id, activity_id, current_course_user
+    page = SubmissionsService(db).get_all_current_user_submissions_results_from_activity(
+        course_id, activity_id, current_course_user, limit, cursor, summary
     )
+    return __submissions_history_page_response(response, page)
 
 
 @router.get(
     "/courses/{course_id}/activities/{activity_id}/students/{student_user_id}/submissions",
-    response_model=List[SubmissionResultResponseDTO],
+    response_model=Union[List[SubmissionResultResponseDTO], List[SubmissionResultSummaryResponseDTO]],
+    description=SUBMISSIONS_HISTORY_DESCRIPTION,
 )
 def get_all_submissions_results_from_activity_for_student(
     course_id: int,
@@ -122,20 +195,53 @@ def get_all_submissions_results_from_activity_for_student(
     student_user_id: int,
     current_course_user: CurrentCourseUserDependency,
     db: DBSessionDependency,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=SUBMISSIONS_HISTORY_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    summary: bool = False,
 ):
-    return SubmissionsService(db).get_all_submissions_results_from_activity_for_student(
-        activity_id, student_user_id, current_course_user
+    page = SubmissionsService(db).get_all_submissions_results_from_activity_for_student(
+        activity_id, student_user_id, current_course_user, limit, cursor, summary
     )
+    return __submissions_history_page_response(response, page)
 
 
 # ==============================================================================
 
 
+# Batch routes go first: "batch" would otherwise be taken as a submission_id
+
+
+@router.get("/submissions/batch/{submissions_ids}", response_model=List[SubmissionResponseDTO])
+def get_submissions_batch(submissions_ids: str, runner_auth: RunnerAuthDependency, db: DBSessionDependency):
+    return SubmissionsService(db).get_submissions_for_runner(submissions_ids)
+
+
+@router.put("/submissions/batch/status", response_model=UpdateSubmissionsStatusesResponseDTO)
+def update_submissions_statuses_batch(
+    new_statuses_data: UpdateSubmissionsStatusesRequestDTO,
+    runner_auth: RunnerAuthDependency,
+    db: DBSessionDependency,
+):
+    return SubmissionsService(db).update_submissions_statuses(new_statuses_data)
+
+
 @router.get("/submissions/{submission_id}", response_model=SubmissionResponseDTO)
 def get_submission(submission_id: int, runner_auth: RunnerAuthDependency, db: DBSessionDependency):
     return SubmissionsService(db).get_submission_for_runner(submission_id)
 
 
+@router.get("/submissions/{submission_id}/workBundle")
+def get_submission_work_bundle(
+    submission_id: int,
+    runner_auth: RunnerAuthDependency,
+    db: DBSessionDependency,
+    merged: bool = False,
+    new_status: Optional[aux_models.SubmissionStatus] = None,
+):
+    return SubmissionsService(db).get_submission_work_bundle_for_runner(submission_id, merged, new_status)
+
+
 @router.put("/submissions/{submission_id}/status", response_model=SubmissionWithMetadataOnlyResponseDTO)
 def update_submission_status(
     submission_id: int,
@@ -163,7 +269,34 @@ def save_tests_execution_log_for_submission(
     response_model=List[SubmissionWithMetadataOnlyResponseDTO],
     status_code=status.HTTP_201_CREATED,
 )
-def reprocess_all_pending_submissions(
+def reprocess_all_pending_submissions(current_user: CurrentMainUserDependency, db: DBSessionDependency):
+    return SubmissionsService(db).reprocess_all_pending_submissions(current_user)
+
+
+@router.post(
+    "/submissions/reprocessingJobs",
+    response_model=SubmissionsReprocessingProgressResponseDTO,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+def start_submissions_reprocessing(
+    current_user: CurrentMainUserDependency,
+    db: DBSessionDependency,
+    reprocessing_data: Optional[SubmissionsReprocessingRequestDTO] = None,
+):
+    return SubmissionsService(db).start_submissions_reprocessing(current_user, reprocessing_data)
+
+
+@router.get(
+    "/submissions/reprocessingJobs/{job_id}", response_model=SubmissionsReprocessingProgressResponseDTO
+)
+def get_submissions_reprocessing_progress(
+    job_id: int, current_user: CurrentMainUserDependency, db: DBSessionDependency
+):
+    return SubmissionsService(db).get_submissions_reprocessing_progress(current_user, job_id)
+
+
+@router.get("/submissions/queue/stats")
+def get_submissions_queue_stats(
     current_user: CurrentMainUserDependency, db: DBSessionDependency, mq_sender: MQSenderDependency
 ):
-    return SubmissionsService(db, mq_sender).reprocess_all_pending_submissions(current_user)
+    return SubmissionsService(db, mq_sender).get_submissions_queue_stats(current_user)
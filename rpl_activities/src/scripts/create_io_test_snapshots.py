@@ -0,0 +1,29 @@
+"""
+Creates the snapshots of the IO tests created before snapshots existed (the same as their first run would),
+so that new runs of every IO test reference one. Safe to re-run and to run while the API is serving
+requests.
+
+Usage: python -m rpl_activities.src.scripts.create_io_test_snapshots [--batch-size N]
+"""
+
+import argparse
+import logging
+
+from rpl_activities.src.deps.database import SessionLocal
+from rpl_activities.src.repositories.models import models_metadata  # noqa: F401 (registers every model)
+from rpl_activities.src.repositories.activity_tests import TestsRepository
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create the snapshots of the IO tests without one")
+    parser.add_argument("--batch-size", type=int, default=100)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    with SessionLocal() as db_session:
+        updated = TestsRepository(db_session).create_missing_io_test_snapshots(args.batch_size)
+        logging.info(f"Created the snapshots of {updated} IO tests")
+
+
+if __name__ == "__main__":
+    main()
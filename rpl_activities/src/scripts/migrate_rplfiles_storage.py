@@ -0,0 +1,47 @@
+"""
+Moves the payloads of existing RPLFiles to the configured storage (RPLFILES_STORAGE_BACKEND):
+inline rplfiles (created before the blob storage) become deduplicated blobs, and blobs still stored
+in the database are copied to the external storage, if any. Safe to re-run and to run while the API
+is serving requests.
+
+Usage: python -m rpl_activities.src.scripts.migrate_rplfiles_storage [--batch-size N] [--sweep-unreferenced-hours H]
+"""
+
+import argparse
+import logging
+from datetime import datetime, timedelta, timezone
+
+from rpl_activities.src.deps.database import SessionLocal
+from rpl_activities.src.repositories.models import models_metadata  # noqa: F401 (registers every model)
+from rpl_activities.src.repositories.rpl_files import RPLFilesRepository
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move RPLFile payloads to the configured blob storage")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument(
+        "--sweep-unreferenced-hours",
+        type=float,
+        default=None,
+        help="Also delete blobs unreferenced for at least this many hours",
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    with SessionLocal() as db_session:
+        rplfiles_repo = RPLFilesRepository(db_session)
+        moved = rplfiles_repo.move_payloads_to_current_storage(args.batch_size)
+        logging.info(
+            f"Moved {moved['inline_rplfiles']} inline rplfiles to blobs and "
+            f"{moved['database_blobs']} database blobs to the external storage"
+        )
+        if args.sweep_unreferenced_hours is not None:
+            last_referenced_before = datetime.now(timezone.utc) - timedelta(
+                hours=args.sweep_unreferenced_hours
+            )
+            deleted = rplfiles_repo.delete_unreferenced_blobs(last_referenced_before)
+            logging.info(f"Deleted {deleted} unreferenced blobs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+"""
+Regenerates the per (activity, user) submissions summaries from the submissions themselves: to be run
+once the rollout that starts maintaining them finishes (the previous version of the API doesn't count its
+changes), and whenever they are suspected to be out of sync (e.g. after fixing submissions by hand). Each
+run is a single transaction, so it's safe to re-run.
+
+Usage: python -m rpl_activities.src.scripts.rebuild_submissions_summaries [--course-id ID]
+"""
+
+import argparse
+import logging
+
+from rpl_activities.src.deps.database import SessionLocal
+from rpl_activities.src.repositories.models import models_metadata  # noqa: F401 (registers every model)
+from rpl_activities.src.repositories.submissions_summaries import SubmissionsSummariesRepository
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the submissions summaries from the submissions")
+    parser.add_argument(
+        "--course-id", type=int, default=None, help="Only rebuild the summaries of this course"
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    with SessionLocal() as db_session:
+        rebuilt = SubmissionsSummariesRepository(db_session).rebuild_summaries(args.course_id)
+        logging.info(f"Rebuilt {rebuilt} submissions summaries")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 from datetime import timedelta
 import logging
+from typing import Optional
 from fastapi import HTTPException, status
 from rpl_activities.src.deps.auth import CurrentCourseUser, CurrentMainUser
 from rpl_activities.src.dtos.activity_dtos import (
@@ -13,15 +14,15 @@ from rpl_activities.src.repositories.categories import CategoriesRepository
 from rpl_activities.src.repositories.models import aux_models
 from rpl_activities.src.repositories.models.activity import Activity
 from rpl_activities.src.repositories.models.activity_category import ActivityCategory
-from rpl_activities.src.repositories.models.activity_submission import ActivitySubmission
-from rpl_activities.src.repositories.submissions import SubmissionsRepository
+from rpl_activities.src.repositories.models.activity_submissions_summary import ActivitySubmissionsSummary
+from rpl_activities.src.repositories.submissions_summaries import SubmissionsSummariesRepository
 from rpl_activities.src.services.activity_tests import TestsService
 
 
 class ActivitiesService:
     def __init__(self, db):
         self.activities_repo = ActivitiesRepository(db)
-        self.submissions_repo = SubmissionsRepository(db)
+        self.summaries_repo = SubmissionsSummariesRepository(db)
         self.categories_repo = CategoriesRepository(db)
         self.tests_service = TestsService(db)
 
@@ -75,23 +76,11 @@ class ActivitiesService:
             activities = self.activities_repo.get_all_active_activities_by_course_id(course_id)
         return activities
 
-    def __group_submissions_by_activity(
-        self, submissions: list[ActivitySubmission]
-    ) -> dict[int, list[ActivitySubmission]]:
-        submissions_by_activity: dict[int, list[ActivitySubmission]] = {}
-        for submission in submissions:
-            activity_id = submission.activity_id
-            if activity_id not in submissions_by_activity:
-                submissions_by_activity[activity_id] = []
-            submissions_by_activity[activity_id].append(submission)
-        return submissions_by_activity
-
     def build_activity_metadata_response_dto(
         self,
         activity: Activity,
         course_id: int,
-        current_course_user: CurrentCourseUser,
-        current_user_submissions_at_activity: list[ActivitySubmission],
+        current_user_summary_at_activity: Optional[ActivitySubmissionsSummary],
     ) -> ActivityWithMetadataOnlyResponseDTO:
         return ActivityWithMetadataOnlyResponseDTO(
             id=activity.id,
@@ -107,11 +96,15 @@ class ActivitiesService:
             deleted=activity.deleted,
             points=activity.points,
             starting_rplfile_id=activity.starting_rplfile.id,
-            submission_status=self.submissions_repo.get_best_submission_status_by_user_at_activity(
-                current_course_user.user_id, activity, current_user_submissions_at_activity
+            submission_status=(
+                current_user_summary_at_activity.best_status
+                if current_user_summary_at_activity
+                else aux_models.SubmissionStatus.NO_SUBMISSIONS
             ),
-            last_submission_date=self.submissions_repo.get_last_submission_date_by_user_at_activity(
-                current_course_user.user_id, activity, current_user_submissions_at_activity
+            last_submission_date=(
+                current_user_summary_at_activity.last_submission_date - timedelta(hours=3)
+                if current_user_summary_at_activity
+                else None
             ),
             date_created=(activity.date_created - timedelta(hours=3)),
             last_updated=(activity.last_updated - timedelta(hours=3)),
@@ -153,18 +146,12 @@ class ActivitiesService:
         if not activities:
             return []
 
-        all_submissions_by_current_user = self.submissions_repo.get_all_submissions_by_user_at_activities(
-            current_course_user.user_id, activities
-        )
-        current_user_submissions_by_activity = self.__group_submissions_by_activity(
-            all_submissions_by_current_user
+        current_user_summaries_by_activity = self.summaries_repo.get_summaries_by_user_at_activities(
+            current_course_user.user_id, [activity.id for activity in activities]
         )
         return [
             self.build_activity_metadata_response_dto(
-                activity,
-                course_id,
-                current_course_user,
-                current_user_submissions_by_activity.get(activity.id, []),
+                activity, course_id, current_user_summaries_by_activity.get(activity.id)
             )
             for activity in activities
         ]
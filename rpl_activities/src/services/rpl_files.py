@@ -1,6 +1,8 @@
+import hashlib
 import logging
+from typing import Optional
 from fastapi import HTTPException, status
-from fastapi.responses import Response
+from fastapi.responses import Response, StreamingResponse
 import json
 
 from rpl_activities.src.deps.auth import CurrentCourseUser
@@ -11,6 +13,9 @@ from rpl_activities.src.repositories.models.rpl_file import RPLFile
 from rpl_activities.src.repositories.rpl_files import RPLFilesRepository
 from rpl_activities.src.services.activities import ActivitiesService
 
+# Cacheable by the runner, but always revalidated (starting files can be updated by teachers)
+RAW_RPLFILE_CACHE_CONTROL = "private, no-cache"
+
 
 class RPLFilesService:
     def __init__(self, db):
@@ -23,7 +28,7 @@ class RPLFilesService:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
         if rplfile.file_type != aux_models.RPLFileType.GZIP:
             return {rplfile.file_name: rplfile.data.decode()}
-        return tar_utils.extract_tar_gz_to_dict_of_files(rplfile.data)
+        return self.rpl_files_repo.get_extracted_files(rplfile)
 
     def __get_displayable_files_only(self, extracted_rplfile, general_metadata_dict):
         filtered_files: ExtractedFilesDict = {}
@@ -56,17 +61,43 @@ class RPLFilesService:
 
     # ==============================================================================
 
-    def get_raw_rplfile_for_runner(self, rplfile_id: int) -> Response:
+    def __get_etag(self, rplfile: RPLFile) -> str:
+        content_digest = self.rpl_files_repo.get_content_digest(rplfile)
+        return (
+            '"'
+            + hashlib.sha256(f"{content_digest}:{rplfile.last_updated.isoformat()}".encode()).hexdigest()
+            + '"'
+        )
+
+    def __matches_if_none_match(self, etag: str, if_none_match: Optional[str]) -> bool:
+        if not if_none_match:
+            return False
+        if if_none_match.strip() == "*":
+            return True
+        return any(candidate.strip().removeprefix("W/") == etag for candidate in if_none_match.split(","))
+
+    def get_raw_rplfile_for_runner(self, rplfile_id: int, if_none_match: Optional[str] = None) -> Response:
         rplfile = self.rpl_files_repo.get_by_id(rplfile_id)
         if not rplfile:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
-        return Response(
-            content=rplfile.data,
+        # Starting files and unit tests are fetched for every run: the runner can revalidate its copy
+        # instead of downloading it again.
+        etag = self.__get_etag(rplfile)
+        cache_headers = {"ETag": etag, "Cache-Control": RAW_RPLFILE_CACHE_CONTROL}
+        if self.__matches_if_none_match(etag, if_none_match):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers)
+
+        headers = {
+            "Content-Disposition": f"attachment; filename={rplfile.file_name}",
+            "Content-Type": rplfile.file_type,
+            **cache_headers,
+        }
+        if rplfile.base_rplfile_id is None and rplfile.blob is not None:
+            headers["Content-Length"] = str(rplfile.blob.size)
+        return StreamingResponse(
+            content=self.rpl_files_repo.iter_materialized_data(rplfile),
             media_type=rplfile.file_type,
-            headers={
-                "Content-Disposition": f"attachment; filename={rplfile.file_name}",
-                "Content-Type": rplfile.file_type,
-            },
+            headers=headers,
         )
 
     def get_extracted_rplfile_for_teacher(
@@ -1,12 +1,14 @@
 from collections import defaultdict
 from typing import Optional
 from datetime import date
+import sqlalchemy as sa
+from rpl_activities.src.deps import submissions_analytics_index
 from rpl_activities.src.deps.auth import CurrentCourseUser, StudentCourseUser
 from rpl_activities.src.repositories.activities import ActivitiesRepository
-from rpl_activities.src.repositories.models import aux_models
 from rpl_activities.src.repositories.models.activity import Activity
-from rpl_activities.src.repositories.models.activity_submission import ActivitySubmission
+from rpl_activities.src.repositories.models.activity_submissions_summary import ActivitySubmissionsSummary
 from rpl_activities.src.repositories.submissions import SubmissionsRepository
+from rpl_activities.src.repositories.submissions_summaries import SubmissionsSummariesRepository
 from rpl_activities.src.services.activities import ActivitiesService
 from rpl_activities.src.dtos.stats_dtos import (
     BasicActivitiesStatsOfStudentDTO,
@@ -22,24 +24,14 @@ from rpl_activities.src.dtos.stats_dtos import (
 class StatsService:
     def __init__(self, db):
         self.submissions_repo = SubmissionsRepository(db)
+        self.summaries_repo = SubmissionsSummariesRepository(db)
         self.activities_service = ActivitiesService(db)
         self.activities_repo = ActivitiesRepository(db)
 
-    def __group_current_user_submissions_by_activity(
-        self, current_user_submissions: list[ActivitySubmission]
-    ) -> dict[int, list[ActivitySubmission]]:
-        curr_user_submissions_grouped_by_activity: dict[int, list[ActivitySubmission]] = {}
-        for submission in current_user_submissions:
-            activity_id = submission.activity_id
-            if activity_id not in curr_user_submissions_grouped_by_activity:
-                curr_user_submissions_grouped_by_activity[activity_id] = []
-            curr_user_submissions_grouped_by_activity[activity_id].append(submission)
-        return curr_user_submissions_grouped_by_activity
-
     def __calculate_activities_stats_of_current_user(
         self,
         activities: list[Activity],
-        curr_user_submissions_grouped_by_activity: dict[int, list[ActivitySubmission]],
+        curr_user_summaries_by_activity: dict[int, ActivitySubmissionsSummary],
     ) -> ActivitiesStatsOfStudentDTO:
         amount_of_activities_started = 0
         amount_of_activities_not_started = 0
@@ -48,11 +40,11 @@ class StatsService:
         total_possible_points = 0
 
         for activity in activities:
-            submissions = curr_user_submissions_grouped_by_activity.get(activity.id, [])
+            summary = curr_user_summaries_by_activity.get(activity.id)
             total_possible_points += activity.points
-            if not submissions:
+            if not summary or summary.total_submissions == 0:
                 amount_of_activities_not_started += 1
-            elif any(submission.status == aux_models.SubmissionStatus.SUCCESS for submission in submissions):
+            elif summary.successful_submissions > 0:
                 amount_of_activities_solved += 1
                 points_obtained += activity.points
             else:
@@ -66,46 +58,38 @@ class StatsService:
             total_possible_points=total_possible_points,
         )
 
-    def __sum_submissions_with_specific_status(
-        self, curr_user_submissions: list[ActivitySubmission], status: aux_models.SubmissionStatus
-    ) -> int:
-        return sum(1 for submission in curr_user_submissions if submission.status == status)
-
-    def __calculate_and_build_stats_for_submissions(
-        self,
-        submissions: list[ActivitySubmission],
-        total_submitters: Optional[int] = None,
-        total_submitters_with_at_least_one_successful_submission: Optional[int] = None,
-        total_submitters_without_successful_submissions: Optional[int] = None,
-        avg_submissions_by_student: Optional[float] = None,
-        avg_error_submissions_by_student: Optional[float] = None,
-        avg_success_submissions_by_student: Optional[float] = None,
+    def __build_submissions_stats(
+        self, stats_row: Optional[sa.Row], with_submitters_stats: bool = True
     ) -> SubmissionsStatsDTO:
-        total_submissions = len(submissions)
-        successful_submissions = self.__sum_submissions_with_specific_status(
-            submissions, aux_models.SubmissionStatus.SUCCESS
-        )
-        submissions_with_runtime_errors = self.__sum_submissions_with_specific_status(
-            submissions, aux_models.SubmissionStatus.RUNTIME_ERROR
-        )
-        submissions_with_build_errors = self.__sum_submissions_with_specific_status(
-            submissions, aux_models.SubmissionStatus.BUILD_ERROR
-        )
-        submissions_with_failures = self.__sum_submissions_with_specific_status(
-            submissions, aux_models.SubmissionStatus.FAILURE
-        )
+        # stats_row: as returned by SubmissionsRepository.get_submissions_stats (None if no submissions)
+        def value_of(column: str) -> int:
+            return (getattr(stats_row, column) or 0) if stats_row is not None else 0
+
+        total_submissions = value_of("total_submissions")
+        successful_submissions = value_of("successful_submissions")
+        total_submitters = value_of("total_submitters") if total_submissions > 0 else 0
+        submitters_with_success = value_of("total_submitters_with_at_least_one_successful_submission")
+
+        def avg_by_submitter(amount: int) -> float:
+            return amount / total_submitters if total_submitters > 0 else 0
+
+        submitters_stats = {
+            "avg_submissions_by_student": avg_by_submitter(total_submissions),
+            "avg_error_submissions_by_student": avg_by_submitter(total_submissions - successful_submissions),
+            "avg_success_submissions_by_student": avg_by_submitter(successful_submissions),
+            "total_submitters": total_submitters,
+            "total_submitters_with_at_least_one_successful_submission": submitters_with_success,
+            "total_submitters_without_successful_submissions": total_submitters - submitters_with_success,
+        }
+        if not with_submitters_stats:
+            submitters_stats = dict.fromkeys(submitters_stats)
         return SubmissionsStatsDTO(
             total_submissions=total_submissions,
             successful_submissions=successful_submissions,
-            submissions_with_runtime_errors=submissions_with_runtime_errors,
-            submissions_with_build_errors=submissions_with_build_errors,
-            submissions_with_failures=submissions_with_failures,
-            avg_submissions_by_student=avg_submissions_by_student,
-            avg_error_submissions_by_student=avg_error_submissions_by_student,
-            avg_success_submissions_by_student=avg_success_submissions_by_student,
-            total_submitters=total_submitters,
-            total_submitters_with_at_least_one_successful_submission=total_submitters_with_at_least_one_successful_submission,
-            total_submitters_without_successful_submissions=total_submitters_without_successful_submissions,
+            submissions_with_runtime_errors=value_of("submissions_with_runtime_errors"),
+            submissions_with_build_errors=value_of("submissions_with_build_errors"),
+            submissions_with_failures=value_of("submissions_with_failures"),
+            **submitters_stats,
         )
 
     # ==============================================================================
@@ -117,28 +101,23 @@ class StatsService:
         if not user_ids:
             return []
         activities = self.activities_repo.get_all_active_activities_by_course_id(course_id)
-        all_submissions = self.submissions_repo.get_all_submissions_by_users_at_activities(
-            user_ids, activities
+        points_by_activity_id = {activity.id: activity.points for activity in activities}
+        summaries_with_success = self.summaries_repo.get_summaries_with_success_by_users_at_activities(
+            user_ids, list(points_by_activity_id)
         )
-        submissions_by_user = defaultdict(list)
-        for submission in all_submissions:
-            submissions_by_user[submission.user_id].append(submission)
+        solved_activity_ids_by_user = defaultdict(list)
+        for summary in summaries_with_success:
+            solved_activity_ids_by_user[summary.user_id].append(summary.activity_id)
         basic_stats = []
         for user_id in user_ids:
-            user_submissions = submissions_by_user.get(user_id, [])
-            successful_submissions = [
-                submission
-                for submission in user_submissions
-                if submission.status == aux_models.SubmissionStatus.SUCCESS
-            ]
-            activities_with_at_least_one_success = set(
-                submission.activity for submission in successful_submissions
-            )
+            solved_activity_ids = solved_activity_ids_by_user.get(user_id, [])
             basic_stats.append(
                 BasicActivitiesStatsOfStudentDTO(
                     user_id=user_id,
-                    total_score=sum(activity.points for activity in activities_with_at_least_one_success),
-                    successful_activities_count=len(activities_with_at_least_one_success),
+                    total_score=sum(
+                        points_by_activity_id[activity_id] for activity_id in solved_activity_ids
+                    ),
+                    successful_activities_count=len(solved_activity_ids),
                 )
             )
         return basic_stats
@@ -148,25 +127,22 @@ class StatsService:
     ) -> ActivitiesStatsOfStudentDTO:
         self.activities_service.verify_permission_to_submit(current_course_user)
         activities = self.activities_repo.get_all_active_activities_by_course_id(course_id)
-        curr_user_submissions = self.submissions_repo.get_all_submissions_by_user_at_activities(
-            current_course_user.user_id, activities
-        )
-        curr_user_submissions_grouped_by_activity = self.__group_current_user_submissions_by_activity(
-            curr_user_submissions
-        )
-        return self.__calculate_activities_stats_of_current_user(
-            activities, curr_user_submissions_grouped_by_activity
+        curr_user_summaries_by_activity = self.summaries_repo.get_summaries_by_user_at_activities(
+            current_course_user.user_id, [activity.id for activity in activities]
         )
+        return self.__calculate_activities_stats_of_current_user(activities, curr_user_summaries_by_activity)
 
     def get_submissions_stats_for_current_user(
         self, course_id: int, current_course_user: CurrentCourseUser
     ) -> SubmissionsStatsDTO:
         self.activities_service.verify_permission_to_submit(current_course_user)
         activities = self.activities_repo.get_all_active_activities_by_course_id(course_id)
-        curr_user_submissions = self.submissions_repo.get_all_submissions_by_user_at_activities(
-            current_course_user.user_id, activities
+        stats_rows = self.submissions_repo.get_submissions_stats(
+            [current_course_user.user_id], [activity.id for activity in activities]
+        )
+        return self.__build_submissions_stats(
+            stats_rows[0] if stats_rows else None, with_submitters_stats=False
         )
-        return self.__calculate_and_build_stats_for_submissions(curr_user_submissions)
 
     # ==============================================================================
 
@@ -187,11 +163,11 @@ class StatsService:
         students = self.__get_students_with_filter_applied(all_students_course_users, user_id)
 
         if group_by == "user":
-            return self.__get_submission_stats_grouped_by_user(students, activities, date)
+            return self.__get_submission_stats_grouped_by_user(course_id, students, activities, date)
         elif group_by == "date":
-            return self.__get_submission_stats_grouped_by_date(students, activities, date)
+            return self.__get_submission_stats_grouped_by_date(course_id, students, activities, date)
         else:
-            return self.__get_submission_stats_grouped_by_activity(students, activities, date)
+            return self.__get_submission_stats_grouped_by_activity(course_id, students, activities, date)
 
     def __get_activities_with_filters_applied(
         self, course_id: int, category_id: Optional[int], activity_id: Optional[int]
@@ -210,59 +186,98 @@ class StatsService:
             return [student for student in all_students_course_users if student.user_id == user_id]
         return all_students_course_users
 
+    def __get_students_submissions_stats(
+        self,
+        course_id: int,
+        students: list[StudentCourseUser],
+        activities: list[Activity],
+        date_filter: Optional[date],
+        group_by: str,
+    ) -> list:
+        # Rows as returned by SubmissionsRepository.get_submissions_stats
+        user_ids = [student.user_id for student in students]
+        activity_ids = [activity.id for activity in activities]
+        index = submissions_analytics_index.course_submissions_index
+        if index is None or not user_ids or not activity_ids:
+            return self.submissions_repo.get_submissions_stats(user_ids, activity_ids, date_filter, group_by)
+        return index.get_submissions_stats(
+            course_id,
+            lambda updated_since: self.submissions_repo.get_submissions_columns_of_course(
+                course_id, updated_since
+            ),
+            user_ids,
+            activity_ids,
+            date_filter,
+            group_by,
+        )
+
     def __get_submission_stats_grouped_by_user(
-        self, students: list[StudentCourseUser], activities: list[Activity], date_filter: Optional[date]
+        self,
+        course_id: int,
+        students: list[StudentCourseUser],
+        activities: list[Activity],
+        date_filter: Optional[date],
     ) -> GroupedSubmissionsStatsDTO:
-        submissions_by_user_id = self.__gather_submissions_grouped_by_user_id(
-            students, activities, date_filter
+        stats_rows = self.__get_students_submissions_stats(
+            course_id, students, activities, date_filter, group_by="user"
         )
-        students_by_user_id = {student.user_id: student for student in students}
+        stats_row_by_user_id = {stats_row.group_key: stats_row for stats_row in stats_rows}
         stats_sorted_by_user_grouped = []
         grouping_metadata = []
-        for user_id, submissions in submissions_by_user_id.items():
-            stats = self.__calculate_submissions_stats(students, submissions, submissions_by_user_id)
-            stats_sorted_by_user_grouped.append(stats)
-            student = students_by_user_id.get(user_id)
-            if student:
-                grouping_metadata.append(
-                    MetadataFoUsersGroupingDTO(
-                        id=student.user_id,
-                        course_user_id=student.id,
-                        name=student.name,
-                        surname=student.surname,
-                        username=student.username,
-                        student_id=student.student_id,
-                    )
+        for student in students:
+            stats_sorted_by_user_grouped.append(
+                self.__build_submissions_stats(stats_row_by_user_id.get(student.user_id))
+            )
+            grouping_metadata.append(
+                MetadataFoUsersGroupingDTO(
+                    id=student.user_id,
+                    course_user_id=student.id,
+                    name=student.name,
+                    surname=student.surname,
+                    username=student.username,
+                    student_id=student.student_id,
                 )
+            )
         return GroupedSubmissionsStatsDTO(
             submissions_stats=stats_sorted_by_user_grouped, metadata=grouping_metadata
         )
 
     def __get_submission_stats_grouped_by_date(
-        self, students: list[StudentCourseUser], activities: list[Activity], date_filter: Optional[date]
+        self,
+        course_id: int,
+        students: list[StudentCourseUser],
+        activities: list[Activity],
+        date_filter: Optional[date],
     ) -> GroupedSubmissionsStatsDTO:
-        submissions_by_date = self.__gather_submissions_grouped_by_date(students, activities, date_filter)
+        stats_rows = self.__get_students_submissions_stats(
+            course_id, students, activities, date_filter, group_by="date"
+        )
         stats_sorted_by_date_grouped = []
         grouping_metadata = []
-        for grouping_date, submissions in submissions_by_date.items():
-            stats = self.__calculate_submissions_stats(students, submissions)
-            stats_sorted_by_date_grouped.append(stats)
-            grouping_metadata.append(MetadataForDateGroupingDTO(date=grouping_date))
+        for stats_row in stats_rows:
+            stats_sorted_by_date_grouped.append(self.__build_submissions_stats(stats_row))
+            grouping_metadata.append(MetadataForDateGroupingDTO(date=stats_row.group_key))
         return GroupedSubmissionsStatsDTO(
             submissions_stats=stats_sorted_by_date_grouped, metadata=grouping_metadata
         )
 
     def __get_submission_stats_grouped_by_activity(
-        self, students: list[StudentCourseUser], activities: list[Activity], date_filter: Optional[date]
+        self,
+        course_id: int,
+        students: list[StudentCourseUser],
+        activities: list[Activity],
+        date_filter: Optional[date],
     ) -> GroupedSubmissionsStatsDTO:
-        submissions_by_activity = self.__gather_submissions_grouped_by_activity(
-            students, activities, date_filter
+        stats_rows = self.__get_students_submissions_stats(
+            course_id, students, activities, date_filter, group_by="activity"
         )
+        stats_row_by_activity_id = {stats_row.group_key: stats_row for stats_row in stats_rows}
         stats_sorted_by_activity_grouped = []
         grouping_metadata = []
-        for activity, submissions in submissions_by_activity.items():
-            stats = self.__calculate_submissions_stats(students, submissions)
-            stats_sorted_by_activity_grouped.append(stats)
+        for activity in activities:
+            stats_sorted_by_activity_grouped.append(
+                self.__build_submissions_stats(stats_row_by_activity_id.get(activity.id))
+            )
             grouping_metadata.append(
                 MetadataForActivitiesGroupingDTO(
                     id=activity.id,
@@ -274,110 +289,3 @@ class StatsService:
         return GroupedSubmissionsStatsDTO(
             submissions_stats=stats_sorted_by_activity_grouped, metadata=grouping_metadata
         )
-
-    def __calculate_submissions_stats(
-        self,
-        students: list[StudentCourseUser],
-        submissions: list[ActivitySubmission],
-        grouped_submissions_by_user_id: Optional[dict[int, list[ActivitySubmission]]] = None,
-    ) -> SubmissionsStatsDTO:
-        total_submitters = 0
-        total_submitters_with_at_least_one_successful_submission = 0
-        total_submitters_without_successful_submissions = 0
-
-        total_submissions = 0
-        total_submissions_with_success = 0
-        total_submissions_with_error = 0
-
-        if grouped_submissions_by_user_id is None:
-            grouped_submissions_by_user_id = defaultdict(list[ActivitySubmission])
-            for submission in submissions:
-                grouped_submissions_by_user_id[submission.user_id].append(submission)
-            for student in students:
-                grouped_submissions_by_user_id[student.user_id] = grouped_submissions_by_user_id.get(
-                    student.user_id, []
-                )
-
-        for user_id, user_submissions in grouped_submissions_by_user_id.items():
-            if user_submissions:
-                total_submitters += 1
-                total_submissions_with_success += sum(
-                    1
-                    for submission in user_submissions
-                    if submission.status == aux_models.SubmissionStatus.SUCCESS
-                )
-                total_submissions_with_error += sum(
-                    1
-                    for submission in user_submissions
-                    if submission.status != aux_models.SubmissionStatus.SUCCESS
-                )
-                total_submissions += len(user_submissions)
-                if any(
-                    submission.status == aux_models.SubmissionStatus.SUCCESS
-                    for submission in user_submissions
-                ):
-                    total_submitters_with_at_least_one_successful_submission += 1
-                else:
-                    total_submitters_without_successful_submissions += 1
-
-        avg_submissions_by_student = total_submissions / total_submitters if total_submitters > 0 else 0
-        avg_error_submissions_by_student = (
-            total_submissions_with_error / total_submitters if total_submitters > 0 else 0
-        )
-        avg_success_submissions_by_student = (
-            total_submissions_with_success / total_submitters if total_submitters > 0 else 0
-        )
-        return self.__calculate_and_build_stats_for_submissions(
-            submissions,
-            total_submitters,
-            total_submitters_with_at_least_one_successful_submission,
-            total_submitters_without_successful_submissions,
-            avg_submissions_by_student,
-            avg_error_submissions_by_student,
-            avg_success_submissions_by_student,
-        )
-
-    # ==============================================================================
-
-    def __gather_submissions_grouped_by_user_id(
-        self, students: list[StudentCourseUser], activities: list[Activity], date_filter: Optional[date]
-    ) -> dict[int, list[ActivitySubmission]]:
-        submissions_by_user_id = defaultdict(list[ActivitySubmission])
-        submissions = self.__get_all_submissions_by_students_at_activities(students, activities, date_filter)
-        for submission in submissions:
-            submissions_by_user_id[submission.user_id].append(submission)
-        for student in students:
-            submissions_by_user_id[student.user_id] = submissions_by_user_id.get(student.user_id, [])
-        return submissions_by_user_id
-
-    def __gather_submissions_grouped_by_date(
-        self, students: list[StudentCourseUser], activities: list[Activity], date_filter: Optional[date]
-    ) -> dict[date, list[ActivitySubmission]]:
-        submissions_by_date = defaultdict(list[ActivitySubmission])
-        submissions = self.__get_all_submissions_by_students_at_activities(students, activities, date_filter)
-        for submission in submissions:
-            submission_date = submission.date_created.date()
-            submissions_by_date[submission_date].append(submission)
-        return submissions_by_date
-
-    def __gather_submissions_grouped_by_activity(
-        self, students: list[StudentCourseUser], activities: list[Activity], date_filter: Optional[date]
-    ) -> dict[Activity, list[ActivitySubmission]]:
-        submissions_by_activity = defaultdict(list[ActivitySubmission])
-        submissions = self.__get_all_submissions_by_students_at_activities(students, activities, date_filter)
-        for submission in submissions:
-            submissions_by_activity[submission.activity].append(submission)
-        for activity in activities:
-            submissions_by_activity[activity] = submissions_by_activity.get(activity, [])
-        return submissions_by_activity
-
-    def __get_all_submissions_by_students_at_activities(
-        self, students: list[StudentCourseUser], activities: list[Activity], date_filter: Optional[date]
-    ) -> list[ActivitySubmission]:
-        user_ids = [student.user_id for student in students]
-        submissions = self.submissions_repo.get_all_submissions_by_users_at_activities(user_ids, activities)
-        if date_filter:
-            submissions = [
-                submission for submission in submissions if submission.date_created.date() == date_filter
-            ]
-        return submissions
@@ -1,28 +1,70 @@
-import logging
-from typing import Union
+import base64
+from datetime import datetime
+import json
+import time
+from typing import AsyncIterator, Optional, Union
 from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from sqlalchemy.orm import sessionmaker
+from rpl_activities.src.config import env
+from rpl_activities.src.deps import tar_utils
 from rpl_activities.src.deps.auth import CurrentCourseUser, CurrentMainUser, StudentCourseUser
 from rpl_activities.src.deps.mq_sender import MQSender
+from rpl_activities.src.deps.submission_status_notifier import (
+    SubmissionStatusSubscription,
+    submission_status_notifier,
+)
 from rpl_activities.src.dtos.submission_dtos import (
     SubmissionCreationRequestDTO,
     AllFinalSubmissionsResponseDTO,
     SubmissionResultResponseDTO,
+    SubmissionResultSummaryResponseDTO,
     SubmissionResponseDTO,
+    SubmissionStatusEventDTO,
     UpdateSubmissionStatusRequestDTO,
     TestsExecutionLogDTO,
     SubmissionWithMetadataOnlyResponseDTO,
+    SubmissionsReprocessingRequestDTO,
+    SubmissionsReprocessingProgressResponseDTO,
+    UpdateSubmissionsStatusesRequestDTO,
+    UpdateSubmissionsStatusesResponseDTO,
+    RUNNER_BATCH_MAX_SIZE,
+    SUBMISSIONS_HISTORY_MAX_PAGE_SIZE,
 )
 from rpl_activities.src.repositories.activity_tests import TestsRepository
+from rpl_activities.src.repositories.rpl_files import RPLFilesRepository
 from rpl_activities.src.repositories.submissions import SubmissionsRepository
+from rpl_activities.src.repositories.submissions_reprocessing_jobs import (
+    SubmissionsReprocessingJobsRepository,
+)
 from rpl_activities.src.repositories.models import aux_models
 from rpl_activities.src.repositories.models.activity_submission import ActivitySubmission
+from rpl_activities.src.repositories.models.submissions_reprocessing_job import SubmissionsReprocessingJob
 from rpl_activities.src.services.activities import ActivitiesService
+from rpl_activities.src.services.submissions_reprocessor import (
+    INTERRUPTED_JOB_TIMEOUT,
+    submissions_reprocessor,
+)
+
+WORK_BUNDLE_METADATA_FILENAME = "submission.json"
+WORK_BUNDLE_SUBMISSION_FILES_FILENAME = "submission.tar.gz"
+WORK_BUNDLE_STARTING_FILES_FILENAME = "activity_starting_files.tar.gz"
+WORK_BUNDLE_MERGED_FILES_FILENAME = "files.tar.gz"
+SUBMISSION_STATUS_STREAM_KEEPALIVE = ": keep-alive\n\n"
+
+type SubmissionsHistoryPage = tuple[
+    list[SubmissionResultResponseDTO] | list[SubmissionResultSummaryResponseDTO], Optional[str]
+]
 
 
 class SubmissionsService:
     def __init__(self, db_session, mq_sender: MQSender | None = None):
+        self.db_session = db_session
         self.submissions_repo = SubmissionsRepository(db_session)
         self.tests_repo = TestsRepository(db_session)
+        self.rpl_files_repo = RPLFilesRepository(db_session)
+        self.reprocessing_jobs_repo = SubmissionsReprocessingJobsRepository(db_session)
         self.activities_service = ActivitiesService(db_session)
         self.mq_sender = mq_sender
 
@@ -93,6 +135,60 @@ class SubmissionsService:
             unit_tests_run_results=unit_tests_run_results,
         )
 
+    def __build_submission_result_summary_response(
+        self, submission: ActivitySubmission
+    ) -> SubmissionResultSummaryResponseDTO:
+        return SubmissionResultSummaryResponseDTO(
+            id=submission.id,
+            activity_id=submission.activity_id,
+            submission_status=submission.status,
+            is_final_solution=submission.is_final_solution,
+            submission_date=submission.date_created,
+            exit_message=self.submissions_repo.get_tests_exit_msg_from_submission(submission),
+        )
+
+    def __encode_submissions_history_cursor(self, submission: ActivitySubmission) -> str:
+        raw_cursor = json.dumps([submission.date_created.isoformat(), submission.id])
+        return base64.urlsafe_b64encode(raw_cursor.encode()).decode()
+
+    def __decode_submissions_history_cursor(self, cursor: str) -> tuple[datetime, int]:
+        try:
+            raw_date, submission_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            return datetime.fromisoformat(raw_date), int(submission_id)
+        except (ValueError, TypeError):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+    def __get_submissions_history_page(
+        self, activity_id: int, user_id: int, limit: Optional[int], cursor: Optional[str], summary: bool
+    ) -> SubmissionsHistoryPage:
+        if cursor is not None and limit is None:
+            limit = SUBMISSIONS_HISTORY_MAX_PAGE_SIZE
+        submissions = self.submissions_repo.get_all_submissions_from_activity_id_and_user_id(
+            activity_id,
+            user_id,
+            limit=limit,
+            before=self.__decode_submissions_history_cursor(cursor) if cursor is not None else None,
+            summary_only=summary,
+        )
+        next_cursor = None
+        if limit is not None and len(submissions) == limit:
+            next_cursor = self.__encode_submissions_history_cursor(submissions[-1])
+        if summary:
+            return [self.__build_submission_result_summary_response(s) for s in submissions], next_cursor
+        return [self.__build_submission_result_response(s) for s in submissions], next_cursor
+
+    def __verify_and_get_finished_submission(self, submission_id: int) -> ActivitySubmission:
+        submission = self.__verify_and_get_submission(submission_id)
+        if submission.status in [
+            aux_models.SubmissionStatus.PENDING,
+            aux_models.SubmissionStatus.ENQUEUED,
+            aux_models.SubmissionStatus.PROCESSING,
+        ]:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail=f"submission_status: {submission.status}"
+            )
+        return submission
+
     def __verify_and_get_submission(self, submission_id: int) -> ActivitySubmission:
         submission = self.submissions_repo.get_by_id(submission_id)
         if not submission:
@@ -101,39 +197,27 @@ class SubmissionsService:
             )
         return submission
 
-    def __set_submission_status_according_to_tests_exec_log(
-        self,
-        submission: ActivitySubmission,
-        new_execution_log_data: TestsExecutionLogDTO,
-        passed_all_tests: bool,
-    ):
-        if (
-            new_execution_log_data.tests_execution_result_status
-            == aux_models.TestsExecutionResultStatus.TIME_OUT
-        ):
-            submission = self.submissions_repo.update_submission_status(
-                submission, aux_models.SubmissionStatus.TIME_OUT
-            )
-        elif passed_all_tests:
-            submission = self.submissions_repo.update_submission_status(
-                submission, aux_models.SubmissionStatus.SUCCESS
-            )
-        else:
-            submission = self.submissions_repo.update_submission_status(
-                submission, aux_models.SubmissionStatus.FAILURE
+    def __get_submission_status_according_to_tests_exec_log(
+        self, submission: ActivitySubmission, new_execution_log_data: TestsExecutionLogDTO
+    ) -> aux_models.SubmissionStatus:
+        result_status = new_execution_log_data.tests_execution_result_status
+        if result_status == aux_models.TestsExecutionResultStatus.ERROR:
+            return aux_models.SubmissionStatus.from_tests_execution_errored_stage(
+                new_execution_log_data.tests_execution_stage
             )
+        if result_status == aux_models.TestsExecutionResultStatus.TIME_OUT:
+            return aux_models.SubmissionStatus.TIME_OUT
 
-    def __post_submission_to_queue(self, submission: ActivitySubmission):
-        if not self.mq_sender:
-            logging.warning("MQSender is not configured, skipping submission queue posting.")
-            return
-        try:
-            self.mq_sender.send_submission(submission.id, submission.activity.language)
-            self.submissions_repo.update_submission_status(submission, aux_models.SubmissionStatus.ENQUEUED)
-        except Exception as e:
-            logging.error(f"Failed to send submission {submission.id} to MQ: {e}")
-
-    # ==============================================================================
+        passed_all_tests = False
+        if submission.activity.is_io_tested:
+            passed_all_tests = self.tests_repo.check_if_all_io_tests_passed(
+                submission.activity.io_tests, new_execution_log_data
+            )
+        elif submission.activity.unit_test_suite:
+            passed_all_tests = self.tests_repo.check_if_all_unit_tests_passed(new_execution_log_data)
+        return (
+            aux_models.SubmissionStatus.SUCCESS if passed_all_tests else aux_models.SubmissionStatus.FAILURE
+        )
 
     def create_submission(
         self,
@@ -147,7 +231,6 @@ class SubmissionsService:
         submission = self.submissions_repo.create_submission_for_activity(
             new_submission_data, activity, current_course_user
         )
-        self.__post_submission_to_queue(submission)
         return self.__build_submission_with_metadata_only_response(submission)
 
     def mark_submission_as_final_solution(
@@ -186,34 +269,98 @@ class SubmissionsService:
         self, submission_id: int, current_course_user: CurrentCourseUser
     ) -> SubmissionResultResponseDTO:
         self.activities_service.verify_permission_to_submit(current_course_user)
+        submission = self.__verify_and_get_finished_submission(submission_id)
+        return self.__build_submission_result_response(submission)
+
+    def __get_submission_status_releasing_the_connection(self, submission_id: int) -> str:
+        # Waiting mustn't hold a pooled connection (nor its open transaction): it's released here, and the
+        # result is read afterwards in a new transaction (rolling back also expires what was loaded).
         submission = self.__verify_and_get_submission(submission_id)
-        if submission.status in [
-            aux_models.SubmissionStatus.PENDING,
-            aux_models.SubmissionStatus.ENQUEUED,
-            aux_models.SubmissionStatus.PROCESSING,
-        ]:
+        current_status = submission.status
+        self.db_session.rollback()
+        return current_status
+
+    async def wait_for_submission_execution_result(
+        self, submission_id: int, current_course_user: CurrentCourseUser, wait_seconds: float
+    ) -> SubmissionResultResponseDTO:
+        # Long polling: waits (without blocking the worker) until the submission finishes or wait_seconds
+        # elapse, woken up by the status notifications instead of re-reading the submission in a loop.
+        # DB work runs in the threadpool, as in any sync endpoint.
+        if not wait_seconds:
+            return await run_in_threadpool(
+                self.get_submission_execution_result, submission_id, current_course_user
+            )
+        self.activities_service.verify_permission_to_submit(current_course_user)
+        with submission_status_notifier.subscribe(submission_id) as subscription:
+            current_status = await run_in_threadpool(
+                self.__get_submission_status_releasing_the_connection, submission_id
+            )
+            deadline = time.monotonic() + wait_seconds
+            while not aux_models.SubmissionStatus(current_status).has_finished:
+                remaining_seconds = deadline - time.monotonic()
+                if remaining_seconds <= 0:
+                    break
+                new_status = await subscription.next_status(remaining_seconds)
+                if new_status is not None:
+                    current_status = new_status
+        return await run_in_threadpool(
+            self.get_submission_execution_result, submission_id, current_course_user
+        )
+
+    def get_submission_execution_full_log(
+        self,
+        submission_id: int,
+        log_stream: aux_models.TestsExecutionLogStream,
+        current_course_user: CurrentCourseUser,
+    ) -> PlainTextResponse:
+        # Results only carry capped logs: the full ones are fetched on demand through this
+        self.activities_service.verify_permission_to_submit(current_course_user)
+        submission = self.__verify_and_get_finished_submission(submission_id)
+        return PlainTextResponse(
+            self.submissions_repo.get_tests_execution_full_log_from_submission(submission, log_stream)
+        )
+
+    def get_submission_io_test_run_full_output(
+        self, submission_id: int, io_test_run_id: int, current_course_user: CurrentCourseUser
+    ) -> PlainTextResponse:
+        # Results only carry capped outputs of failed IO test runs: the full ones are fetched on demand
+        self.activities_service.verify_permission_to_submit(current_course_user)
+        submission = self.__verify_and_get_finished_submission(submission_id)
+        full_output = self.submissions_repo.get_io_test_run_full_output_from_submission(
+            submission, io_test_run_id
+        )
+        if full_output is None:
             raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail=f"submission_status: {submission.status}"
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"IO test run with id {io_test_run_id} not found.",
             )
-        return self.__build_submission_result_response(submission)
+        return PlainTextResponse(full_output)
 
     def get_all_current_user_submissions_results_from_activity(
-        self, course_id: int, activity_id: int, current_course_user: CurrentCourseUser
-    ) -> list[SubmissionResultResponseDTO]:
+        self,
+        course_id: int,
+        activity_id: int,
+        current_course_user: CurrentCourseUser,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        summary: bool = False,
+    ) -> SubmissionsHistoryPage:
         self.activities_service.verify_permission_to_submit(current_course_user)
-        submissions = self.submissions_repo.get_all_submissions_from_activity_id_and_user_id(
-            activity_id, current_course_user.user_id
+        return self.__get_submissions_history_page(
+            activity_id, current_course_user.user_id, limit, cursor, summary
         )
-        return [self.__build_submission_result_response(submission) for submission in submissions]
 
     def get_all_submissions_results_from_activity_for_student(
-        self, activity_id: int, student_user_id: int, current_course_user: CurrentCourseUser
-    ) -> list[SubmissionResultResponseDTO]:
+        self,
+        activity_id: int,
+        student_user_id: int,
+        current_course_user: CurrentCourseUser,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        summary: bool = False,
+    ) -> SubmissionsHistoryPage:
         self.activities_service.verify_permission_to_manage(current_course_user)
-        submissions = self.submissions_repo.get_all_submissions_from_activity_id_and_user_id(
-            activity_id, student_user_id
-        )
-        return [self.__build_submission_result_response(submission) for submission in submissions]
+        return self.__get_submissions_history_page(activity_id, student_user_id, limit, cursor, summary)
 
     # ==============================================================================
 
@@ -221,6 +368,62 @@ class SubmissionsService:
         submission = self.__verify_and_get_submission(submission_id)
         return self.__build_submission_response(submission)
 
+    def get_submissions_for_runner(self, raw_submissions_ids: str) -> list[SubmissionResponseDTO]:
+        try:
+            submission_ids = [int(submission_id) for submission_id in raw_submissions_ids.split(",")]
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid submission IDs format"
+            )
+        if len(submission_ids) > RUNNER_BATCH_MAX_SIZE:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"At most {RUNNER_BATCH_MAX_SIZE} submissions can be requested at once",
+            )
+        submissions = self.submissions_repo.get_by_ids(submission_ids)
+        return [self.__build_submission_response(submission) for submission in submissions]
+
+    def update_submissions_statuses(
+        self, new_statuses_data: UpdateSubmissionsStatusesRequestDTO
+    ) -> UpdateSubmissionsStatusesResponseDTO:
+        new_statuses_by_submission_id = {
+            update.submission_id: update.status for update in new_statuses_data.updates
+        }
+        updated_submission_ids = self.submissions_repo.update_submissions_statuses(
+            new_statuses_by_submission_id
+        )
+        for submission_id in updated_submission_ids:
+            submission_status_notifier.publish(submission_id, new_statuses_by_submission_id[submission_id])
+        return UpdateSubmissionsStatusesResponseDTO(
+            updated_submission_ids=updated_submission_ids,
+            not_found_submission_ids=sorted(set(new_statuses_by_submission_id) - set(updated_submission_ids)),
+        )
+
+    def get_submission_work_bundle_for_runner(
+        self, submission_id: int, merged: bool, new_status: Optional[aux_models.SubmissionStatus]
+    ) -> StreamingResponse:
+        # Everything the runner needs for a job in a single request (and DB session): the submission
+        # metadata (same as get_submission_for_runner) and its files, optionally updating its status too.
+        submission = self.__verify_and_get_submission(submission_id)
+        if new_status is not None:
+            submission = self.submissions_repo.update_submission_status(submission, new_status)
+            submission_status_notifier.publish(submission_id, new_status)
+        metadata = self.__build_submission_response(submission).model_dump_json().encode()
+        submission_files = self.rpl_files_repo.get_materialized_data(submission.solution_rplfile)
+        starting_files = self.rpl_files_repo.get_materialized_data(submission.activity.starting_rplfile)
+        bundle_files = [(WORK_BUNDLE_METADATA_FILENAME, metadata)]
+        if merged:
+            merged_files = tar_utils.merge_tar_gz(starting_files, submission_files)
+            bundle_files.append((WORK_BUNDLE_MERGED_FILES_FILENAME, merged_files))
+        else:
+            bundle_files.append((WORK_BUNDLE_SUBMISSION_FILES_FILENAME, submission_files))
+            bundle_files.append((WORK_BUNDLE_STARTING_FILES_FILENAME, starting_files))
+        return StreamingResponse(
+            content=tar_utils.iter_tar_of_files(bundle_files),
+            media_type="application/x-tar",
+            headers={"Content-Disposition": f"attachment; filename=submission_{submission_id}_bundle.tar"},
+        )
+
     def update_submission_status(
         self, submission_id: int, new_status_data: UpdateSubmissionStatusRequestDTO
     ) -> SubmissionWithMetadataOnlyResponseDTO:
@@ -228,53 +431,140 @@ class SubmissionsService:
         updated_submission = self.submissions_repo.update_submission_status(
             submission, new_status_data.status
         )
+        submission_status_notifier.publish(submission_id, new_status_data.status)
         return self.__build_submission_with_metadata_only_response(updated_submission)
 
     def save_tests_execution_log_for_submission(
         self, submission_id: int, new_execution_log_data: TestsExecutionLogDTO
     ):
         submission = self.__verify_and_get_submission(submission_id)
-        test_execution_log, submission = self.tests_repo.save_tests_execution_log_for_submission(
-            new_execution_log_data, submission
+        new_status = self.__get_submission_status_according_to_tests_exec_log(
+            submission, new_execution_log_data
         )
-        if (
-            new_execution_log_data.tests_execution_result_status
-            == aux_models.TestsExecutionResultStatus.ERROR
-        ):
-            submission = self.submissions_repo.update_submission_status(
-                submission,
-                aux_models.SubmissionStatus.from_tests_execution_errored_stage(
-                    new_execution_log_data.tests_execution_stage
-                ),
-            )
-            return
+        self.tests_repo.save_tests_execution_log_for_submission(
+            new_execution_log_data, submission, new_status
+        )
+        submission_status_notifier.publish(submission_id, new_status)
 
-        passed_all_tests = False
-        if submission.activity.is_io_tested:
-            passed_all_tests = self.tests_repo.save_io_test_runs_from_exec_log_and_check_if_all_passed(
-                submission.activity.io_tests, test_execution_log.id, new_execution_log_data
+    # ==============================================================================
+
+    def __build_submission_status_event(self, submission_id: int, submission_status: str) -> str:
+        event = SubmissionStatusEventDTO(submission_id=submission_id, status=submission_status)
+        return f"event: status\ndata: {event.model_dump_json()}\n\n"
+
+    async def __iter_submission_status_events(
+        self, subscription: SubmissionStatusSubscription, current_status: str
+    ) -> AsyncIterator[str]:
+        # Ends once the submission has finished (or after SUBMISSION_STATUS_STREAM_MAX_SECONDS: clients
+        # just reconnect). Keep-alive comments stop proxies from closing idle streams.
+        with subscription:
+            yield self.__build_submission_status_event(subscription.submission_id, current_status)
+            deadline = time.monotonic() + env.SUBMISSION_STATUS_STREAM_MAX_SECONDS
+            while not aux_models.SubmissionStatus(current_status).has_finished:
+                remaining_seconds = deadline - time.monotonic()
+                if remaining_seconds <= 0:
+                    break
+                new_status = await subscription.next_status(
+                    min(remaining_seconds, env.SUBMISSION_STATUS_STREAM_KEEPALIVE_SECONDS)
+                )
+                if new_status is None:
+                    yield SUBMISSION_STATUS_STREAM_KEEPALIVE
+                    continue
+                current_status = new_status
+                yield self.__build_submission_status_event(subscription.submission_id, current_status)
+
+    def stream_submission_status(
+        self, submission_id: int, current_course_user: CurrentCourseUser
+    ) -> StreamingResponse:
+        # Server-Sent Events: the current status right away, and then every update pushed by the runner
+        self.activities_service.verify_permission_to_submit(current_course_user)
+        # Subscribed before reading the current status, so no update can be missed in between
+        subscription = submission_status_notifier.subscribe(submission_id)
+        try:
+            submission = self.__verify_and_get_submission(submission_id)
+        except HTTPException:
+            subscription.close()
+            raise
+        return StreamingResponse(
+            content=self.__iter_submission_status_events(subscription, submission.status),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    def __verify_can_reprocess_submissions(self, current_user: CurrentMainUser):
+        if current_user.is_admin is False:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Only admins can reprocess all pending submissions.",
             )
-        elif submission.activity.unit_test_suite:
-            passed_all_tests = self.tests_repo.save_unit_test_runs_from_exec_log_and_check_if_all_passed(
-                test_execution_log.id, new_execution_log_data
+
+    def __start_submissions_reprocessing_job(
+        self, reprocessing_data: SubmissionsReprocessingRequestDTO
+    ) -> Optional[SubmissionsReprocessingJob]:
+        # None if there is already one running
+        self.reprocessing_jobs_repo.fail_interrupted_jobs(INTERRUPTED_JOB_TIMEOUT)
+        job = self.reprocessing_jobs_repo.create_running_job(reprocessing_data.model_dump_json())
+        if job:
+            submissions_reprocessor.start(
+                job.id, sessionmaker(autoflush=False, bind=self.db_session.get_bind())
             )
-        self.__set_submission_status_according_to_tests_exec_log(
-            submission, new_execution_log_data, passed_all_tests
+        return job
+
+    def __build_submissions_reprocessing_progress_response(
+        self, job: SubmissionsReprocessingJob
+    ) -> SubmissionsReprocessingProgressResponseDTO:
+        return SubmissionsReprocessingProgressResponseDTO(
+            job_id=job.id,
+            status=job.status,
+            total=job.total,
+            processed=job.processed,
+            batches=job.batches,
+            started_at=job.date_created,
+            finished_at=job.date_finished,
+            error=job.error,
         )
 
     def reprocess_all_pending_submissions(
         self, current_user: CurrentMainUser
     ) -> list[SubmissionWithMetadataOnlyResponseDTO]:
+        # Same contract as always (it never listed the submissions): the submissions are reprocessed by a
+        # background job with the default filters, unless there is already one running.
+        self.__verify_can_reprocess_submissions(current_user)
+        self.__start_submissions_reprocessing_job(SubmissionsReprocessingRequestDTO())
+        return []
+
+    def start_submissions_reprocessing(
+        self, current_user: CurrentMainUser, reprocessing_data: Optional[SubmissionsReprocessingRequestDTO]
+    ) -> SubmissionsReprocessingProgressResponseDTO:
+        self.__verify_can_reprocess_submissions(current_user)
+        job = self.__start_submissions_reprocessing_job(
+            reprocessing_data or SubmissionsReprocessingRequestDTO()
+        )
+        if not job:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="There is already a submissions reprocessing job running.",
+            )
+        return self.__build_submissions_reprocessing_progress_response(job)
+
+    def get_submissions_reprocessing_progress(
+        self, current_user: CurrentMainUser, job_id: int
+    ) -> SubmissionsReprocessingProgressResponseDTO:
         if current_user.is_admin is False:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
-                detail="Only admins can reprocess all pending submissions.",
+                detail="Only admins can view the submissions reprocessing progress.",
+            )
+        self.reprocessing_jobs_repo.fail_interrupted_jobs(INTERRUPTED_JOB_TIMEOUT)
+        job = self.reprocessing_jobs_repo.get_by_id(job_id)
+        if not job:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Reprocessing job not found.")
+        return self.__build_submissions_reprocessing_progress_response(job)
+
+    def get_submissions_queue_stats(self, current_user: CurrentMainUser) -> dict[str, int | float]:
+        if current_user.is_admin is False:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Only admins can view the submissions queue stats.",
             )
-        pending_submissions = self.submissions_repo.get_all_pending_and_stuck_submissions()
-        enqueued_submissions = []
-        for submission in pending_submissions:
-            self.__post_submission_to_queue(submission)
-        return [
-            self.__build_submission_with_metadata_only_response(submission)
-            for submission in enqueued_submissions
-        ]
+        return self.mq_sender.stats()
@@ -0,0 +1,123 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional
+from sqlalchemy.orm import Session
+
+from rpl_activities.src.deps.mq_sender import MQSender
+from rpl_activities.src.repositories.submissions import SubmissionsRepository
+
+
+class SubmissionsDispatcher:
+    """
+    Background worker that drains the submission dispatch outbox into the MQ, in batches.
+    Rows are only marked as dispatched once the broker confirmed them, so a crash or a broker outage
+    just delays the dispatch: nothing is lost and nothing has to be reprocessed by hand. While the broker
+    is unavailable, rounds are retried with an exponential backoff (an outage isn't counted as an attempt
+    of the submissions). Dispatched rows are deleted once older than the retention period.
+    """
+
+    def __init__(
+        self,
+        mq_sender: MQSender,
+        session_factory: Callable[[], Session],
+        batch_size: int = 100,
+        poll_interval_seconds: float = 0.5,
+        max_attempts: int = 5,
+        max_backoff_seconds: float = 30.0,
+        retention: timedelta = timedelta(days=7),
+        prune_interval_seconds: float = 3600.0,
+    ):
+        self.mq_sender = mq_sender
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.poll_interval_seconds = poll_interval_seconds
+        self.max_attempts = max_attempts
+        self.max_backoff_seconds = max_backoff_seconds
+        self.retention = retention
+        self.prune_interval_seconds = prune_interval_seconds
+        self._consecutive_failures = 0
+        self._next_prune_at = 0.0
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def dispatch_pending_batch(self) -> int:
+        with self.session_factory() as db_session:
+            submissions_repo = SubmissionsRepository(db_session)
+            dispatches = submissions_repo.get_pending_submission_dispatches(
+                self.batch_size, self.max_attempts
+            )
+            if not dispatches:
+                db_session.rollback()
+                return 0
+            try:
+                sent_submission_ids = set(
+                    self.mq_sender.send_submissions(
+                        [(dispatch.submission_id, dispatch.language) for dispatch in dispatches]
+                    )
+                )
+            except Exception:
+                # Broker unavailable: the rows are left untouched (and unlocked) for the next round
+                db_session.rollback()
+                raise
+            submissions_repo.mark_submission_dispatches_as_done(
+                dispatched=[
+                    dispatch for dispatch in dispatches if dispatch.submission_id in sent_submission_ids
+                ],
+                failed=[
+                    dispatch for dispatch in dispatches if dispatch.submission_id not in sent_submission_ids
+                ],
+            )
+            return len(dispatches)
+
+    def dispatch_round(self) -> float:
+        # One iteration of the worker loop: returns how long to wait before the next one
+        try:
+            processed = self.dispatch_pending_batch()
+        except Exception as e:
+            self._consecutive_failures += 1
+            if self._consecutive_failures == 1:
+                # Logged once per outage, not on every retry
+                logging.getLogger("uvicorn.error").error(
+                    f"Failed to dispatch pending submissions, retrying with backoff: {e}"
+                )
+            return min(
+                self.poll_interval_seconds * 2 ** min(self._consecutive_failures, 20),
+                self.max_backoff_seconds,
+            )
+        if self._consecutive_failures:
+            logging.getLogger("uvicorn.error").info(
+                f"Dispatching pending submissions again after {self._consecutive_failures} failed rounds"
+            )
+            self._consecutive_failures = 0
+        return 0.0 if processed >= self.batch_size else self.poll_interval_seconds
+
+    def prune_dispatched(self) -> int:
+        with self.session_factory() as db_session:
+            return SubmissionsRepository(db_session).delete_dispatched_submission_dispatches(
+                dispatched_before=datetime.now(timezone.utc) - self.retention, batch_size=self.batch_size
+            )
+
+    def __run(self):
+        while not self._stop_event.is_set():
+            wait_seconds = self.dispatch_round()
+            if time.monotonic() >= self._next_prune_at:
+                self._next_prune_at = time.monotonic() + self.prune_interval_seconds
+                try:
+                    self.prune_dispatched()
+                except Exception as e:
+                    logging.getLogger("uvicorn.error").error(f"Failed to prune dispatched submissions: {e}")
+            if wait_seconds:
+                self._stop_event.wait(wait_seconds)
+
+    def start(self):
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self.__run, name="submissions-dispatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout_seconds: float = 10.0):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=timeout_seconds)
+            self._thread = None
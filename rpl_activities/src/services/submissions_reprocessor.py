@@ -0,0 +1,84 @@
+import logging
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable
+from sqlalchemy.orm import Session
+
+from rpl_activities.src.config import env
+from rpl_activities.src.dtos.submission_dtos import SubmissionsReprocessingRequestDTO
+from rpl_activities.src.repositories.models import aux_models
+from rpl_activities.src.repositories.submissions import SubmissionsRepository
+from rpl_activities.src.repositories.submissions_reprocessing_jobs import (
+    SubmissionsReprocessingJobsRepository,
+)
+
+# Running jobs not updated for this long are considered interrupted (their worker stopped or crashed)
+INTERRUPTED_JOB_TIMEOUT = timedelta(minutes=15)
+
+
+def get_submissions_to_reprocess_filters(
+    reprocessing_data: SubmissionsReprocessingRequestDTO, started_at: datetime
+) -> dict:
+    min_age_minutes = reprocessing_data.min_age_minutes
+    return {
+        "statuses": reprocessing_data.statuses,
+        "course_id": reprocessing_data.course_id,
+        "activity_id": reprocessing_data.activity_id,
+        "last_updated_before": (started_at - timedelta(minutes=min_age_minutes)) if min_age_minutes else None,
+        "max_dispatch_attempts": env.SUBMISSION_DISPATCH_MAX_ATTEMPTS,
+    }
+
+
+class SubmissionsReprocessor:
+    """
+    Streams the submissions matching the reprocessing filters with keyset pagination and hands them,
+    one batch (one UPDATE + one INSERT) at a time, to the dispatch outbox. The SubmissionsDispatcher
+    then publishes them to the MQ with confirms.
+    Jobs run in a thread of the worker that started them, but their progress is kept in the database.
+    """
+
+    def run(self, job_id: int, session_factory: Callable[[], Session]):
+        with session_factory() as db_session:
+            jobs_repo = SubmissionsReprocessingJobsRepository(db_session)
+            submissions_repo = SubmissionsRepository(db_session)
+            job = jobs_repo.get_by_id(job_id)
+            reprocessing_data = SubmissionsReprocessingRequestDTO.model_validate_json(job.parameters)
+            max_per_second = reprocessing_data.max_per_second
+            batch_size = reprocessing_data.batch_size
+            if max_per_second:
+                batch_size = max(1, min(batch_size, math.ceil(max_per_second)))
+            try:
+                filters = get_submissions_to_reprocess_filters(reprocessing_data, job.date_created)
+                job.total = submissions_repo.count_submissions_to_reprocess(**filters)
+                db_session.commit()
+                started_at = time.monotonic()
+                last_submission_id = 0
+                while True:
+                    batch = submissions_repo.get_next_submissions_to_reprocess(
+                        last_submission_id, batch_size, **filters
+                    )
+                    if not batch:
+                        break
+                    jobs_repo.update_progress(job, processed=len(batch), batches=1)
+                    submissions_repo.create_dispatches_for_submissions(batch)
+                    last_submission_id = batch[-1][0]
+                    if max_per_second:
+                        time.sleep(max(0.0, job.processed / max_per_second - (time.monotonic() - started_at)))
+                jobs_repo.finish(job, aux_models.SubmissionsReprocessingJobStatus.FINISHED)
+            except Exception as e:
+                logging.getLogger("uvicorn.error").error(f"Submissions reprocessing job {job_id} failed: {e}")
+                db_session.rollback()
+                jobs_repo.finish(job, aux_models.SubmissionsReprocessingJobStatus.FAILED, str(e))
+
+    def start(self, job_id: int, session_factory: Callable[[], Session]):
+        threading.Thread(
+            target=self.run,
+            args=(job_id, session_factory),
+            name=f"submissions-reprocessing-{job_id}",
+            daemon=True,
+        ).start()
+
+
+submissions_reprocessor = SubmissionsReprocessor()
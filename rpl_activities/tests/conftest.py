@@ -4,6 +4,7 @@ import logging
 from fastapi import HTTPException, Request, status
 import pytest
 from fastapi.testclient import TestClient
+import sqlalchemy as sa
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.pool import StaticPool
@@ -17,13 +18,16 @@ from rpl_activities.src.deps.auth import (
     get_current_course_user,
     get_current_main_user,
     validate_request_from_runner,
+    users_auth_cache,
 )
 from rpl_activities.src.deps.database import get_db_session
+from rpl_activities.src.deps.extracted_files_cache import starting_files_cache
 from rpl_activities.src.deps.mq_sender import get_mq_sender
 from rpl_activities.src.dtos.auth_dtos import CurrentMainUserResponseDTO
 from rpl_activities.src.main import app
 from rpl_activities.src.repositories.models.activity import Activity
 from rpl_activities.src.repositories.models.activity_submission import ActivitySubmission
+from rpl_activities.src.repositories.models.activity_submissions_summary import ActivitySubmissionsSummary
 from rpl_activities.src.repositories.models.base_model import Base
 from rpl_activities.src.repositories.models import aux_models, models_metadata
 from rpl_activities.src.repositories.models.activity_category import ActivityCategory
@@ -31,6 +35,7 @@ from rpl_activities.src.repositories.models.activity_category import ActivityCat
 from rpl_activities.src.repositories.models.io_test import IOTest
 from rpl_activities.src.repositories.models.rpl_file import RPLFile
 from rpl_activities.src.repositories.models.unit_test_suite import UnitTestSuite
+from rpl_activities.src.repositories.submissions_summaries import SubmissionsSummariesRepository
 from rpl_users.src.dtos.course_dtos import CourseUserResponseDTO
 from rpl_users.tests.conftest import (
     users_api_dbsession_fixture,
@@ -71,6 +76,9 @@ def mq_sender_fixture():
         def send_submission(self, submission_id: int, language_with_version: str):
             return
 
+        def stats(self):
+            return {"published": 0}
+
     return TestMQSender()
 
 
@@ -134,6 +142,8 @@ def activities_api_http_client_fixture(
     client = TestClient(app)
     yield client
     app.dependency_overrides.clear()
+    users_auth_cache.clear()
+    starting_files_cache.clear()
 
 
 # ==========================================================================
@@ -427,6 +437,9 @@ def example_submission_fixture(
         last_updated=datetime.now(timezone.utc),
     )
     activities_api_dbsession.add(submission)
+    SubmissionsSummariesRepository(activities_api_dbsession).apply_status_change(
+        submission, previous_status=None
+    )
     activities_api_dbsession.commit()
     activities_api_dbsession.refresh(submission)
     yield submission
@@ -447,6 +460,9 @@ def example_failed_submission_fixture(
         last_updated=datetime.now(timezone.utc) - timedelta(days=1),
     )
     activities_api_dbsession.add(submission)
+    SubmissionsSummariesRepository(activities_api_dbsession).apply_status_change(
+        submission, previous_status=None
+    )
     activities_api_dbsession.commit()
     activities_api_dbsession.refresh(submission)
     yield submission
@@ -532,3 +548,49 @@ def example_unit_test_suite_fixture(
 
 
 # ==============================================================================
+
+
+class DBStatementsCounter:
+    def __init__(self):
+        self.statements: list[str] = []
+        self.commits = 0
+
+    def reset(self):
+        self.statements = []
+        self.commits = 0
+
+
+@pytest.fixture(name="db_statements_counter")
+def db_statements_counter_fixture(activities_api_dbsession: Session):
+    # Round trips to the activities DB (an executemany counts as one)
+    engine = activities_api_dbsession.get_bind()
+    counter = DBStatementsCounter()
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        counter.statements.append(statement)
+
+    def count_commit(conn):
+        counter.commits += 1
+
+    sa.event.listen(engine, "before_cursor_execute", count_statement)
+    sa.event.listen(engine, "commit", count_commit)
+    yield counter
+    sa.event.remove(engine, "before_cursor_execute", count_statement)
+    sa.event.remove(engine, "commit", count_commit)
+
+
+def get_submissions_summaries(db_session: Session) -> list[dict]:
+    # Every summary as a dict without its id, ordered by activity and user
+    db_session.expire_all()
+    summaries = db_session.execute(sa.select(ActivitySubmissionsSummary)).scalars().all()
+    return sorted(
+        (
+            {
+                column.name: getattr(summary, column.name)
+                for column in ActivitySubmissionsSummary.__table__.columns
+                if column.name != "id"
+            }
+            for summary in summaries
+        ),
+        key=lambda summary: (summary["activity_id"], summary["user_id"]),
+    )
@@ -0,0 +1,257 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from fastapi import HTTPException, Request
+from fastapi.security import HTTPAuthorizationCredentials
+from fastapi.testclient import TestClient
+from fastapi import status
+import httpx
+import jwt
+import pytest
+
+from rpl_activities.src.config import env
+from rpl_activities.src.deps.auth import CurrentCourseUser, get_current_course_user, users_auth_cache
+from rpl_activities.src.deps.auth_cache import AuthCache, hash_token
+from rpl_users.src.config import env as users_env
+
+
+def test_auth_cache_hits_misses_and_lru_eviction():
+    cache = AuthCache(max_entries=2, ttl_seconds=60)
+    cache.put((hash_token("token_1"), 1), "course_user_1", 1)
+    cache.put((hash_token("token_2"), 1), "course_user_2", 2)
+    assert cache.get((hash_token("token_1"), 1)) == "course_user_1"
+    cache.put((hash_token("token_3"), 1), "course_user_3", 3)
+
+    assert cache.get((hash_token("token_2"), 1)) is None  # least recently used one was evicted
+    assert cache.get((hash_token("token_3"), 1)) == "course_user_3"
+    stats = cache.stats()
+    assert stats["entries"] == 2
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+    assert stats["evictions"] == 1
+
+
+def test_auth_cache_entries_expire_after_ttl():
+    cache = AuthCache(max_entries=10, ttl_seconds=60)
+    cache.put((hash_token("token_1"), 1), "course_user_1", 1, ttl_seconds=0.000001)
+    assert cache.get((hash_token("token_1"), 1)) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_expire_course_user_auth_as_course_admin(
+    activities_api_client: TestClient,
+    course_with_teacher_as_admin_user_and_student_user,
+    admin_auth_headers: dict[str, str],
+):
+    course_id = course_with_teacher_as_admin_user_and_student_user["course"].id
+    student_user_id = course_with_teacher_as_admin_user_and_student_user["student_user"].user_id
+    users_auth_cache.put((hash_token("student_token"), course_id), "student", student_user_id)
+    users_auth_cache.put((hash_token("student_token"), course_id + 1), "student_elsewhere", student_user_id)
+    users_auth_cache.put((hash_token("other_token"), course_id), "other", student_user_id + 1)
+
+    response = activities_api_client.delete(
+        f"/api/v3/courses/{course_id}/authCache/users/{student_user_id}", headers=admin_auth_headers
+    )
+
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    assert users_auth_cache.get((hash_token("student_token"), course_id)) is None
+    assert users_auth_cache.get((hash_token("student_token"), course_id + 1)) == "student_elsewhere"
+    assert users_auth_cache.get((hash_token("other_token"), course_id)) == "other"
+
+
+def test_cannot_expire_another_course_user_auth_as_student(
+    activities_api_client: TestClient,
+    course_with_teacher_as_admin_user_and_student_user,
+    regular_auth_headers: dict[str, str],
+):
+    course_id = course_with_teacher_as_admin_user_and_student_user["course"].id
+    teacher_user_id = course_with_teacher_as_admin_user_and_student_user["teacher_user"].user_id
+    users_auth_cache.put((hash_token("teacher_token"), course_id), "teacher", teacher_user_id)
+
+    response = activities_api_client.delete(
+        f"/api/v3/courses/{course_id}/authCache/users/{teacher_user_id}", headers=regular_auth_headers
+    )
+
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+    assert users_auth_cache.get((hash_token("teacher_token"), course_id)) == "teacher"
+
+
+def test_get_auth_cache_stats_only_as_admin(
+    activities_api_client: TestClient,
+    admin_auth_headers: dict[str, str],
+    regular_auth_headers: dict[str, str],
+):
+    response = activities_api_client.get("/api/v3/authCache/stats", headers=admin_auth_headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert {"entries", "hits", "misses", "evictions", "invalidations"} <= response.json().keys()
+
+    response = activities_api_client.get("/api/v3/authCache/stats", headers=regular_auth_headers)
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+# ==============================================================================
+
+
+def _get_current_course_user_through_users_api(
+    users_api_client: TestClient, auth_headers: dict[str, str], course_id: int
+) -> CurrentCourseUser:
+    scheme, credentials = auth_headers["Authorization"].split(" ")
+    request_headers = [
+        (header.lower().encode(), value.encode())
+        for header, value in auth_headers.items()
+        if header != "Authorization"
+    ]
+
+    async def authenticate():
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=users_api_client.app), base_url="http://users_api"
+        ) as users_api_async_client:
+            request = Request(
+                {
+                    "type": "http",
+                    "method": "GET",
+                    "path": f"/api/v3/courses/{course_id}/activities",
+                    "headers": request_headers,
+                    "path_params": {"course_id": str(course_id)},
+                    "state": {"users_api_client": users_api_async_client},
+                }
+            )
+            return await get_current_course_user(
+                HTTPAuthorizationCredentials(scheme=scheme, credentials=credentials), request
+            )
+
+    return asyncio.run(authenticate())
+
+
+def test_course_user_auth_is_cached_per_token_and_course(
+    users_api_client: TestClient,
+    course_with_teacher_as_admin_user_and_student_user,
+    regular_auth_headers: dict[str, str],
+    monkeypatch: pytest.MonkeyPatch,
+):
+    monkeypatch.setattr(env, "JWT_ALGORITHM", None)
+    course_id = course_with_teacher_as_admin_user_and_student_user["course"].id
+    users_auth_cache.clear()
+
+    first = _get_current_course_user_through_users_api(users_api_client, regular_auth_headers, course_id)
+    second = _get_current_course_user_through_users_api(users_api_client, regular_auth_headers, course_id)
+
+    assert first is second
+    assert first.has_authority("activity_submit")
+    assert users_auth_cache.stats()["misses"] == 1
+    assert users_auth_cache.stats()["hits"] == 1
+    users_auth_cache.clear()
+
+
+def test_local_token_verification_shares_cached_auth_between_tokens_of_the_same_user(
+    users_api_client: TestClient,
+    course_with_teacher_as_admin_user_and_student_user,
+    example_users,
+    regular_auth_headers: dict[str, str],
+    monkeypatch: pytest.MonkeyPatch,
+):
+    monkeypatch.setattr(env, "JWT_ALGORITHM", users_env.JWT_ALGORITHM)
+    monkeypatch.setattr(env, "JWT_VERIFICATION_KEY", users_env.JWT_SECRET)
+    course_id = course_with_teacher_as_admin_user_and_student_user["course"].id
+    users_auth_cache.clear()
+    another_token_of_same_user = jwt.encode(
+        {"sub": str(example_users["regular"].id), "exp": datetime.now(timezone.utc) + timedelta(minutes=5)},
+        users_env.JWT_SECRET,
+        algorithm=users_env.JWT_ALGORITHM,
+    )
+
+    first = _get_current_course_user_through_users_api(users_api_client, regular_auth_headers, course_id)
+    second = _get_current_course_user_through_users_api(
+        users_api_client, {"Authorization": f"Bearer {another_token_of_same_user}"}, course_id
+    )
+
+    assert first is second
+    assert users_auth_cache.stats()["hits"] == 1
+    users_auth_cache.clear()
+
+
+def test_local_token_verification_rejects_invalid_tokens_without_calling_users_api(
+    monkeypatch: pytest.MonkeyPatch,
+):
+    monkeypatch.setattr(env, "JWT_ALGORITHM", "HS256")
+    monkeypatch.setattr(env, "JWT_VERIFICATION_KEY", "test_secret")
+    expired_token = jwt.encode(
+        {"sub": "1", "exp": datetime.now(timezone.utc) - timedelta(minutes=5)}, "test_secret", algorithm="HS256"
+    )
+    forged_token = jwt.encode(
+        {"sub": "1", "exp": datetime.now(timezone.utc) + timedelta(minutes=5)}, "forged", algorithm="HS256"
+    )
+    request = Request({"type": "http", "headers": [], "path_params": {"course_id": "1"}, "state": {}})
+
+    for token, expected_detail in [(expired_token, "Expired JWT token"), (forged_token, "Invalid JWT token")]:
+        with pytest.raises(HTTPException) as error:
+            asyncio.run(
+                get_current_course_user(HTTPAuthorizationCredentials(scheme="Bearer", credentials=token), request)
+            )
+        assert error.value.status_code == status.HTTP_401_UNAUTHORIZED
+        assert error.value.detail == expected_detail
+
+
+# ==============================================================================
+
+
+def _get_course_capability(users_api_client: TestClient, auth_headers: dict[str, str], course_id: int) -> str:
+    response = users_api_client.get(
+        "/api/v3/auth/courseCapability", params={"course_id": course_id}, headers=auth_headers
+    )
+    assert response.status_code == status.HTTP_200_OK
+    return response.json()["capability_token"]
+
+
+def test_course_capability_authenticates_without_calling_users_api(
+    users_api_client: TestClient,
+    course_with_teacher_as_admin_user_and_student_user,
+    example_users,
+    regular_auth_headers: dict[str, str],
+    monkeypatch: pytest.MonkeyPatch,
+):
+    monkeypatch.setattr(env, "JWT_ALGORITHM", users_env.JWT_ALGORITHM)
+    monkeypatch.setattr(env, "JWT_VERIFICATION_KEY", users_env.JWT_SECRET)
+    course_id = course_with_teacher_as_admin_user_and_student_user["course"].id
+    course_capability = _get_course_capability(users_api_client, regular_auth_headers, course_id)
+    users_auth_cache.clear()
+    # No users API client in the request state: any call to it would fail
+    request = Request(
+        {
+            "type": "http",
+            "headers": [(b"x-course-capability", course_capability.encode())],
+            "path_params": {"course_id": str(course_id)},
+            "state": {},
+        }
+    )
+    _, credentials = regular_auth_headers["Authorization"].split(" ")
+
+    current_course_user = asyncio.run(
+        get_current_course_user(HTTPAuthorizationCredentials(scheme="Bearer", credentials=credentials), request)
+    )
+
+    assert current_course_user.user_id == example_users["regular"].id
+    assert current_course_user.course_id == course_id
+    assert current_course_user.has_authority("activity_submit")
+    assert users_auth_cache.stats()["misses"] == 0
+
+
+def test_course_capability_of_another_user_or_course_falls_back_to_users_api(
+    users_api_client: TestClient,
+    course_with_teacher_as_admin_user_and_student_user,
+    admin_auth_headers: dict[str, str],
+    regular_auth_headers: dict[str, str],
+    monkeypatch: pytest.MonkeyPatch,
+):
+    monkeypatch.setattr(env, "JWT_ALGORITHM", users_env.JWT_ALGORITHM)
+    monkeypatch.setattr(env, "JWT_VERIFICATION_KEY", users_env.JWT_SECRET)
+    course_id = course_with_teacher_as_admin_user_and_student_user["course"].id
+    teacher_capability = _get_course_capability(users_api_client, admin_auth_headers, course_id)
+    users_auth_cache.clear()
+
+    current_course_user = _get_current_course_user_through_users_api(
+        users_api_client, {**regular_auth_headers, "X-Course-Capability": teacher_capability}, course_id
+    )
+
+    assert not current_course_user.has_authority("activity_manage")
+    assert users_auth_cache.stats()["misses"] == 1
+    users_auth_cache.clear()
@@ -0,0 +1,185 @@
+import threading
+from fastapi.testclient import TestClient
+from fastapi import status
+import pika.exceptions
+import pytest
+
+from rpl_activities.src.deps.mq_sender import SUBMISSIONS_QUEUE, MQSender
+
+
+class FakeChannel:
+    def __init__(self, connection: "FakeConnection"):
+        self.connection = connection
+
+    @property
+    def is_open(self):
+        return self.connection.is_open
+
+    def confirm_delivery(self):
+        self.connection.confirms_enabled = True
+
+    def queue_declare(self, queue, durable, arguments):
+        self.connection.declared_queues.append(queue)
+
+    def basic_publish(self, exchange, routing_key, body, properties):
+        if self.connection.on_publish:
+            self.connection.on_publish()
+        if body in self.connection.nacked_bodies:
+            raise pika.exceptions.NackError([])
+        if self.connection.drop_on_next_publish:
+            self.connection.is_open = False
+            raise pika.exceptions.StreamLostError("connection lost")
+        self.connection.published.append((routing_key, body))
+
+
+class FakeConnection:
+    def __init__(self):
+        self.is_open = True
+        self.drop_on_next_publish = False
+        self.confirms_enabled = False
+        self.nacked_bodies = set()
+        self.declared_queues = []
+        self.published = []
+        self.thread_ids = set()
+        self.on_publish = None
+
+    def channel(self):
+        return FakeChannel(self)
+
+    def process_data_events(self, time_limit):
+        self.thread_ids.add(threading.get_ident())
+
+    def close(self):
+        self.is_open = False
+
+
+def test_mq_sender_reuses_its_connection_between_publishes():
+    connections = []
+
+    def connection_factory():
+        connections.append(FakeConnection())
+        return connections[-1]
+
+    mq_sender = MQSender(pool_size=2, connection_factory=connection_factory)
+    for submission_id in range(5):
+        mq_sender.send_submission(submission_id, "python_3.10")
+
+    assert len(connections) == 1
+    assert connections[0].declared_queues == [SUBMISSIONS_QUEUE]
+    assert connections[0].confirms_enabled
+    assert [body for _, body in connections[0].published] == [f"{i} python_3.10" for i in range(5)]
+    assert mq_sender.stats()["published"] == 5
+    assert mq_sender.stats()["reconnects"] == 0
+
+
+def test_mq_sender_reconnects_when_the_connection_is_lost():
+    connections = []
+
+    def connection_factory():
+        connections.append(FakeConnection())
+        return connections[-1]
+
+    mq_sender = MQSender(pool_size=1, connection_factory=connection_factory)
+    mq_sender.send_submission(1, "python_3.10")
+    connections[0].drop_on_next_publish = True
+    mq_sender.send_submission(2, "python_3.10")
+
+    assert len(connections) == 2
+    assert connections[1].published == [(SUBMISSIONS_QUEUE, "2 python_3.10")]
+    assert mq_sender.stats()["reconnects"] == 1
+    assert mq_sender.stats()["failed"] == 0
+
+
+def test_mq_sender_skips_submissions_nacked_by_the_broker():
+    connection = FakeConnection()
+    connection.nacked_bodies = {"2 c_std11"}
+    mq_sender = MQSender(pool_size=1, connection_factory=lambda: connection)
+
+    sent_submission_ids = mq_sender.send_submissions([(1, "c_std11"), (2, "c_std11"), (3, "c_std11")])
+
+    assert sent_submission_ids == [1, 3]
+    assert mq_sender.stats()["failed"] == 1
+    with pytest.raises(pika.exceptions.AMQPError):
+        mq_sender.send_submission(2, "c_std11")
+
+
+def test_mq_sender_is_shared_by_concurrent_threads_without_sharing_connections():
+    connections = []
+    connections_lock = threading.Lock()
+
+    def connection_factory():
+        with connections_lock:
+            connections.append(FakeConnection())
+            return connections[-1]
+
+    mq_sender = MQSender(pool_size=3, connection_factory=connection_factory)
+    threads = [
+        threading.Thread(target=lambda: [mq_sender.send_submission(i, "go_1.19") for i in range(20)])
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(connections) <= 3
+    assert sum(len(connection.published) for connection in connections) == 160
+    assert mq_sender.stats()["published"] == 160
+
+
+def test_mq_sender_fails_when_the_broker_is_unreachable():
+    def connection_factory():
+        raise pika.exceptions.AMQPConnectionError("unreachable")
+
+    mq_sender = MQSender(pool_size=1, connection_factory=connection_factory)
+
+    with pytest.raises(pika.exceptions.AMQPConnectionError):
+        mq_sender.send_submission(1, "python_3.10")
+    assert mq_sender.stats()["failed"] == 1
+
+    mq_sender.close()
+    with pytest.raises(pika.exceptions.AMQPError):
+        mq_sender.send_submission(1, "python_3.10")
+
+
+def test_mq_sender_close_also_closes_the_connections_in_use():
+    connections = []
+    publishing = threading.Event()
+    closed = threading.Event()
+
+    def wait_until_closed():
+        publishing.set()
+        closed.wait(timeout=5)
+
+    def connection_factory():
+        connections.append(FakeConnection())
+        if len(connections) == 1:
+            connections[0].on_publish = wait_until_closed
+        return connections[-1]
+
+    mq_sender = MQSender(pool_size=2, connection_factory=connection_factory)
+    thread = threading.Thread(target=lambda: mq_sender.send_submission(1, "python_3.10"))
+    thread.start()
+    assert publishing.wait(timeout=5)
+    mq_sender.send_submission(2, "python_3.10")
+    in_use_connection, idle_connection = connections
+
+    mq_sender.close()
+    assert not idle_connection.is_open
+    closed.set()
+    thread.join()
+
+    assert in_use_connection.published == [(SUBMISSIONS_QUEUE, "1 python_3.10")]
+    assert not in_use_connection.is_open
+
+
+def test_get_submissions_queue_stats_only_as_admin(
+    activities_api_client: TestClient,
+    admin_auth_headers: dict[str, str],
+    regular_auth_headers: dict[str, str],
+):
+    response = activities_api_client.get("/api/v3/submissions/queue/stats", headers=admin_auth_headers)
+    assert response.status_code == status.HTTP_200_OK
+
+    response = activities_api_client.get("/api/v3/submissions/queue/stats", headers=regular_auth_headers)
+    assert response.status_code == status.HTTP_403_FORBIDDEN
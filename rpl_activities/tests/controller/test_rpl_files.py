@@ -1,11 +1,19 @@
+from datetime import datetime, timedelta
 import json
 from fastapi.testclient import TestClient
 from fastapi import status
+import sqlalchemy as sa
 from sqlalchemy.orm import Session
 import logging
+import pytest
 
+from rpl_activities.src.deps import blob_storage
+from rpl_activities.src.deps.blob_storage import FileSystemBlobStorage, S3BlobStorage
+from rpl_activities.src.repositories.models import aux_models
 from rpl_activities.src.repositories.models.activity import Activity
 from rpl_activities.src.repositories.models.rpl_file import RPLFile
+from rpl_activities.src.repositories.models.rpl_file_blob import RPLFileBlob
+from rpl_activities.src.repositories.rpl_files import RPLFilesRepository
 
 
 def test_get_raw_rplfile_success(activities_api_client: TestClient, example_basic_rplfiles: list[RPLFile]):
@@ -17,6 +25,35 @@ def test_get_raw_rplfile_success(activities_api_client: TestClient, example_basi
     assert response.headers["Content-Type"] == example_basic_rplfiles[0].file_type
 
 
+def test_get_raw_rplfile_is_revalidated_with_its_etag(
+    activities_api_client: TestClient,
+    activities_api_dbsession: Session,
+    example_basic_rplfiles: list[RPLFile],
+):
+    rplfile_url = f"/api/v3/RPLFile/{example_basic_rplfiles[0].id}"
+    response = activities_api_client.get(rplfile_url, headers={"Authorization": "Bearer test"})
+    assert response.status_code == status.HTTP_200_OK
+    etag = response.headers["ETag"]
+    assert response.headers["Cache-Control"] == "private, no-cache"
+
+    response = activities_api_client.get(
+        rplfile_url, headers={"Authorization": "Bearer test", "If-None-Match": f'"outdated", W/{etag}'}
+    )
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.content == b""
+    assert response.headers["ETag"] == etag
+
+    RPLFilesRepository(activities_api_dbsession).update_rplfile(
+        example_basic_rplfiles[0].id, "basic_rplfile.tar.gz", aux_models.RPLFileType.GZIP, b"updated"
+    )
+    response = activities_api_client.get(
+        rplfile_url, headers={"Authorization": "Bearer test", "If-None-Match": etag}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.content == b"updated"
+    assert response.headers["ETag"] != etag
+
+
 def test_get_nonexistent_raw_rplfile(activities_api_client: TestClient):
     response = activities_api_client.get("/api/v3/RPLFile/99999", headers={"Authorization": "Bearer test"})
     assert response.status_code == status.HTTP_404_NOT_FOUND
@@ -83,3 +120,137 @@ def test_get_multiple_extracted_rplfiles_for_student_returns_only_not_hidden_inn
     assert "main.c" not in content[0]  # This is hidden
     assert "assignment_main.py" in content[1]
     assert "main.c" not in content[1]  # This is hidden
+
+
+# ==============================================================================
+
+
+class InMemoryS3Client:
+    # Stand-in for an S3-compatible client, only with the operations used by S3BlobStorage
+    def __init__(self):
+        self.objects: dict[tuple[str, str], bytes] = {}
+
+    def put_object(self, Bucket: str, Key: str, Body: bytes):
+        self.objects[(Bucket, Key)] = Body
+
+    def get_object(self, Bucket: str, Key: str):
+        data = self.objects[(Bucket, Key)]
+
+        class Body:
+            def iter_chunks(self, chunk_size: int):
+                return (data[i:i + chunk_size] for i in range(0, len(data), chunk_size))
+
+        return {"Body": Body()}
+
+    def delete_object(self, Bucket: str, Key: str):
+        self.objects.pop((Bucket, Key), None)
+
+
+@pytest.fixture(name="filesystem_rplfiles_storage")
+def filesystem_rplfiles_storage_fixture(tmp_path, monkeypatch: pytest.MonkeyPatch):
+    storage = FileSystemBlobStorage(str(tmp_path))
+    monkeypatch.setattr(blob_storage, "rplfiles_storage", storage)
+    return storage
+
+
+def test_s3_blob_storage_roundtrip():
+    client = InMemoryS3Client()
+    storage = S3BlobStorage(client, "bucket", prefix="rplfiles/")
+
+    storage.put("abcd", b"x" * 10)
+    assert ("bucket", "rplfiles/abcd") in client.objects
+    assert list(storage.iter_chunks("abcd", chunk_size=4)) == [b"xxxx", b"xxxx", b"xx"]
+    storage.delete("abcd")
+    assert not client.objects
+
+
+def test_blob_storage_backends_missing_an_operation_cannot_be_created():
+    class IncompleteBlobStorage(blob_storage.BlobStorage):
+        name = "incomplete"
+
+        def put(self, key: str, data: bytes):
+            pass
+
+        def iter_chunks(self, key: str, chunk_size: int = blob_storage.CHUNK_SIZE):
+            return iter([])
+
+    with pytest.raises(TypeError):
+        IncompleteBlobStorage()
+
+
+def test_s3_blob_storage_is_created_with_a_boto3_client(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(blob_storage.env, "RPLFILES_S3_BUCKET", "rpl-files")
+    monkeypatch.setattr(blob_storage.env, "RPLFILES_S3_ENDPOINT_URL", "http://local-minio:9000")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+
+    storage = blob_storage.create_blob_storage(blob_storage.S3_STORAGE)
+
+    assert isinstance(storage, S3BlobStorage)
+    assert storage.bucket == "rpl-files"
+    assert storage.client.meta.endpoint_url == "http://local-minio:9000"
+
+
+def test_get_raw_rplfile_streams_payloads_from_external_storage(
+    activities_api_client: TestClient,
+    activities_api_dbsession: Session,
+    filesystem_rplfiles_storage: FileSystemBlobStorage,
+):
+    data = bytes(range(256)) * 4096
+    rplfile = RPLFilesRepository(activities_api_dbsession).create_rplfile(
+        "big.tar.gz", aux_models.RPLFileType.GZIP, data
+    )
+    assert rplfile.blob.is_external
+    assert activities_api_dbsession.execute(sa.select(RPLFileBlob.data)).scalar_one() is None
+
+    response = activities_api_client.get(
+        f"/api/v3/RPLFile/{rplfile.id}", headers={"Authorization": "Bearer test"}
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.content == data
+    assert response.headers["Content-Length"] == str(len(data))
+
+
+def test_move_payloads_to_current_storage_migrates_inline_and_database_rplfiles(
+    activities_api_dbsession: Session,
+    example_basic_rplfiles: list[RPLFile],
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path,
+):
+    rplfiles_repo = RPLFilesRepository(activities_api_dbsession)
+    original_data = {rplfile.id: rplfile.data for rplfile in example_basic_rplfiles}
+    database_rplfile = rplfiles_repo.create_rplfile("main.py", aux_models.RPLFileType.TEXT, b"print('hi')")
+    original_data[database_rplfile.id] = database_rplfile.data
+    monkeypatch.setattr(blob_storage, "rplfiles_storage", FileSystemBlobStorage(str(tmp_path)))
+
+    moved = rplfiles_repo.move_payloads_to_current_storage(batch_size=2)
+
+    # Inline rplfiles go straight to the external storage: only the pre-existing database blob is copied
+    assert moved == {"inline_rplfiles": 3, "database_blobs": 1}
+    assert rplfiles_repo.move_payloads_to_current_storage(batch_size=2) == {
+        "inline_rplfiles": 0,
+        "database_blobs": 0,
+    }
+    activities_api_dbsession.expire_all()
+    for rplfile_id, data in original_data.items():
+        rplfile = rplfiles_repo.get_by_id(rplfile_id)
+        assert rplfile.stored_data is None
+        assert rplfile.blob.is_external
+        assert rplfile.data == data
+
+
+def test_delete_unreferenced_blobs_removes_external_payloads_after_the_grace_period(
+    activities_api_dbsession: Session, filesystem_rplfiles_storage: FileSystemBlobStorage
+):
+    rplfiles_repo = RPLFilesRepository(activities_api_dbsession)
+    rplfile = rplfiles_repo.create_rplfile("main.py", aux_models.RPLFileType.TEXT, b"print('v1')")
+    first_blob_sha256 = rplfile.blob.sha256
+    rplfiles_repo.update_rplfile(rplfile.id, "main.py", aux_models.RPLFileType.TEXT, b"print('v2')")
+
+    assert rplfiles_repo.delete_unreferenced_blobs(datetime.now() - timedelta(hours=1)) == 0
+    assert filesystem_rplfiles_storage.get(first_blob_sha256) == b"print('v1')"
+
+    assert rplfiles_repo.delete_unreferenced_blobs(datetime.now() + timedelta(hours=1)) == 1
+    with pytest.raises(FileNotFoundError):
+        filesystem_rplfiles_storage.get(first_blob_sha256)
+    assert rplfiles_repo.get_by_id(rplfile.id).data == b"print('v2')"
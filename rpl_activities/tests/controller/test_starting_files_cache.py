@@ -0,0 +1,82 @@
+from datetime import datetime, timedelta, timezone
+from fastapi.testclient import TestClient
+from fastapi import status
+
+from rpl_activities.src.deps import tar_utils
+from rpl_activities.src.deps.extracted_files_cache import ExtractedFilesCache, starting_files_cache
+from rpl_activities.src.repositories.models.activity import Activity
+from rpl_activities.src.repositories.models.rpl_file import RPLFile
+from rpl_activities.src.repositories.models.unit_test_suite import UnitTestSuite
+from rpl_activities.tests.conftest import ExamplesOfStartingFilesRawData, ExamplesOfSubmissionRawData
+
+
+def _rplfile(rplfile_id: int, files: dict[str, bytes], last_updated: datetime) -> RPLFile:
+    return RPLFile(
+        id=rplfile_id,
+        file_name="starting_files.tar.gz",
+        file_type="application/gzip",
+        data=tar_utils.compress_files_dict_to_tar_gz(files),
+        last_updated=last_updated,
+    )
+
+
+def test_starting_files_cache_is_bounded_by_size_and_keyed_by_last_update():
+    cache = ExtractedFilesCache(max_bytes=2500)
+    now = datetime.now(timezone.utc)
+    first = _rplfile(1, {"main.c": b"a" * 1000, "files_metadata": b'{"main.c":{"display":"read"}}'}, now)
+    second = _rplfile(2, {"main.c": b"b" * 1000}, now)
+
+    assert cache.get_or_extract(first).metadata == {"main.c": {"display": "read"}}
+    assert cache.get_or_extract(first) is cache.get_or_extract(first)
+    cache.get_or_extract(second)
+    cache.get_or_extract(_rplfile(3, {"main.c": b"c" * 1000}, now))
+
+    stats = cache.stats()
+    assert stats["entries"] == 2  # the least recently used one was evicted
+    assert stats["size_bytes"] <= 2500
+    assert stats["evictions"] == 1
+
+    updated_second = _rplfile(2, {"main.c": b"updated"}, now + timedelta(seconds=1))
+    assert cache.get_or_extract(updated_second).files == {"main.c": "updated"}
+    assert cache.stats()["entries"] == 2  # the stale version was replaced
+
+
+def test_create_submissions_reuse_extracted_starting_files_until_activity_is_updated(
+    activities_api_client: TestClient,
+    example_unit_test_suite: UnitTestSuite,
+    example_activity: Activity,
+    example_submission_raw_data: ExamplesOfSubmissionRawData,
+    examples_of_starting_files_raw_data: ExamplesOfStartingFilesRawData,
+    admin_auth_headers: dict[str, str],
+):
+    submissions_url = (
+        f"/api/v3/courses/{example_activity.course_id}/activities/{example_activity.id}/submissions"
+    )
+    starting_files_cache.clear()
+
+    for _ in range(3):
+        response = activities_api_client.post(
+            submissions_url, files=example_submission_raw_data, headers=admin_auth_headers
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+    assert (starting_files_cache.stats()["misses"], starting_files_cache.stats()["hits"]) == (1, 2)
+
+    response = activities_api_client.patch(
+        f"/api/v3/courses/{example_activity.course_id}/activities/{example_activity.id}",
+        headers=admin_auth_headers,
+        data={"name": "updated"},
+        files=examples_of_starting_files_raw_data["python"],
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert starting_files_cache.stats()["entries"] == 0
+
+    response = activities_api_client.post(
+        submissions_url, files=example_submission_raw_data, headers=admin_auth_headers
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+    submission_files = activities_api_client.get(
+        f"/api/v3/courses/{example_activity.course_id}/extractedRPLFile/{response.json()['submission_rplfile_id']}",
+        headers=admin_auth_headers,
+    ).json()
+    assert "assignment_main.py" in submission_files
+    assert starting_files_cache.stats()["misses"] == 2
@@ -0,0 +1,364 @@
+from datetime import datetime
+from fastapi.testclient import TestClient
+from fastapi import status
+import pytest
+import sqlalchemy as sa
+from sqlalchemy.orm import Session
+
+from rpl_activities.src.deps import submissions_analytics_index
+from rpl_activities.src.deps.auth import StudentCourseUser, get_all_students_course_users_for_current_user
+from rpl_activities.src.dtos.auth_dtos import CourseUserResponseDTO
+from rpl_activities.src.main import app
+from rpl_activities.src.repositories.models import aux_models
+from rpl_activities.src.repositories.models.activity import Activity
+from rpl_activities.src.repositories.models.activity_submission import ActivitySubmission
+from rpl_activities.src.repositories.models.rpl_file import RPLFile
+from rpl_activities.tests.conftest import DBStatementsCounter
+
+
+def _student(user_id: int) -> StudentCourseUser:
+    return StudentCourseUser(
+        CourseUserResponseDTO(
+            id=user_id,
+            course_id=1,
+            course_user_id=100 + user_id,
+            name=f"Name {user_id}",
+            surname=f"Surname {user_id}",
+            student_id=str(user_id),
+            username=f"student_{user_id}",
+            email=f"student_{user_id}@example.com",
+            email_validated=True,
+            university="FIUBA",
+            degree="Ingeniería en Informática",
+            role="student",
+            permissions=[],
+            accepted=True,
+            date_created=datetime(2025, 1, 1),
+            last_updated=datetime(2025, 1, 1),
+        )
+    )
+
+
+def _add_submission(
+    db_session: Session, activity: Activity, rplfile: RPLFile, user_id: int, submission_status: str, day: int
+):
+    db_session.add(
+        ActivitySubmission(
+            is_final_solution=False,
+            activity_id=activity.id,
+            user_id=user_id,
+            solution_rplfile_id=rplfile.id,
+            status=submission_status,
+            date_created=datetime(2025, 3, day, 12),
+        )
+    )
+    db_session.commit()
+
+
+@pytest.fixture(name="example_course_submissions")
+def example_course_submissions_fixture(
+    activities_api_dbsession: Session,
+    example_activity: Activity,
+    example_activity_with_io_tests: Activity,
+    example_submission_rplfile: RPLFile,
+    example_users,
+):
+    student_user_id = example_users["regular"].id
+    another_student_user_id = student_user_id + 100
+    for activity, user_id, submission_status, day in [
+        (example_activity, student_user_id, aux_models.SubmissionStatus.FAILURE, 1),
+        (example_activity, student_user_id, aux_models.SubmissionStatus.SUCCESS, 2),
+        (example_activity, another_student_user_id, aux_models.SubmissionStatus.BUILD_ERROR, 1),
+        (example_activity_with_io_tests, student_user_id, aux_models.SubmissionStatus.RUNTIME_ERROR, 2),
+    ]:
+        _add_submission(
+            activities_api_dbsession, activity, example_submission_rplfile, user_id, submission_status, day
+        )
+    app.dependency_overrides[get_all_students_course_users_for_current_user] = lambda: [
+        _student(student_user_id),
+        _student(another_student_user_id),
+    ]
+    yield {"student_user_id": student_user_id, "another_student_user_id": another_student_user_id}
+
+
+def _counts(stats: dict) -> tuple:
+    return (
+        stats["total_submissions"],
+        stats["successful_submissions"],
+        stats["submissions_with_runtime_errors"],
+        stats["submissions_with_build_errors"],
+        stats["submissions_with_failures"],
+    )
+
+
+def _submitters(stats: dict) -> tuple:
+    return (
+        stats["total_submitters"],
+        stats["total_submitters_with_at_least_one_successful_submission"],
+        stats["total_submitters_without_successful_submissions"],
+        stats["avg_submissions_by_student"],
+        stats["avg_error_submissions_by_student"],
+        stats["avg_success_submissions_by_student"],
+    )
+
+
+def test_get_submissions_stats_grouped_by_activity(
+    activities_api_client: TestClient, example_course_submissions, admin_auth_headers: dict[str, str]
+):
+    response = activities_api_client.get(
+        "/api/v3/stats/courses/1/submissions", params={"group_by": "activity"}, headers=admin_auth_headers
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    result = response.json()
+    assert [metadata["id"] for metadata in result["metadata"]] == [1, 3]
+    assert [_counts(stats) for stats in result["submissions_stats"]] == [(3, 1, 0, 1, 1), (1, 0, 1, 0, 0)]
+    assert [_submitters(stats) for stats in result["submissions_stats"]] == [
+        (2, 1, 1, 1.5, 1.0, 0.5),
+        (1, 0, 1, 1.0, 1.0, 0.0),
+    ]
+
+
+def test_get_submissions_stats_grouped_by_date(
+    activities_api_client: TestClient, example_course_submissions, admin_auth_headers: dict[str, str]
+):
+    response = activities_api_client.get(
+        "/api/v3/stats/courses/1/submissions", params={"group_by": "date"}, headers=admin_auth_headers
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    result = response.json()
+    assert [metadata["date"] for metadata in result["metadata"]] == ["2025-03-01", "2025-03-02"]
+    assert [_counts(stats) for stats in result["submissions_stats"]] == [(2, 0, 0, 1, 1), (2, 1, 1, 0, 0)]
+    assert [_submitters(stats) for stats in result["submissions_stats"]] == [
+        (2, 0, 2, 1.0, 1.0, 0.0),
+        (1, 1, 0, 2.0, 1.0, 1.0),
+    ]
+
+
+def test_get_submissions_stats_grouped_by_user(
+    activities_api_client: TestClient, example_course_submissions, admin_auth_headers: dict[str, str]
+):
+    response = activities_api_client.get(
+        "/api/v3/stats/courses/1/submissions", params={"group_by": "user"}, headers=admin_auth_headers
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    result = response.json()
+    assert [metadata["id"] for metadata in result["metadata"]] == [
+        example_course_submissions["student_user_id"],
+        example_course_submissions["another_student_user_id"],
+    ]
+    # Each row only has the submissions of its user
+    assert [_counts(stats) for stats in result["submissions_stats"]] == [(3, 1, 1, 0, 1), (1, 0, 0, 1, 0)]
+    assert [_submitters(stats) for stats in result["submissions_stats"]] == [
+        (1, 1, 0, 3.0, 2.0, 1.0),
+        (1, 0, 1, 1.0, 1.0, 0.0),
+    ]
+
+
+def test_get_submissions_stats_of_a_single_date_and_activity(
+    activities_api_client: TestClient, example_course_submissions, admin_auth_headers: dict[str, str]
+):
+    response = activities_api_client.get(
+        "/api/v3/stats/courses/1/submissions",
+        params={"date": "2025-03-02", "activity_id": 1},
+        headers=admin_auth_headers,
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    result = response.json()
+    assert [metadata["id"] for metadata in result["metadata"]] == [1]
+    assert [_counts(stats) for stats in result["submissions_stats"]] == [(1, 1, 0, 0, 0)]
+    assert [_submitters(stats) for stats in result["submissions_stats"]] == [(1, 1, 0, 1.0, 0.0, 1.0)]
+
+
+def test_get_submissions_stats_for_current_user(
+    activities_api_client: TestClient, example_course_submissions, regular_auth_headers: dict[str, str]
+):
+    response = activities_api_client.get(
+        "/api/v3/stats/courses/1/submissions/me", headers=regular_auth_headers
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert _counts(response.json()) == (3, 1, 1, 0, 1)
+    assert _submitters(response.json()) == (None,) * 6
+
+
+# ==============================================================================
+
+SYNTHETIC_COURSE_STUDENTS = 2000
+
+
+def _synthetic_student_submissions(student_index: int) -> list[str]:
+    # 1 to 4 submissions: failures, then a success (even students) or a build error (odd ones)
+    return [aux_models.SubmissionStatus.FAILURE] * (student_index % 4) + [
+        (
+            aux_models.SubmissionStatus.SUCCESS
+            if student_index % 2 == 0
+            else aux_models.SubmissionStatus.BUILD_ERROR
+        )
+    ]
+
+
+@pytest.fixture(name="synthetic_course_students")
+def synthetic_course_students_fixture(
+    activities_api_dbsession: Session, example_activity: Activity, example_submission_rplfile: RPLFile
+) -> list[StudentCourseUser]:
+    students = [_student(1000 + student_index) for student_index in range(SYNTHETIC_COURSE_STUDENTS)]
+    activities_api_dbsession.execute(
+        sa.insert(ActivitySubmission),
+        [
+            {
+                "is_final_solution": False,
+                "activity_id": example_activity.id,
+                "user_id": student.user_id,
+                "solution_rplfile_id": example_submission_rplfile.id,
+                "status": submission_status,
+                "date_created": datetime(2025, 3, 1, 12),
+                "last_updated": datetime(2025, 3, 1, 12),
+            }
+            for student_index, student in enumerate(students)
+            for submission_status in _synthetic_student_submissions(student_index)
+        ],
+    )
+    activities_api_dbsession.commit()
+    yield students
+
+
+def _get_submissions_stats_grouped_by_user(
+    activities_api_client: TestClient, students: list[StudentCourseUser], headers: dict[str, str]
+) -> dict:
+    app.dependency_overrides[get_all_students_course_users_for_current_user] = lambda: students
+    response = activities_api_client.get(
+        "/api/v3/stats/courses/1/submissions", params={"group_by": "user"}, headers=headers
+    )
+    assert response.status_code == status.HTTP_200_OK
+    return response.json()
+
+
+def test_submissions_stats_grouped_by_user_run_the_same_queries_whatever_the_amount_of_students(
+    activities_api_client: TestClient,
+    synthetic_course_students: list[StudentCourseUser],
+    admin_auth_headers: dict[str, str],
+    db_statements_counter: DBStatementsCounter,
+):
+    quarter_of_the_students = synthetic_course_students[: SYNTHETIC_COURSE_STUDENTS // 4]
+    db_statements_counter.reset()
+    _get_submissions_stats_grouped_by_user(activities_api_client, quarter_of_the_students, admin_auth_headers)
+    quarter_statements = len(db_statements_counter.statements)
+    db_statements_counter.reset()
+    result = _get_submissions_stats_grouped_by_user(
+        activities_api_client, synthetic_course_students, admin_auth_headers
+    )
+
+    assert len(db_statements_counter.statements) == quarter_statements
+    assert len(result["submissions_stats"]) == SYNTHETIC_COURSE_STUDENTS
+    for student_index in [0, 1, 2, 3, SYNTHETIC_COURSE_STUDENTS - 1]:
+        statuses = _synthetic_student_submissions(student_index)
+        assert result["metadata"][student_index]["id"] == synthetic_course_students[student_index].user_id
+        assert _counts(result["submissions_stats"][student_index]) == (
+            len(statuses),
+            statuses.count(aux_models.SubmissionStatus.SUCCESS),
+            0,
+            statuses.count(aux_models.SubmissionStatus.BUILD_ERROR),
+            statuses.count(aux_models.SubmissionStatus.FAILURE),
+        )
+        assert result["submissions_stats"][student_index]["total_submitters"] == 1
+
+
+# ==============================================================================
+
+
+def _get_grouped_submissions_stats(activities_api_client: TestClient, headers: dict[str, str]) -> list[dict]:
+    responses = [
+        activities_api_client.get("/api/v3/stats/courses/1/submissions", params=params, headers=headers)
+        for params in [
+            {"group_by": "activity"},
+            {"group_by": "date"},
+            {"group_by": "user"},
+            {"group_by": "user", "date": "2025-03-01"},
+            {"activity_id": 3},
+        ]
+    ]
+    assert all(response.status_code == status.HTTP_200_OK for response in responses)
+    return [response.json() for response in responses]
+
+
+def test_submissions_analytics_index_is_disabled_by_default_and_requires_numpy(
+    monkeypatch: pytest.MonkeyPatch,
+):
+    assert submissions_analytics_index.course_submissions_index is None
+    assert submissions_analytics_index.create_submissions_analytics_index(0) is None
+    monkeypatch.setattr(submissions_analytics_index, "np", None)
+    with pytest.raises(ValueError):
+        submissions_analytics_index.create_submissions_analytics_index(1024 * 1024)
+
+
+def test_submissions_stats_from_the_analytics_index_match_the_database_ones(
+    activities_api_client: TestClient,
+    example_course_submissions,
+    admin_auth_headers: dict[str, str],
+    monkeypatch: pytest.MonkeyPatch,
+):
+    database_stats = _get_grouped_submissions_stats(activities_api_client, admin_auth_headers)
+    index = submissions_analytics_index.SubmissionsAnalyticsIndex(max_bytes=1024 * 1024)
+    monkeypatch.setattr(submissions_analytics_index, "course_submissions_index", index)
+
+    assert _get_grouped_submissions_stats(activities_api_client, admin_auth_headers) == database_stats
+    assert index.stats()["courses"] == 1
+    assert index.stats()["misses"] == 1
+
+
+def test_submissions_analytics_index_syncs_new_submissions_and_status_changes(
+    activities_api_client: TestClient,
+    activities_api_dbsession: Session,
+    example_course_submissions,
+    example_activity: Activity,
+    example_submission_rplfile: RPLFile,
+    admin_auth_headers: dict[str, str],
+    monkeypatch: pytest.MonkeyPatch,
+):
+    index = submissions_analytics_index.SubmissionsAnalyticsIndex(max_bytes=1024 * 1024)
+    monkeypatch.setattr(submissions_analytics_index, "course_submissions_index", index)
+    _get_grouped_submissions_stats(activities_api_client, admin_auth_headers)
+
+    _add_submission(
+        activities_api_dbsession,
+        example_activity,
+        example_submission_rplfile,
+        example_course_submissions["another_student_user_id"],
+        aux_models.SubmissionStatus.PROCESSING,
+        2,
+    )
+    new_submission_id = activities_api_dbsession.execute(
+        sa.select(sa.func.max(ActivitySubmission.id))
+    ).scalar()
+    response = activities_api_client.put(
+        f"/api/v3/submissions/{new_submission_id}/status",
+        json={"status": aux_models.SubmissionStatus.SUCCESS},
+        headers={"Authorization": "Bearer test"},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    index_stats = _get_grouped_submissions_stats(activities_api_client, admin_auth_headers)
+    monkeypatch.setattr(submissions_analytics_index, "course_submissions_index", None)
+
+    assert index_stats == _get_grouped_submissions_stats(activities_api_client, admin_auth_headers)
+    assert _counts(index_stats[0]["submissions_stats"][0]) == (4, 2, 0, 1, 1)
+    assert index.stats()["misses"] == 1
+
+
+def test_submissions_analytics_index_evicts_courses_over_its_memory_budget(
+    activities_api_client: TestClient,
+    example_course_submissions,
+    admin_auth_headers: dict[str, str],
+    monkeypatch: pytest.MonkeyPatch,
+):
+    database_stats = _get_grouped_submissions_stats(activities_api_client, admin_auth_headers)
+    index = submissions_analytics_index.SubmissionsAnalyticsIndex(max_bytes=16)
+    monkeypatch.setattr(submissions_analytics_index, "course_submissions_index", index)
+
+    assert _get_grouped_submissions_stats(activities_api_client, admin_auth_headers) == database_stats
+    assert index.stats()["courses"] == 0
+    assert index.stats()["size_bytes"] == 0
+    assert index.stats()["evictions"] == index.stats()["misses"] == 5
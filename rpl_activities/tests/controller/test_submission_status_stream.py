@@ -0,0 +1,301 @@
+import asyncio
+import json
+import threading
+import time
+from fastapi.testclient import TestClient
+from fastapi import status
+import pika.exceptions
+import pytest
+import sqlalchemy as sa
+from sqlalchemy.orm import Session
+
+from rpl_activities.src.config import env
+from rpl_activities.src.deps.submission_status_notifier import (
+    RabbitMQStatusRelay,
+    SubmissionStatusNotifier,
+    SubmissionStatusSubscription,
+    submission_status_notifier,
+)
+from rpl_activities.src.repositories.models import aux_models
+from rpl_activities.src.repositories.models.activity_submission import ActivitySubmission
+
+
+def _read_status_events(response_text: str) -> list[str]:
+    return [
+        json.loads(line.removeprefix("data: "))["status"]
+        for line in response_text.splitlines()
+        if line.startswith("data: ")
+    ]
+
+
+def test_notifier_delivers_updates_published_from_other_threads():
+    notifier = SubmissionStatusNotifier()
+
+    async def wait_for_update() -> list:
+        with notifier.subscribe(1) as subscription:
+            assert await subscription.next_status(timeout_seconds=0.01) is None
+            threading.Timer(0.05, notifier.publish, args=(1, "SUCCESS")).start()
+            notifier.publish(2, "FAILURE")  # another submission
+            return [await subscription.next_status(timeout_seconds=5)]
+
+    assert asyncio.run(wait_for_update()) == ["SUCCESS"]
+    assert notifier.stats()["subscriptions"] == 0
+    assert notifier.stats()["delivered"] == 1
+
+
+def test_notifier_keeps_waiting_after_the_wakeup_of_an_already_returned_update():
+    notifier = SubmissionStatusNotifier()
+
+    async def wait_for_updates() -> list:
+        with notifier.subscribe(1) as subscription:
+            assert await subscription.next_status(timeout_seconds=0.01) is None
+            # Delivered while the loop is busy: the update is returned right away but its wakeup
+            # only runs once the next wait starts
+            publisher = threading.Thread(target=notifier.publish, args=(1, "RUNNING"))
+            publisher.start()
+            publisher.join()
+            updates = [await subscription.next_status(timeout_seconds=5)]
+            threading.Timer(0.1, notifier.publish, args=(1, "SUCCESS")).start()
+            updates.append(await subscription.next_status(timeout_seconds=5))
+            return updates
+
+    assert asyncio.run(wait_for_updates()) == ["RUNNING", "SUCCESS"]
+
+
+def test_notifier_delivers_locally_when_the_relay_is_down():
+    def unreachable_broker():
+        raise pika.exceptions.AMQPConnectionError("unreachable")
+
+    notifier = SubmissionStatusNotifier()
+    notifier.relay = RabbitMQStatusRelay(notifier, connection_factory=unreachable_broker)
+
+    async def wait_for_update() -> str:
+        with notifier.subscribe(1) as subscription:
+            notifier.publish(1, "SUCCESS")
+            return await subscription.next_status(timeout_seconds=5)
+
+    assert asyncio.run(wait_for_update()) == "SUCCESS"
+
+
+def test_stream_submission_status_pushes_updates_until_it_finishes(
+    activities_api_client: TestClient,
+    example_submission: ActivitySubmission,
+    regular_auth_headers: dict[str, str],
+    monkeypatch: pytest.MonkeyPatch,
+):
+    monkeypatch.setattr(env, "SUBMISSION_STATUS_STREAM_KEEPALIVE_SECONDS", 0.05)
+    course_id = example_submission.activity.course_id
+
+    def runner_updates():
+        for new_status in [aux_models.SubmissionStatus.PROCESSING, aux_models.SubmissionStatus.SUCCESS]:
+            response = activities_api_client.put(
+                f"/api/v3/submissions/{example_submission.id}/status",
+                json={"status": new_status},
+                headers={"Authorization": "Bearer test"},
+            )
+            assert response.status_code == status.HTTP_200_OK
+
+    runner = threading.Timer(0.2, runner_updates)
+    runner.start()
+    response = activities_api_client.get(
+        f"/api/v3/courses/{course_id}/submissions/{example_submission.id}/statusStream",
+        headers=regular_auth_headers,
+    )
+    runner.join()  # the stream may end before the last update request does
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert _read_status_events(response.text) == ["PENDING", "PROCESSING", "SUCCESS"]
+    assert ": keep-alive" in response.text
+    assert submission_status_notifier.stats()["subscriptions"] == 0
+
+
+def test_stream_finished_submission_status_ends_right_away(
+    activities_api_client: TestClient,
+    example_submission: ActivitySubmission,
+    regular_auth_headers: dict[str, str],
+):
+    response = activities_api_client.put(
+        f"/api/v3/submissions/{example_submission.id}/status",
+        json={"status": aux_models.SubmissionStatus.FAILURE},
+        headers={"Authorization": "Bearer test"},
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+    response = activities_api_client.get(
+        f"/api/v3/courses/{example_submission.activity.course_id}/submissions/{example_submission.id}/statusStream",
+        headers=regular_auth_headers,
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert _read_status_events(response.text) == ["FAILURE"]
+
+
+def test_stream_non_existent_submission_status_not_found(
+    activities_api_client: TestClient,
+    example_submission: ActivitySubmission,
+    regular_auth_headers: dict[str, str],
+):
+    response = activities_api_client.get(
+        f"/api/v3/courses/{example_submission.activity.course_id}/submissions/9999/statusStream",
+        headers=regular_auth_headers,
+    )
+
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    assert submission_status_notifier.stats()["subscriptions"] == 0
+
+
+# ==============================================================================
+
+
+def test_wait_for_submission_result_returns_as_soon_as_it_finishes(
+    activities_api_client: TestClient,
+    example_submission: ActivitySubmission,
+    regular_auth_headers: dict[str, str],
+):
+    course_id = example_submission.activity.course_id
+
+    def save_exec_log():
+        response = activities_api_client.post(
+            f"/api/v3/submissions/{example_submission.id}/execLog",
+            json={
+                "tests_execution_result_status": "ERROR",
+                "tests_execution_stage": "BUILD",
+                "tests_execution_exit_message": "Exit code 2",
+                "tests_execution_stderr": "build failed",
+                "tests_execution_stdout": "",
+            },
+            headers={"Authorization": "Bearer test"},
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+
+    runner = threading.Timer(0.2, save_exec_log)
+    runner.start()
+    started_at = time.monotonic()
+    response = activities_api_client.get(
+        f"/api/v3/courses/{course_id}/submissions/{example_submission.id}/result",
+        params={"wait": 30},
+        headers=regular_auth_headers,
+    )
+    runner.join()
+
+    assert time.monotonic() - started_at < 10
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["submission_status"] == aux_models.SubmissionStatus.BUILD_ERROR
+    assert response.json()["stderr"] == "build failed"
+    assert submission_status_notifier.stats()["subscriptions"] == 0
+
+
+def test_wait_for_submission_result_keeps_waiting_after_an_early_wakeup(
+    activities_api_client: TestClient,
+    example_submission: ActivitySubmission,
+    regular_auth_headers: dict[str, str],
+    monkeypatch: pytest.MonkeyPatch,
+):
+    course_id = example_submission.activity.course_id
+    next_status = SubmissionStatusSubscription.next_status
+    woken_up_early = []
+
+    async def next_status_woken_up_early_once(subscription, timeout_seconds):
+        if not woken_up_early:
+            woken_up_early.append(True)
+            return None
+        return await next_status(subscription, timeout_seconds)
+
+    monkeypatch.setattr(SubmissionStatusSubscription, "next_status", next_status_woken_up_early_once)
+
+    def save_exec_log():
+        response = activities_api_client.post(
+            f"/api/v3/submissions/{example_submission.id}/execLog",
+            json={
+                "tests_execution_result_status": "ERROR",
+                "tests_execution_stage": "BUILD",
+                "tests_execution_exit_message": "Exit code 2",
+                "tests_execution_stderr": "build failed",
+                "tests_execution_stdout": "",
+            },
+            headers={"Authorization": "Bearer test"},
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+
+    runner = threading.Timer(0.2, save_exec_log)
+    runner.start()
+    response = activities_api_client.get(
+        f"/api/v3/courses/{course_id}/submissions/{example_submission.id}/result",
+        params={"wait": 30},
+        headers=regular_auth_headers,
+    )
+    runner.join()
+
+    assert woken_up_early == [True]
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["submission_status"] == aux_models.SubmissionStatus.BUILD_ERROR
+
+
+def test_waiting_for_submission_result_does_not_hold_a_db_connection(
+    activities_api_client: TestClient,
+    activities_api_dbsession: Session,
+    example_submission: ActivitySubmission,
+    regular_auth_headers: dict[str, str],
+):
+    url = (
+        f"/api/v3/courses/{example_submission.activity.course_id}/submissions/{example_submission.id}/result"
+    )
+    submission_id = example_submission.id
+    activities_api_dbsession.rollback()
+    # The tests engine has a StaticPool (without checkedout()): its checkouts are counted instead
+    pool = activities_api_dbsession.get_bind().pool
+    checked_out = {"connections": 0}
+
+    def count_checkout(dbapi_connection, connection_record, connection_proxy):
+        checked_out["connections"] += 1
+
+    def count_checkin(dbapi_connection, connection_record):
+        checked_out["connections"] -= 1
+
+    checked_out_while_waiting = []
+
+    def save_exec_log():
+        checked_out_while_waiting.append(checked_out["connections"])
+        response = activities_api_client.post(
+            f"/api/v3/submissions/{submission_id}/execLog",
+            json={
+                "tests_execution_result_status": "ERROR",
+                "tests_execution_stage": "BUILD",
+                "tests_execution_exit_message": "Exit code 2",
+                "tests_execution_stderr": "build failed",
+                "tests_execution_stdout": "",
+            },
+            headers={"Authorization": "Bearer test"},
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+
+    sa.event.listen(pool, "checkout", count_checkout)
+    sa.event.listen(pool, "checkin", count_checkin)
+    try:
+        runner = threading.Timer(0.2, save_exec_log)
+        runner.start()
+        response = activities_api_client.get(url, params={"wait": 30}, headers=regular_auth_headers)
+        runner.join()
+    finally:
+        sa.event.remove(pool, "checkout", count_checkout)
+        sa.event.remove(pool, "checkin", count_checkin)
+
+    assert checked_out_while_waiting == [0]
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["submission_status"] == aux_models.SubmissionStatus.BUILD_ERROR
+
+
+def test_wait_for_unfinished_submission_result_times_out(
+    activities_api_client: TestClient,
+    example_submission: ActivitySubmission,
+    regular_auth_headers: dict[str, str],
+):
+    response = activities_api_client.get(
+        f"/api/v3/courses/{example_submission.activity.course_id}/submissions/{example_submission.id}/result",
+        params={"wait": 0.1},
+        headers=regular_auth_headers,
+    )
+
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    assert response.json()["detail"] == "submission_status: PENDING"
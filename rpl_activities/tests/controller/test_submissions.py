@@ -1,8 +1,16 @@
 from datetime import datetime
+import io
+import json
+import tarfile
 from fastapi.testclient import TestClient
 from fastapi import status
+import sqlalchemy as sa
 from sqlalchemy.orm import Session
 import logging
+import pytest
+
+from rpl_activities.src.config import env
+from rpl_activities.src.deps import tar_utils
 
 from rpl_activities.src.repositories.models import aux_models
 from rpl_activities.src.repositories.models.activity import Activity
@@ -10,10 +18,19 @@ from rpl_activities.src.repositories.models.activity_submission import ActivityS
 from rpl_activities.src.repositories.models.activity_category import ActivityCategory
 
 from rpl_activities.src.repositories.models.io_test import IOTest
+from rpl_activities.src.repositories.models.io_test_snapshot import IOTestSnapshot
 from rpl_activities.src.repositories.models.rpl_file import RPLFile
+from rpl_activities.src.repositories.models.rpl_file_blob import RPLFileBlob
 from rpl_activities.src.repositories.models.unit_test_suite import UnitTestSuite
+from rpl_activities.src.repositories import activity_tests
+from rpl_activities.src.repositories.rpl_files import RPLFilesRepository
+from rpl_activities.src.repositories.submissions_summaries import SubmissionsSummariesRepository
 from rpl_activities.src.services.rpl_files import ExtractedFilesDict
-from rpl_activities.tests.conftest import ExamplesOfStartingFilesRawData, ExamplesOfSubmissionRawData
+from rpl_activities.tests.conftest import (
+    DBStatementsCounter,
+    ExamplesOfStartingFilesRawData,
+    ExamplesOfSubmissionRawData,
+)
 
 
 def test_get_submission(
@@ -62,6 +79,125 @@ def test_get_non_existent_submission_not_found(
     assert response.status_code == status.HTTP_404_NOT_FOUND
 
 
+def test_get_submissions_batch_returns_the_existing_ones(
+    activities_api_client: TestClient,
+    example_unit_test_suite: UnitTestSuite,
+    example_activity: Activity,
+    example_submission_raw_data: ExamplesOfSubmissionRawData,
+    admin_auth_headers: dict[str, str],
+):
+    submission_ids = []
+    for _ in range(2):
+        response = activities_api_client.post(
+            f"/api/v3/courses/{example_activity.course_id}/activities/{example_activity.id}/submissions",
+            files=example_submission_raw_data,
+            headers=admin_auth_headers,
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+        submission_ids.append(response.json()["id"])
+
+    response = activities_api_client.get(
+        f"/api/v3/submissions/batch/{submission_ids[1]},99999,{submission_ids[0]}", headers=admin_auth_headers
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    expected = [
+        activities_api_client.get(f"/api/v3/submissions/{submission_id}", headers=admin_auth_headers).json()
+        for submission_id in submission_ids
+    ]
+    assert response.json() == expected
+
+    response = activities_api_client.get("/api/v3/submissions/batch/1,a", headers=admin_auth_headers)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_update_submissions_statuses_batch(
+    activities_api_client: TestClient,
+    activities_api_dbsession: Session,
+    example_unit_test_suite: UnitTestSuite,
+    example_submission: ActivitySubmission,
+    admin_auth_headers: dict[str, str],
+):
+    response = activities_api_client.put(
+        "/api/v3/submissions/batch/status",
+        json={
+            "updates": [
+                {"submission_id": example_submission.id, "status": "PROCESSING"},
+                {"submission_id": 99999, "status": "PROCESSING"},
+            ]
+        },
+        headers=admin_auth_headers,
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {
+        "updated_submission_ids": [example_submission.id],
+        "not_found_submission_ids": [99999],
+    }
+    activities_api_dbsession.refresh(example_submission)
+    assert example_submission.status == aux_models.SubmissionStatus.PROCESSING
+
+    response = activities_api_client.put(
+        "/api/v3/submissions/batch/status", json={"updates": []}, headers=admin_auth_headers
+    )
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def _read_work_bundle(content: bytes) -> dict[str, bytes]:
+    with tarfile.open(fileobj=io.BytesIO(content), mode="r") as tar:
+        return {member.name: tar.extractfile(member).read() for member in tar.getmembers()}
+
+
+def test_get_submission_work_bundle_contains_metadata_and_files(
+    activities_api_client: TestClient,
+    activities_api_dbsession: Session,
+    example_unit_test_suite: UnitTestSuite,
+    example_submission: ActivitySubmission,
+    admin_auth_headers: dict[str, str],
+):
+    response = activities_api_client.get(
+        f"/api/v3/submissions/{example_submission.id}/workBundle",
+        params={"new_status": aux_models.SubmissionStatus.PROCESSING.value},
+        headers=admin_auth_headers,
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["Content-Type"] == "application/x-tar"
+    bundle = _read_work_bundle(response.content)
+    assert bundle.keys() == {"submission.json", "submission.tar.gz", "activity_starting_files.tar.gz"}
+    submission_response = activities_api_client.get(
+        f"/api/v3/submissions/{example_submission.id}", headers=admin_auth_headers
+    )
+    assert json.loads(bundle["submission.json"]) == submission_response.json()
+    assert bundle["submission.tar.gz"] == example_submission.solution_rplfile.data
+    assert bundle["activity_starting_files.tar.gz"] == example_submission.activity.starting_rplfile.data
+    activities_api_dbsession.refresh(example_submission)
+    assert example_submission.status == aux_models.SubmissionStatus.PROCESSING
+
+
+def test_get_merged_submission_work_bundle(
+    activities_api_client: TestClient,
+    example_unit_test_suite: UnitTestSuite,
+    example_submission: ActivitySubmission,
+    admin_auth_headers: dict[str, str],
+):
+    response = activities_api_client.get(
+        f"/api/v3/submissions/{example_submission.id}/workBundle",
+        params={"merged": True},
+        headers=admin_auth_headers,
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    bundle = _read_work_bundle(response.content)
+    assert bundle.keys() == {"submission.json", "files.tar.gz"}
+    merged_files = tar_utils.extract_tar_gz_to_dict_of_files(bundle["files.tar.gz"])
+    starting_files = tar_utils.extract_tar_gz_to_dict_of_files(
+        example_submission.activity.starting_rplfile.data
+    )
+    submission_files = tar_utils.extract_tar_gz_to_dict_of_files(example_submission.solution_rplfile.data)
+    assert merged_files == {**starting_files, **submission_files}
+
+
 # ==============================================================================
 
 
@@ -107,3 +243,657 @@ def test_create_submission(
     assert "INTEGRATION_TEST_FAILED" not in subm_rplfile_data["tiempo.h"]
     assert subm_rplfile_data["tiempo.h"] == act_rplfile_data["tiempo.h"]
     assert subm_rplfile_data["main.c"] == act_rplfile_data["main.c"]
+
+
+# ==============================================================================
+
+
+def _create_submission_rplfile(
+    activities_api_client: TestClient,
+    activities_api_dbsession: Session,
+    activity: Activity,
+    submission_raw_data: ExamplesOfSubmissionRawData,
+    auth_headers: dict[str, str],
+) -> RPLFile:
+    response = activities_api_client.post(
+        f"/api/v3/courses/{activity.course_id}/activities/{activity.id}/submissions",
+        files=submission_raw_data,
+        headers=auth_headers,
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+    return activities_api_dbsession.get(RPLFile, response.json()["submission_rplfile_id"])
+
+
+def test_create_submission_stores_only_student_writable_files_over_the_starting_files(
+    activities_api_client: TestClient,
+    activities_api_dbsession: Session,
+    example_unit_test_suite: UnitTestSuite,
+    example_activity: Activity,
+    example_submission_raw_data: ExamplesOfSubmissionRawData,
+    admin_auth_headers: dict[str, str],
+):
+    submission_rplfile = _create_submission_rplfile(
+        activities_api_client,
+        activities_api_dbsession,
+        example_activity,
+        example_submission_raw_data,
+        admin_auth_headers,
+    )
+
+    assert submission_rplfile.base_rplfile_id == example_activity.starting_rplfile_id
+    assert tar_utils.extract_tar_gz_to_dict_of_files(submission_rplfile.data).keys() == {"tiempo.c"}
+
+    response = activities_api_client.get(
+        f"/api/v3/RPLFile/{submission_rplfile.id}", headers={"Authorization": "Bearer test"}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    materialized_files = tar_utils.extract_tar_gz_to_dict_of_files(response.content)
+    starting_files = tar_utils.extract_tar_gz_to_dict_of_files(example_activity.starting_rplfile.data)
+    assert materialized_files.keys() == {"main.c", "tiempo.c", "tiempo.h", "files_metadata"}
+    assert materialized_files["main.c"] == starting_files["main.c"]
+    assert materialized_files["tiempo.h"] == starting_files["tiempo.h"]
+    assert materialized_files["tiempo.c"] == example_submission_raw_data[0][1][1].decode()
+
+
+def test_delta_submissions_keep_their_starting_files_when_the_activity_is_updated(
+    activities_api_client: TestClient,
+    activities_api_dbsession: Session,
+    example_unit_test_suite: UnitTestSuite,
+    example_activity: Activity,
+    example_submission_raw_data: ExamplesOfSubmissionRawData,
+    examples_of_starting_files_raw_data: ExamplesOfStartingFilesRawData,
+    admin_auth_headers: dict[str, str],
+):
+    submission_rplfile = _create_submission_rplfile(
+        activities_api_client,
+        activities_api_dbsession,
+        example_activity,
+        example_submission_raw_data,
+        admin_auth_headers,
+    )
+    files_before_update = activities_api_client.get(
+        f"/api/v3/courses/{example_activity.course_id}/extractedRPLFile/{submission_rplfile.id}",
+        headers=admin_auth_headers,
+    ).json()
+
+    response = activities_api_client.patch(
+        f"/api/v3/courses/{example_activity.course_id}/activities/{example_activity.id}",
+        headers=admin_auth_headers,
+        data={"name": "updated"},
+        files=examples_of_starting_files_raw_data["python"],
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+    activities_api_dbsession.refresh(submission_rplfile)
+    assert submission_rplfile.base_rplfile_id != example_activity.starting_rplfile_id
+    files_after_update = activities_api_client.get(
+        f"/api/v3/courses/{example_activity.course_id}/extractedRPLFile/{submission_rplfile.id}",
+        headers=admin_auth_headers,
+    ).json()
+    assert files_after_update == files_before_update
+
+
+def test_create_submission_in_full_storage_mode_stores_every_file(
+    activities_api_client: TestClient,
+    activities_api_dbsession: Session,
+    example_unit_test_suite: UnitTestSuite,
+    example_activity: Activity,
+    example_submission_raw_data: ExamplesOfSubmissionRawData,
+    admin_auth_headers: dict[str, str],
+    monkeypatch: pytest.MonkeyPatch,
+):
+    monkeypatch.setattr(env, "SUBMISSION_FILES_STORAGE_MODE", "full")
+
+    submission_rplfile = _create_submission_rplfile(
+        activities_api_client,
+        activities_api_dbsession,
+        example_activity,
+        example_submission_raw_data,
+        admin_auth_headers,
+    )
+
+    assert submission_rplfile.base_rplfile_id is None
+    stored_files = tar_utils.extract_tar_gz_to_dict_of_files(submission_rplfile.data)
+    assert stored_files.keys() == {"main.c", "tiempo.c", "tiempo.h", "files_metadata"}
+
+
+# ==============================================================================
+
+
+def test_identical_submissions_share_a_single_blob(
+    activities_api_client: TestClient,
+    activities_api_dbsession: Session,
+    example_unit_test_suite: UnitTestSuite,
+    example_activity: Activity,
+    example_submission_raw_data: ExamplesOfSubmissionRawData,
+    admin_auth_headers: dict[str, str],
+):
+    first_rplfile = _create_submission_rplfile(
+        activities_api_client,
+        activities_api_dbsession,
+        example_activity,
+        example_submission_raw_data,
+        admin_auth_headers,
+    )
+    second_rplfile = _create_submission_rplfile(
+        activities_api_client,
+        activities_api_dbsession,
+        example_activity,
+        example_submission_raw_data,
+        admin_auth_headers,
+    )
+
+    assert first_rplfile.id != second_rplfile.id
+    assert first_rplfile.blob_id is not None
+    assert first_rplfile.blob_id == second_rplfile.blob_id
+    assert first_rplfile.blob.size == len(first_rplfile.data)
+
+
+def test_clone_rplfile_shares_the_blob_of_legacy_inline_rplfiles(
+    activities_api_dbsession: Session, example_basic_rplfiles: list[RPLFile]
+):
+    inline_rplfile = example_basic_rplfiles[0]
+    inline_data = inline_rplfile.data
+    assert inline_rplfile.blob_id is None
+
+    cloned_rplfile = RPLFilesRepository(activities_api_dbsession).clone_rplfile(inline_rplfile)
+
+    activities_api_dbsession.refresh(inline_rplfile)
+    assert inline_rplfile.blob_id is not None
+    assert inline_rplfile.stored_data is None
+    assert cloned_rplfile.blob_id == inline_rplfile.blob_id
+    assert cloned_rplfile.data == inline_data == inline_rplfile.data
+
+
+def test_update_rplfile_deletes_the_previous_blob_once_unreferenced(
+    activities_api_dbsession: Session, example_basic_rplfiles: list[RPLFile]
+):
+    rplfiles_repo = RPLFilesRepository(activities_api_dbsession)
+    rplfile = rplfiles_repo.create_rplfile("main.py", aux_models.RPLFileType.TEXT, b"print('v1')")
+    clone = rplfiles_repo.clone_rplfile(rplfile)
+    first_blob_id = rplfile.blob_id
+
+    rplfiles_repo.update_rplfile(rplfile.id, "main.py", aux_models.RPLFileType.TEXT, b"print('v2')")
+    assert activities_api_dbsession.get(RPLFileBlob, first_blob_id) is not None  # still used by the clone
+
+    rplfiles_repo.update_rplfile(clone.id, "main.py", aux_models.RPLFileType.TEXT, b"print('v2')")
+    activities_api_dbsession.expire_all()
+    assert activities_api_dbsession.get(RPLFileBlob, first_blob_id) is None
+    assert rplfile.blob_id == clone.blob_id
+    assert clone.data == b"print('v2')"
+
+
+# ==============================================================================
+
+
+def _create_submission_for_activity(
+    activities_api_dbsession: Session, activity: Activity, solution_rplfile: RPLFile
+) -> ActivitySubmission:
+    submission = ActivitySubmission(
+        is_final_solution=False,
+        activity_id=activity.id,
+        user_id=2,
+        solution_rplfile_id=solution_rplfile.id,
+        status=aux_models.SubmissionStatus.PROCESSING,
+    )
+    activities_api_dbsession.add(submission)
+    SubmissionsSummariesRepository(activities_api_dbsession).apply_status_change(
+        submission, previous_status=None
+    )
+    activities_api_dbsession.commit()
+    return submission
+
+
+def _exec_log(result_status: str, **extra_fields) -> dict:
+    return {
+        "tests_execution_result_status": result_status,
+        "tests_execution_stage": "RUN",
+        "tests_execution_exit_message": "Exit code 0",
+        "tests_execution_stderr": "",
+        "tests_execution_stdout": "stdout",
+        **extra_fields,
+    }
+
+
+def test_save_exec_log_of_io_tested_submission_in_a_single_transaction(
+    activities_api_client: TestClient,
+    activities_api_dbsession: Session,
+    example_activity_with_io_tests: Activity,
+    example_io_tests: list[IOTest],
+    example_submission_rplfile: RPLFile,
+    db_statements_counter: DBStatementsCounter,
+):
+    extra_io_tests = [
+        IOTest(
+            activity_id=example_activity_with_io_tests.id, name=f"IOTest {i}", test_in="in", test_out="out"
+        )
+        for i in range(3, 51)
+    ]
+    activities_api_dbsession.add_all(extra_io_tests)
+    activities_api_dbsession.commit()
+    io_tests_outputs = [io_test.test_out for io_test in example_io_tests + extra_io_tests]
+    # First run of these (directly inserted) IO tests: their snapshots are created
+    first_submission_id = _create_submission_for_activity(
+        activities_api_dbsession, example_activity_with_io_tests, example_submission_rplfile
+    ).id
+    activities_api_client.post(
+        f"/api/v3/submissions/{first_submission_id}/execLog",
+        json=_exec_log("OK", all_student_only_outputs_from_iotests_runs=io_tests_outputs),
+        headers={"Authorization": "Bearer test"},
+    )
+    submission_id = _create_submission_for_activity(
+        activities_api_dbsession, example_activity_with_io_tests, example_submission_rplfile
+    ).id
+    # The API shares this session: nothing should be already loaded, as in a real request
+    activities_api_dbsession.expunge_all()
+    db_statements_counter.reset()
+
+    response = activities_api_client.post(
+        f"/api/v3/submissions/{submission_id}/execLog",
+        json=_exec_log("OK", all_student_only_outputs_from_iotests_runs=io_tests_outputs),
+        headers={"Authorization": "Bearer test"},
+    )
+
+    assert response.status_code == status.HTTP_201_CREATED
+    # Submission, activity and IO tests are read, then a single INSERT per table and UPDATE (plus the
+    # read and UPDATE of the submissions summary) are committed together. The number of IO tests doesn't
+    # matter (their runs go in one executemany).
+    assert db_statements_counter.commits == 1
+    assert len(db_statements_counter.statements) <= 8
+    submission = activities_api_dbsession.get(ActivitySubmission, submission_id)
+    assert submission.status == aux_models.SubmissionStatus.SUCCESS
+    assert len(submission.tests_execution_log.io_test_runs) == len(io_tests_outputs)
+    assert {run.io_test_snapshot_id for run in submission.tests_execution_log.io_test_runs} == {
+        io_test.snapshot_id
+        for io_test in activities_api_dbsession.get(Activity, submission.activity_id).io_tests
+    }
+
+
+def test_io_tests_created_before_snapshots_get_theirs_from_the_backfill(
+    activities_api_dbsession: Session, example_activity_with_io_tests: Activity
+):
+    # i.e. inserted directly, as the IO tests that already existed
+    legacy_io_tests = [
+        IOTest(activity_id=example_activity_with_io_tests.id, name=name, test_in="in", test_out="out")
+        for name in ["Legacy 1", "Legacy 2", "Legacy 1"]
+    ]
+    activities_api_dbsession.add_all(legacy_io_tests)
+    activities_api_dbsession.commit()
+
+    tests_repo = activity_tests.TestsRepository(activities_api_dbsession)
+    updated = tests_repo.create_missing_io_test_snapshots(batch_size=2)
+
+    assert updated == len(legacy_io_tests)
+    assert tests_repo.create_missing_io_test_snapshots(batch_size=2) == 0
+    activities_api_dbsession.expire_all()
+    snapshots = [io_test.snapshot for io_test in legacy_io_tests]
+    assert [(snapshot.name, snapshot.test_in, snapshot.test_out) for snapshot in snapshots] == [
+        ("Legacy 1", "in", "out"),
+        ("Legacy 2", "in", "out"),
+        ("Legacy 1", "in", "out"),
+    ]
+    # Same content, same snapshot
+    assert snapshots[0].id == snapshots[2].id != snapshots[1].id
+
+
+def test_io_test_runs_keep_the_io_test_version_they_were_run_against(
+    activities_api_client: TestClient,
+    activities_api_dbsession: Session,
+    example_activity_with_io_tests: Activity,
+    example_submission_rplfile: RPLFile,
+    admin_auth_headers: dict[str, str],
+):
+    course_id = example_activity_with_io_tests.course_id
+    activity_id = example_activity_with_io_tests.id
+    response = activities_api_client.post(
+        f"/api/v3/courses/{course_id}/activities/{activity_id}/iotests",
+        json={"name": "IOTest", "test_in": "1", "test_out": "2"},
+        headers=admin_auth_headers,
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+    io_test_id = response.json()["id"]
+    submission_id = _create_submission_for_activity(
+        activities_api_dbsession, example_activity_with_io_tests, example_submission_rplfile
+    ).id
+    activities_api_client.post(
+        f"/api/v3/submissions/{submission_id}/execLog",
+        json=_exec_log("OK", all_student_only_outputs_from_iotests_runs=["3"]),
+        headers={"Authorization": "Bearer test"},
+    )
+
+    response = activities_api_client.put(
+        f"/api/v3/courses/{course_id}/activities/{activity_id}/iotests/{io_test_id}",
+        json={"name": "IOTest", "test_in": "1", "test_out": "3"},
+        headers=admin_auth_headers,
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+    response = activities_api_client.get(
+        f"/api/v3/courses/{course_id}/submissions/{submission_id}/result", headers=admin_auth_headers
+    )
+    assert response.status_code == status.HTTP_200_OK
+    result = response.json()
+    assert result["submission_status"] == aux_models.SubmissionStatus.FAILURE
+    assert [
+        (run["name"], run["test_in"], run["expected_output"], run["run_output"])
+        for run in result["io_tests_run_results"]
+    ] == [("IOTest", "1", "2", "3")]
+    assert (
+        activities_api_dbsession.execute(sa.select(sa.func.count()).select_from(IOTestSnapshot)).scalar() == 2
+    )
+
+
+def test_io_test_runs_store_only_the_outputs_of_failed_runs(
+    activities_api_client: TestClient,
+    activities_api_dbsession: Session,
+    example_activity_with_io_tests: Activity,
+    example_submission_rplfile: RPLFile,
+    admin_auth_headers: dict[str, str],
+    monkeypatch: pytest.MonkeyPatch,
+):
+    monkeypatch.setattr(env, "IO_TEST_RUN_OUTPUT_MAX_CHARS", 10)
+    course_id = example_activity_with_io_tests.course_id
+    activity_id = example_activity_with_io_tests.id
+    for test_in, test_out in [("1", "2"), ("2", "3")]:
+        response = activities_api_client.post(
+            f"/api/v3/courses/{course_id}/activities/{activity_id}/iotests",
+            json={"name": f"IOTest {test_in}", "test_in": test_in, "test_out": test_out},
+            headers=admin_auth_headers,
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+    io_tests_count = len(example_activity_with_io_tests.io_tests)
+    expected_outputs = [io_test.test_out for io_test in example_activity_with_io_tests.io_tests]
+    long_wrong_output = "wrong output " * 100
+    submission_id = _create_submission_for_activity(
+        activities_api_dbsession, example_activity_with_io_tests, example_submission_rplfile
+    ).id
+
+    response = activities_api_client.post(
+        f"/api/v3/submissions/{submission_id}/execLog",
+        json=_exec_log(
+            "OK", all_student_only_outputs_from_iotests_runs=expected_outputs[:-1] + [long_wrong_output]
+        ),
+        headers={"Authorization": "Bearer test"},
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+
+    submission = activities_api_dbsession.get(ActivitySubmission, submission_id)
+    io_test_runs = submission.tests_execution_log.io_test_runs
+    assert len(io_test_runs) == io_tests_count
+    passed_runs, failed_run = io_test_runs[:-1], io_test_runs[-1]
+    assert all(run.passed and run.run_output is None for run in passed_runs)
+    assert not failed_run.passed
+    assert failed_run.run_output == long_wrong_output[:10]
+    assert failed_run.full_run_output_blob is not None
+
+    response = activities_api_client.get(
+        f"/api/v3/courses/{course_id}/submissions/{submission_id}/result", headers=admin_auth_headers
+    )
+    assert response.status_code == status.HTTP_200_OK
+    result = response.json()
+    assert result["submission_status"] == aux_models.SubmissionStatus.FAILURE
+    assert [run["run_output"] for run in result["io_tests_run_results"]] == expected_outputs[:-1] + [
+        long_wrong_output[:10]
+    ]
+    assert [run["run_output_truncated"] for run in result["io_tests_run_results"]] == [False] * (
+        io_tests_count - 1
+    ) + [True]
+
+    for run_id, expected_output in [
+        (passed_runs[0].id, expected_outputs[0]),
+        (failed_run.id, long_wrong_output),
+    ]:
+        response = activities_api_client.get(
+            f"/api/v3/courses/{course_id}/submissions/{submission_id}/result/ioTestRuns/{run_id}/output",
+            headers=admin_auth_headers,
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert response.text == expected_output
+    response = activities_api_client.get(
+        f"/api/v3/courses/{course_id}/submissions/{submission_id}/result/ioTestRuns/99999/output",
+        headers=admin_auth_headers,
+    )
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_io_test_run_outputs_are_reported_as_truncated_even_if_the_full_ones_are_not_kept(
+    activities_api_client: TestClient,
+    activities_api_dbsession: Session,
+    example_activity_with_io_tests: Activity,
+    example_io_tests: list[IOTest],
+    example_submission_rplfile: RPLFile,
+    admin_auth_headers: dict[str, str],
+    monkeypatch: pytest.MonkeyPatch,
+):
+    monkeypatch.setattr(env, "IO_TEST_RUN_OUTPUT_MAX_CHARS", 10)
+    monkeypatch.setattr(env, "IO_TEST_RUN_KEEP_FULL_OUTPUT", False)
+    course_id = example_activity_with_io_tests.course_id
+    io_tests_count = len(example_io_tests)
+    outputs = ["wrong output " * 100] + ["short"] * (io_tests_count - 1)
+    submission_id = _create_submission_for_activity(
+        activities_api_dbsession, example_activity_with_io_tests, example_submission_rplfile
+    ).id
+    response = activities_api_client.post(
+        f"/api/v3/submissions/{submission_id}/execLog",
+        json=_exec_log("OK", all_student_only_outputs_from_iotests_runs=outputs),
+        headers={"Authorization": "Bearer test"},
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+
+    response = activities_api_client.get(
+        f"/api/v3/courses/{course_id}/submissions/{submission_id}/result", headers=admin_auth_headers
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    runs = response.json()["io_tests_run_results"]
+    assert [run["run_output"] for run in runs] == [outputs[0][:10]] + outputs[1:]
+    assert [run["run_output_truncated"] for run in runs] == [True] + [False] * (io_tests_count - 1)
+    # Only the prefix was kept
+    response = activities_api_client.get(
+        f"/api/v3/courses/{course_id}/submissions/{submission_id}/result/ioTestRuns/{runs[0]['id']}/output",
+        headers=admin_auth_headers,
+    )
+    assert response.text == outputs[0][:10]
+
+
+def test_tests_execution_logs_are_capped_in_results_and_fetched_in_full_on_demand(
+    activities_api_client: TestClient,
+    example_unit_test_suite: UnitTestSuite,
+    example_submission: ActivitySubmission,
+    admin_auth_headers: dict[str, str],
+    monkeypatch: pytest.MonkeyPatch,
+):
+    monkeypatch.setattr(env, "TESTS_EXECUTION_LOG_MAX_CHARS", 10)
+    course_id = example_submission.activity.course_id
+    long_stdout = "printed line\n" * 100
+    response = activities_api_client.post(
+        f"/api/v3/submissions/{example_submission.id}/execLog",
+        json=_exec_log(
+            "ERROR",
+            tests_execution_stage="BUILD",
+            tests_execution_stdout=long_stdout,
+            tests_execution_stderr="error",
+        ),
+        headers={"Authorization": "Bearer test"},
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+
+    response = activities_api_client.get(
+        f"/api/v3/courses/{course_id}/submissions/{example_submission.id}/result", headers=admin_auth_headers
+    )
+    assert response.status_code == status.HTTP_200_OK
+    result = response.json()
+    assert result["stdout"].startswith(long_stdout[:10])
+    assert f"{len(long_stdout) - 10} more chars truncated" in result["stdout"]
+    assert result["stderr"] == "error"
+
+    for log_stream, expected_log in [("stdout", long_stdout), ("stderr", "error")]:
+        response = activities_api_client.get(
+            f"/api/v3/courses/{course_id}/submissions/{example_submission.id}/result/{log_stream}",
+            headers=admin_auth_headers,
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert response.text == expected_log
+
+
+def test_submissions_results_listing_runs_a_constant_number_of_queries(
+    activities_api_client: TestClient,
+    activities_api_dbsession: Session,
+    example_activity_with_io_tests: Activity,
+    example_submission_rplfile: RPLFile,
+    admin_auth_headers: dict[str, str],
+    db_statements_counter: DBStatementsCounter,
+):
+    course_id = example_activity_with_io_tests.course_id
+    activity_id = example_activity_with_io_tests.id
+    solution_rplfile_id = example_submission_rplfile.id
+    outputs = [io_test.test_out for io_test in example_activity_with_io_tests.io_tests]
+
+    def submit_and_list_submissions(amount: int) -> tuple[int, int]:
+        for i in range(amount):
+            submission = ActivitySubmission(
+                is_final_solution=False,
+                activity_id=activity_id,
+                user_id=2,
+                solution_rplfile_id=solution_rplfile_id,
+                status=aux_models.SubmissionStatus.PROCESSING,
+            )
+            activities_api_dbsession.add(submission)
+            activities_api_dbsession.commit()
+            submission_id = submission.id
+            response = activities_api_client.post(
+                f"/api/v3/submissions/{submission_id}/execLog",
+                json=_exec_log(
+                    "OK", all_student_only_outputs_from_iotests_runs=outputs[:-1] + [f"wrong {i}"]
+                ),
+                headers={"Authorization": "Bearer test"},
+            )
+            assert response.status_code == status.HTTP_201_CREATED
+        activities_api_dbsession.expunge_all()
+        db_statements_counter.reset()
+        response = activities_api_client.get(
+            f"/api/v3/courses/{course_id}/activities/{activity_id}/students/2/submissions",
+            headers=admin_auth_headers,
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert all(len(result["io_tests_run_results"]) == len(outputs) for result in response.json())
+        return len(response.json()), len(db_statements_counter.statements)
+
+    few_submissions, statements_with_few_submissions = submit_and_list_submissions(2)
+    many_submissions, statements_with_many_submissions = submit_and_list_submissions(8)
+
+    assert (few_submissions, many_submissions) == (2, 10)
+    assert statements_with_many_submissions == statements_with_few_submissions
+
+
+def test_submissions_history_is_paginated_by_cursor(
+    activities_api_client: TestClient,
+    activities_api_dbsession: Session,
+    example_activity: Activity,
+    example_submission_rplfile: RPLFile,
+    admin_auth_headers: dict[str, str],
+):
+    submission_ids = []
+    for day in [1, 2, 2, 3, 4]:
+        submission = ActivitySubmission(
+            is_final_solution=False,
+            activity_id=example_activity.id,
+            user_id=2,
+            solution_rplfile_id=example_submission_rplfile.id,
+            status=aux_models.SubmissionStatus.FAILURE,
+            date_created=datetime(2025, 3, day),
+        )
+        activities_api_dbsession.add(submission)
+        activities_api_dbsession.commit()
+        submission_ids.append(submission.id)
+    url = f"/api/v3/courses/{example_activity.course_id}/activities/{example_activity.id}/students/2/submissions"
+
+    pages = []
+    params = {"limit": 2, "summary": True}
+    while True:
+        response = activities_api_client.get(url, params=params, headers=admin_auth_headers)
+        assert response.status_code == status.HTTP_200_OK
+        pages.append([result["id"] for result in response.json()])
+        assert all("stdout" not in result for result in response.json())
+        if "X-Next-Cursor" not in response.headers:
+            break
+        params["cursor"] = response.headers["X-Next-Cursor"]
+
+    newest_first = list(reversed(submission_ids))
+    assert [submission_id for page in pages for submission_id in page] == newest_first
+    assert [len(page) for page in pages] == [2, 2, 1]
+
+    # Not paginated: oldest first
+    response = activities_api_client.get(url, params={"summary": True}, headers=admin_auth_headers)
+    assert [result["id"] for result in response.json()] == submission_ids
+    assert "X-Next-Cursor" not in response.headers
+
+    # Exact multiple of the page size: the last page is empty
+    response = activities_api_client.get(
+        url, params={"limit": 5, "summary": True}, headers=admin_auth_headers
+    )
+    assert [result["id"] for result in response.json()] == newest_first
+    response = activities_api_client.get(
+        url,
+        params={"limit": 5, "cursor": response.headers["X-Next-Cursor"], "summary": True},
+        headers=admin_auth_headers,
+    )
+    assert response.json() == []
+    assert "X-Next-Cursor" not in response.headers
+
+    response = activities_api_client.get(url, params={"cursor": "not a cursor"}, headers=admin_auth_headers)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_save_exec_log_with_failed_unit_tests(
+    activities_api_client: TestClient,
+    activities_api_dbsession: Session,
+    example_unit_test_suite: UnitTestSuite,
+    example_submission: ActivitySubmission,
+    db_statements_counter: DBStatementsCounter,
+):
+    db_statements_counter.reset()
+    response = activities_api_client.post(
+        f"/api/v3/submissions/{example_submission.id}/execLog",
+        json=_exec_log(
+            "OK",
+            unit_test_suite_result_summary={
+                "amount_passed": 1,
+                "amount_failed": 1,
+                "amount_errored": 0,
+                "single_test_reports": [
+                    {"name": "test_ok", "status": "PASSED"},
+                    {"name": "test_ko", "status": "FAILED", "messages": "expected 1"},
+                ],
+            },
+        ),
+        headers={"Authorization": "Bearer test"},
+    )
+
+    assert response.status_code == status.HTTP_201_CREATED
+    assert db_statements_counter.commits == 1
+    activities_api_dbsession.expire_all()
+    assert example_submission.status == aux_models.SubmissionStatus.FAILURE
+    unit_test_runs = {run.test_name: run for run in example_submission.tests_execution_log.unit_test_runs}
+    assert unit_test_runs["test_ok"].passed
+    assert not unit_test_runs["test_ko"].passed
+    assert unit_test_runs["test_ko"].error_messages == "expected 1"
+
+
+def test_save_errored_exec_log_sets_the_error_status_without_test_runs(
+    activities_api_client: TestClient,
+    activities_api_dbsession: Session,
+    example_unit_test_suite: UnitTestSuite,
+    example_submission: ActivitySubmission,
+):
+    response = activities_api_client.post(
+        f"/api/v3/submissions/{example_submission.id}/execLog",
+        json=_exec_log("ERROR", tests_execution_stage="BUILD"),
+        headers={"Authorization": "Bearer test"},
+    )
+
+    assert response.status_code == status.HTTP_201_CREATED
+    activities_api_dbsession.expire_all()
+    assert example_submission.status == aux_models.SubmissionStatus.BUILD_ERROR
+    assert not example_submission.tests_execution_log.success
+    assert example_submission.tests_execution_log.unit_test_runs == []
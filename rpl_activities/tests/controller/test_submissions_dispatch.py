@@ -0,0 +1,491 @@
+from datetime import datetime, timedelta, timezone
+import logging
+import time
+from fastapi.testclient import TestClient
+from fastapi import status
+import pika.exceptions
+import pytest
+import sqlalchemy as sa
+from sqlalchemy.orm import Session, sessionmaker
+
+from rpl_activities.src.dtos.submission_dtos import SubmissionsReprocessingRequestDTO
+from rpl_activities.src.repositories.models import aux_models
+from rpl_activities.src.repositories.models.activity import Activity
+from rpl_activities.src.repositories.models.activity_submission import ActivitySubmission
+from rpl_activities.src.repositories.models.activity_submissions_summary import ActivitySubmissionsSummary
+from rpl_activities.src.repositories.models.submission_dispatch import SubmissionDispatch
+from rpl_activities.src.repositories.models.unit_test_suite import UnitTestSuite
+from rpl_activities.src.services.submissions_dispatcher import SubmissionsDispatcher
+from rpl_activities.src.repositories.models.submissions_reprocessing_job import SubmissionsReprocessingJob
+from rpl_activities.src.repositories.submissions_reprocessing_jobs import (
+    SubmissionsReprocessingJobsRepository,
+)
+from rpl_activities.src.repositories.submissions_summaries import SubmissionsSummariesRepository
+from rpl_activities.src.services.submissions_reprocessor import (
+    INTERRUPTED_JOB_TIMEOUT,
+    SubmissionsReprocessor,
+)
+from rpl_activities.tests.conftest import ExamplesOfSubmissionRawData, get_submissions_summaries
+
+
+class FakeMQSender:
+    def __init__(self, available: bool = True, rejected_submission_ids: set[int] = set()):
+        self.available = available
+        self.rejected_submission_ids = rejected_submission_ids
+        self.sent = []
+
+    def send_submissions(self, submissions: list[tuple[int, str]]) -> list[int]:
+        if not self.available:
+            raise pika.exceptions.AMQPConnectionError("unreachable")
+        accepted = [
+            submission for submission in submissions if submission[0] not in self.rejected_submission_ids
+        ]
+        self.sent.extend(accepted)
+        return [submission_id for submission_id, _ in accepted]
+
+
+def _dispatcher(db_session: Session, mq_sender: FakeMQSender, batch_size: int = 100) -> SubmissionsDispatcher:
+    return SubmissionsDispatcher(mq_sender, sessionmaker(bind=db_session.get_bind()), batch_size=batch_size)
+
+
+def _create_submission(
+    activities_api_client: TestClient,
+    activity: Activity,
+    submission_raw_data: ExamplesOfSubmissionRawData,
+    auth_headers: dict[str, str],
+) -> int:
+    response = activities_api_client.post(
+        f"/api/v3/courses/{activity.course_id}/activities/{activity.id}/submissions",
+        files=submission_raw_data,
+        headers=auth_headers,
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+    return response.json()["id"]
+
+
+def test_create_submission_writes_its_dispatch_without_publishing(
+    activities_api_client: TestClient,
+    activities_api_dbsession: Session,
+    example_unit_test_suite: UnitTestSuite,
+    example_activity: Activity,
+    example_submission_raw_data: ExamplesOfSubmissionRawData,
+    admin_auth_headers: dict[str, str],
+):
+    submission_id = _create_submission(
+        activities_api_client, example_activity, example_submission_raw_data, admin_auth_headers
+    )
+
+    dispatch = activities_api_dbsession.scalars(
+        sa.select(SubmissionDispatch).where(SubmissionDispatch.submission_id == submission_id)
+    ).one()
+    assert dispatch.dispatched is False
+    assert dispatch.language == example_activity.language
+    assert (
+        activities_api_dbsession.get(ActivitySubmission, submission_id).status
+        == aux_models.SubmissionStatus.PENDING
+    )
+
+
+def test_dispatcher_publishes_pending_submissions_in_batches(
+    activities_api_client: TestClient,
+    activities_api_dbsession: Session,
+    example_unit_test_suite: UnitTestSuite,
+    example_activity: Activity,
+    example_submission_raw_data: ExamplesOfSubmissionRawData,
+    admin_auth_headers: dict[str, str],
+):
+    submission_ids = [
+        _create_submission(
+            activities_api_client, example_activity, example_submission_raw_data, admin_auth_headers
+        )
+        for _ in range(3)
+    ]
+    mq_sender = FakeMQSender()
+    dispatcher = _dispatcher(activities_api_dbsession, mq_sender, batch_size=2)
+
+    assert dispatcher.dispatch_pending_batch() == 2
+    assert dispatcher.dispatch_pending_batch() == 1
+    assert dispatcher.dispatch_pending_batch() == 0
+
+    assert mq_sender.sent == [(submission_id, example_activity.language) for submission_id in submission_ids]
+    activities_api_dbsession.expire_all()
+    for submission_id in submission_ids:
+        submission = activities_api_dbsession.get(ActivitySubmission, submission_id)
+        assert submission.status == aux_models.SubmissionStatus.ENQUEUED
+    assert all(
+        dispatch.dispatched for dispatch in activities_api_dbsession.scalars(sa.select(SubmissionDispatch))
+    )
+
+
+def test_dispatcher_keeps_submissions_pending_while_the_broker_is_down(
+    activities_api_client: TestClient,
+    activities_api_dbsession: Session,
+    example_unit_test_suite: UnitTestSuite,
+    example_activity: Activity,
+    example_submission_raw_data: ExamplesOfSubmissionRawData,
+    admin_auth_headers: dict[str, str],
+):
+    submission_id = _create_submission(
+        activities_api_client, example_activity, example_submission_raw_data, admin_auth_headers
+    )
+
+    with pytest.raises(pika.exceptions.AMQPConnectionError):
+        _dispatcher(activities_api_dbsession, FakeMQSender(available=False)).dispatch_pending_batch()
+    activities_api_dbsession.expire_all()
+    dispatch = activities_api_dbsession.scalars(sa.select(SubmissionDispatch)).one()
+    assert dispatch.dispatched is False
+    assert dispatch.attempts == 0
+
+    mq_sender = FakeMQSender()
+    assert _dispatcher(activities_api_dbsession, mq_sender).dispatch_pending_batch() == 1
+    assert mq_sender.sent == [(submission_id, example_activity.language)]
+
+
+def test_dispatcher_backs_off_while_the_broker_is_down_and_logs_the_outage_once(
+    activities_api_client: TestClient,
+    activities_api_dbsession: Session,
+    example_unit_test_suite: UnitTestSuite,
+    example_activity: Activity,
+    example_submission_raw_data: ExamplesOfSubmissionRawData,
+    admin_auth_headers: dict[str, str],
+    caplog: pytest.LogCaptureFixture,
+):
+    _create_submission(
+        activities_api_client, example_activity, example_submission_raw_data, admin_auth_headers
+    )
+    mq_sender = FakeMQSender(available=False)
+    dispatcher = SubmissionsDispatcher(
+        mq_sender,
+        sessionmaker(bind=activities_api_dbsession.get_bind()),
+        poll_interval_seconds=0.5,
+        max_backoff_seconds=5,
+    )
+
+    with caplog.at_level(logging.INFO, logger="uvicorn.error"):
+        wait_seconds = [dispatcher.dispatch_round() for _ in range(6)]
+        assert wait_seconds == [1, 2, 4, 5, 5, 5]
+        assert [record.levelno for record in caplog.records] == [logging.ERROR]
+
+        mq_sender.available = True
+        assert dispatcher.dispatch_round() == dispatcher.poll_interval_seconds
+        assert dispatcher.dispatch_round() == dispatcher.poll_interval_seconds
+        assert [record.levelno for record in caplog.records] == [logging.ERROR, logging.INFO]
+    activities_api_dbsession.expire_all()
+    dispatch = activities_api_dbsession.scalars(sa.select(SubmissionDispatch)).one()
+    assert dispatch.dispatched is True
+    assert dispatch.attempts == 1
+
+
+def test_dispatcher_prunes_dispatched_rows_older_than_the_retention(
+    activities_api_dbsession: Session, example_submission: ActivitySubmission
+):
+    now = datetime.now(timezone.utc)
+    activities_api_dbsession.add_all(
+        [
+            SubmissionDispatch(
+                submission_id=example_submission.id,
+                language="c",
+                dispatched=dispatched,
+                attempts=1,
+                date_created=now - age,
+                date_dispatched=(now - age) if dispatched else None,
+            )
+            for dispatched, age in [
+                (True, timedelta(days=10)),
+                (True, timedelta(days=9)),
+                (True, timedelta(hours=1)),
+                (False, timedelta(days=10)),
+            ]
+        ]
+    )
+    activities_api_dbsession.commit()
+    dispatcher = SubmissionsDispatcher(
+        FakeMQSender(),
+        sessionmaker(bind=activities_api_dbsession.get_bind()),
+        batch_size=1,
+        retention=timedelta(days=7),
+    )
+
+    assert dispatcher.prune_dispatched() == 2
+
+    activities_api_dbsession.expire_all()
+    remaining = activities_api_dbsession.scalars(
+        sa.select(SubmissionDispatch).order_by(SubmissionDispatch.id)
+    ).all()
+    assert [dispatch.dispatched for dispatch in remaining] == [True, False]
+    assert dispatcher.prune_dispatched() == 0
+
+
+def test_dispatcher_gives_up_on_submissions_rejected_too_many_times(
+    activities_api_client: TestClient,
+    activities_api_dbsession: Session,
+    example_unit_test_suite: UnitTestSuite,
+    example_activity: Activity,
+    example_submission_raw_data: ExamplesOfSubmissionRawData,
+    admin_auth_headers: dict[str, str],
+):
+    submission_id = _create_submission(
+        activities_api_client, example_activity, example_submission_raw_data, admin_auth_headers
+    )
+    dispatcher = _dispatcher(activities_api_dbsession, FakeMQSender(rejected_submission_ids={submission_id}))
+
+    for _ in range(dispatcher.max_attempts):
+        assert dispatcher.dispatch_pending_batch() == 1
+    assert dispatcher.dispatch_pending_batch() == 0
+
+    activities_api_dbsession.expire_all()
+    assert (
+        activities_api_dbsession.get(ActivitySubmission, submission_id).status
+        == aux_models.SubmissionStatus.PENDING
+    )
+
+
+# ==============================================================================
+
+
+def _add_submissions(
+    db_session: Session,
+    activity: Activity,
+    template: ActivitySubmission,
+    statuses: list[str],
+    age=timedelta(),
+) -> list[int]:
+    submissions = [
+        ActivitySubmission(
+            is_final_solution=False,
+            activity_id=activity.id,
+            user_id=template.user_id,
+            solution_rplfile_id=template.solution_rplfile_id,
+            status=submission_status,
+            date_created=datetime.now(timezone.utc) - age,
+            last_updated=datetime.now(timezone.utc) - age,
+        )
+        for submission_status in statuses
+    ]
+    db_session.add_all(submissions)
+    db_session.commit()
+    return [submission.id for submission in submissions]
+
+
+def _run_reprocessing(db_session: Session, **reprocessing_data) -> SubmissionsReprocessingJob:
+    job = SubmissionsReprocessingJobsRepository(db_session).create_running_job(
+        SubmissionsReprocessingRequestDTO(**reprocessing_data).model_dump_json()
+    )
+    SubmissionsReprocessor().run(job.id, sessionmaker(bind=db_session.get_bind()))
+    db_session.refresh(job)
+    return job
+
+
+def test_reprocessing_streams_matching_submissions_in_batches(
+    activities_api_dbsession: Session, example_submission: ActivitySubmission, example_activity: Activity
+):
+    stuck_submission_ids = _add_submissions(
+        activities_api_dbsession,
+        example_activity,
+        example_submission,
+        [aux_models.SubmissionStatus.PROCESSING] * 4 + [aux_models.SubmissionStatus.SUCCESS],
+    )
+
+    job = _run_reprocessing(activities_api_dbsession, batch_size=2)
+
+    assert job.status == aux_models.SubmissionsReprocessingJobStatus.FINISHED
+    assert job.running is None
+    assert (job.total, job.processed, job.batches) == (5, 5, 3)
+    activities_api_dbsession.expire_all()
+    dispatched_submission_ids = activities_api_dbsession.scalars(
+        sa.select(SubmissionDispatch.submission_id).order_by(SubmissionDispatch.submission_id)
+    ).all()
+    assert dispatched_submission_ids == [example_submission.id] + stuck_submission_ids[:4]
+    for submission_id in stuck_submission_ids[:4]:
+        submission = activities_api_dbsession.get(ActivitySubmission, submission_id)
+        assert submission.status == aux_models.SubmissionStatus.PENDING
+
+    # Already in the outbox: not dispatched twice
+    assert _run_reprocessing(activities_api_dbsession).processed == 0
+
+
+def test_reprocessing_only_takes_submissions_matching_the_filters(
+    activities_api_dbsession: Session,
+    example_submission: ActivitySubmission,
+    example_activity: Activity,
+    example_activity_with_io_tests: Activity,
+):
+    old_enqueued_submission_ids = _add_submissions(
+        activities_api_dbsession,
+        example_activity,
+        example_submission,
+        [aux_models.SubmissionStatus.ENQUEUED] * 2,
+        age=timedelta(hours=2),
+    )
+    _add_submissions(
+        activities_api_dbsession, example_activity, example_submission, [aux_models.SubmissionStatus.ENQUEUED]
+    )
+    _add_submissions(
+        activities_api_dbsession,
+        example_activity_with_io_tests,
+        example_submission,
+        [aux_models.SubmissionStatus.ENQUEUED],
+        age=timedelta(hours=2),
+    )
+
+    job = _run_reprocessing(
+        activities_api_dbsession,
+        statuses=[aux_models.SubmissionStatus.ENQUEUED],
+        course_id=example_activity.course_id,
+        activity_id=example_activity.id,
+        min_age_minutes=60,
+    )
+
+    assert (job.total, job.processed) == (2, 2)
+    assert (
+        activities_api_dbsession.scalars(sa.select(SubmissionDispatch.submission_id)).all()
+        == old_enqueued_submission_ids
+    )
+
+
+def test_reprocessing_is_rate_limited(
+    activities_api_dbsession: Session, example_submission: ActivitySubmission, example_activity: Activity
+):
+    _add_submissions(
+        activities_api_dbsession,
+        example_activity,
+        example_submission,
+        [aux_models.SubmissionStatus.PENDING] * 5,
+    )
+
+    started_at = time.monotonic()
+    job = _run_reprocessing(activities_api_dbsession, max_per_second=20)
+
+    assert job.processed == 6
+    assert job.batches == 1
+    assert time.monotonic() - started_at >= 0.25
+
+
+def test_reprocessing_and_dispatching_keep_the_submissions_summaries_in_sync(
+    activities_api_dbsession: Session, example_submission: ActivitySubmission, example_activity: Activity
+):
+    _add_submissions(
+        activities_api_dbsession,
+        example_activity,
+        example_submission,
+        [aux_models.SubmissionStatus.PROCESSING] * 2 + [aux_models.SubmissionStatus.SUCCESS],
+    )
+    summaries_repo = SubmissionsSummariesRepository(activities_api_dbsession)
+    summaries_repo.rebuild_summaries(course_id=example_activity.course_id)
+
+    _run_reprocessing(activities_api_dbsession, batch_size=2)
+
+    reprocessed_summaries = get_submissions_summaries(activities_api_dbsession)
+    summaries_repo.rebuild_summaries(course_id=example_activity.course_id)
+    assert get_submissions_summaries(activities_api_dbsession) == reprocessed_summaries
+    [summary] = activities_api_dbsession.scalars(sa.select(ActivitySubmissionsSummary)).all()
+    assert summary.pending_submissions == 3
+    assert summary.processing_submissions == 0
+
+    assert _dispatcher(activities_api_dbsession, FakeMQSender()).dispatch_pending_batch() == 3
+
+    dispatched_summaries = get_submissions_summaries(activities_api_dbsession)
+    summaries_repo.rebuild_summaries(course_id=example_activity.course_id)
+    assert get_submissions_summaries(activities_api_dbsession) == dispatched_summaries
+    [summary] = activities_api_dbsession.scalars(sa.select(ActivitySubmissionsSummary)).all()
+    assert summary.pending_submissions == 0
+    assert summary.enqueued_submissions == 3
+
+
+def _wait_for_reprocessing_job(
+    activities_api_client: TestClient, job_id: int, admin_auth_headers: dict[str, str]
+) -> dict:
+    for _ in range(100):
+        response = activities_api_client.get(
+            f"/api/v3/submissions/reprocessingJobs/{job_id}", headers=admin_auth_headers
+        )
+        assert response.status_code == status.HTTP_200_OK
+        if response.json()["status"] != aux_models.SubmissionsReprocessingJobStatus.RUNNING:
+            break
+        time.sleep(0.05)
+    return response.json()
+
+
+def test_submissions_reprocessing_job_reports_its_progress(
+    activities_api_client: TestClient,
+    activities_api_dbsession: Session,
+    example_submission: ActivitySubmission,
+    admin_auth_headers: dict[str, str],
+    regular_auth_headers: dict[str, str],
+):
+    response = activities_api_client.post(
+        "/api/v3/submissions/reprocessingJobs", headers=regular_auth_headers
+    )
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    response = activities_api_client.post("/api/v3/submissions/reprocessingJobs", headers=admin_auth_headers)
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    job_id = response.json()["job_id"]
+
+    progress = _wait_for_reprocessing_job(activities_api_client, job_id, admin_auth_headers)
+    assert progress["status"] == aux_models.SubmissionsReprocessingJobStatus.FINISHED
+    assert (progress["total"], progress["processed"]) == (1, 1)
+    # Kept in the database: readable from any worker, not only the one running it
+    job = activities_api_dbsession.get(SubmissionsReprocessingJob, job_id)
+    assert (job.status, job.processed) == (aux_models.SubmissionsReprocessingJobStatus.FINISHED, 1)
+
+    mq_sender = FakeMQSender()
+    assert _dispatcher(activities_api_dbsession, mq_sender).dispatch_pending_batch() == 1
+    assert mq_sender.sent == [(example_submission.id, example_submission.activity.language)]
+
+    response = activities_api_client.get(
+        "/api/v3/submissions/reprocessingJobs/12345", headers=admin_auth_headers
+    )
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_only_one_submissions_reprocessing_job_runs_at_a_time(
+    activities_api_client: TestClient,
+    activities_api_dbsession: Session,
+    example_submission: ActivitySubmission,
+    admin_auth_headers: dict[str, str],
+):
+    # e.g. started by another worker
+    running_job = SubmissionsReprocessingJobsRepository(activities_api_dbsession).create_running_job(
+        SubmissionsReprocessingRequestDTO().model_dump_json()
+    )
+
+    response = activities_api_client.post("/api/v3/submissions/reprocessingJobs", headers=admin_auth_headers)
+    assert response.status_code == status.HTTP_409_CONFLICT
+
+    # Its worker stopped without finishing it
+    running_job.last_updated = datetime.now(timezone.utc) - INTERRUPTED_JOB_TIMEOUT - timedelta(minutes=1)
+    activities_api_dbsession.commit()
+    response = activities_api_client.get(
+        f"/api/v3/submissions/reprocessingJobs/{running_job.id}", headers=admin_auth_headers
+    )
+    assert response.json()["status"] == aux_models.SubmissionsReprocessingJobStatus.FAILED
+
+    response = activities_api_client.post("/api/v3/submissions/reprocessingJobs", headers=admin_auth_headers)
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    progress = _wait_for_reprocessing_job(
+        activities_api_client, response.json()["job_id"], admin_auth_headers
+    )
+    assert progress["status"] == aux_models.SubmissionsReprocessingJobStatus.FINISHED
+
+
+def test_reprocess_all_pending_submissions_keeps_its_response(
+    activities_api_client: TestClient,
+    activities_api_dbsession: Session,
+    example_submission: ActivitySubmission,
+    admin_auth_headers: dict[str, str],
+    regular_auth_headers: dict[str, str],
+):
+    response = activities_api_client.post("/api/v3/submissions/reprocessAll", headers=regular_auth_headers)
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    response = activities_api_client.post("/api/v3/submissions/reprocessAll", headers=admin_auth_headers)
+    assert response.status_code == status.HTTP_201_CREATED
+    assert response.json() == []
+
+    [job_id] = activities_api_dbsession.scalars(sa.select(SubmissionsReprocessingJob.id)).all()
+    progress = _wait_for_reprocessing_job(activities_api_client, job_id, admin_auth_headers)
+    assert (progress["status"], progress["processed"]) == (
+        aux_models.SubmissionsReprocessingJobStatus.FINISHED,
+        1,
+    )
@@ -0,0 +1,113 @@
+from fastapi.testclient import TestClient
+from fastapi import status
+import sqlalchemy as sa
+from sqlalchemy.orm import Session
+
+from rpl_activities.src.repositories.models import aux_models
+from rpl_activities.src.repositories.models.activity import Activity
+from rpl_activities.src.repositories.models.activity_submission import ActivitySubmission
+from rpl_activities.src.repositories.models.activity_submissions_summary import ActivitySubmissionsSummary
+from rpl_activities.src.repositories.submissions_summaries import SubmissionsSummariesRepository
+from rpl_activities.tests.conftest import get_submissions_summaries
+
+
+def _update_status(activities_api_client: TestClient, submission_id: int, new_status: str):
+    response = activities_api_client.put(
+        f"/api/v3/submissions/{submission_id}/status",
+        json={"status": new_status},
+        headers={"Authorization": "Bearer test"},
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+
+def test_summaries_follow_the_status_changes_of_the_submissions(
+    activities_api_client: TestClient,
+    activities_api_dbsession: Session,
+    example_activity: Activity,
+    example_submission: ActivitySubmission,
+    example_failed_submission: ActivitySubmission,
+    regular_auth_headers: dict[str, str],
+    admin_auth_headers: dict[str, str],
+):
+    response = activities_api_client.put(
+        "/api/v3/submissions/batch/status",
+        json={"updates": [{"submission_id": example_submission.id, "status": "PROCESSING"}]},
+        headers=admin_auth_headers,
+    )
+    assert response.status_code == status.HTTP_200_OK
+    _update_status(activities_api_client, example_submission.id, aux_models.SubmissionStatus.SUCCESS)
+
+    [summary] = get_submissions_summaries(activities_api_dbsession)
+    assert summary["total_submissions"] == 2
+    assert summary["successful_submissions"] == 1
+    assert summary["submissions_with_failures"] == 1
+    assert summary["pending_submissions"] == summary["processing_submissions"] == 0
+    assert summary["first_success_date"] == example_submission.date_created
+    assert summary["last_submission_date"] == example_submission.date_created
+
+    response = activities_api_client.get("/api/v3/courses/1/activities", headers=regular_auth_headers)
+    assert response.json()[0]["submission_status"] == aux_models.SubmissionStatus.SUCCESS
+    response = activities_api_client.get(
+        "/api/v3/stats/courses/1/basicSummary", params={"user_ids": [2, 3]}, headers=regular_auth_headers
+    )
+    assert response.json() == [
+        {"user_id": 2, "total_score": example_activity.points, "successful_activities_count": 1},
+        {"user_id": 3, "total_score": 0, "successful_activities_count": 0},
+    ]
+    response = activities_api_client.get(
+        "/api/v3/stats/courses/1/activities/me", headers=regular_auth_headers
+    )
+    assert response.json()["amount_of_activities_solved"] == 1
+    assert response.json()["points_obtained"] == example_activity.points
+
+    # e.g. reprocessed against updated tests
+    _update_status(activities_api_client, example_submission.id, aux_models.SubmissionStatus.FAILURE)
+
+    [summary] = get_submissions_summaries(activities_api_dbsession)
+    assert summary["successful_submissions"] == 0
+    assert summary["submissions_with_failures"] == 2
+    assert summary["first_success_date"] is None
+    response = activities_api_client.get("/api/v3/courses/1/activities", headers=regular_auth_headers)
+    assert response.json()[0]["submission_status"] == aux_models.SubmissionStatus.FAILURE
+    response = activities_api_client.get(
+        "/api/v3/stats/courses/1/activities/me", headers=regular_auth_headers
+    )
+    assert response.json()["amount_of_activities_solved"] == 0
+    assert response.json()["amount_of_activities_started"] == 1
+
+
+def test_rebuilt_summaries_match_the_incrementally_maintained_ones(
+    activities_api_client: TestClient,
+    activities_api_dbsession: Session,
+    example_submission: ActivitySubmission,
+    example_failed_submission: ActivitySubmission,
+):
+    _update_status(activities_api_client, example_submission.id, aux_models.SubmissionStatus.SUCCESS)
+    maintained_summaries = get_submissions_summaries(activities_api_dbsession)
+
+    rebuilt = SubmissionsSummariesRepository(activities_api_dbsession).rebuild_summaries(course_id=1)
+
+    assert rebuilt == 1
+    assert get_submissions_summaries(activities_api_dbsession) == maintained_summaries
+    assert maintained_summaries[0]["best_status_rank"] == aux_models.SubmissionStatus.SUCCESS.rank
+
+
+def test_missing_summary_is_created_from_the_submissions_on_their_next_change(
+    activities_api_client: TestClient,
+    activities_api_dbsession: Session,
+    example_submission: ActivitySubmission,
+    example_failed_submission: ActivitySubmission,
+    regular_auth_headers: dict[str, str],
+):
+    # i.e. submissions from before the summaries existed, not rebuilt yet
+    activities_api_dbsession.execute(sa.delete(ActivitySubmissionsSummary))
+    activities_api_dbsession.commit()
+
+    _update_status(activities_api_client, example_submission.id, aux_models.SubmissionStatus.SUCCESS)
+
+    [summary] = get_submissions_summaries(activities_api_dbsession)
+    assert summary["total_submissions"] == 2
+    assert summary["successful_submissions"] == summary["submissions_with_failures"] == 1
+    assert summary["pending_submissions"] == 0
+    response = activities_api_client.get("/api/v3/courses/1/activities", headers=regular_auth_headers)
+    assert response.json()[0]["submission_status"] == aux_models.SubmissionStatus.SUCCESS
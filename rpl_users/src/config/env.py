@@ -34,3 +34,10 @@ if not all(
     ]
 ):
     raise ValueError("Missing environment variables")
+
+
+# Optional settings
+
+# Lifetime of the course capability tokens handed to the activities API. They cannot be revoked,
+# so role or membership changes take up to this long to be reflected there.
+COURSE_CAPABILITY_EXPIRE_SECONDS = int(os.getenv("COURSE_CAPABILITY_EXPIRE_SECONDS", "300"))
@@ -6,7 +6,15 @@ from pwdlib.hashers.bcrypt import BcryptHasher
 import jwt
 from datetime import datetime, timedelta, timezone
 from fastapi import HTTPException, status
-from rpl_users.src.config.env import JWT_SECRET, JWT_ALGORITHM, JWT_EXPIRE_MINUTES
+from rpl_users.src.config.env import (
+    JWT_SECRET,
+    JWT_ALGORITHM,
+    JWT_EXPIRE_MINUTES,
+    COURSE_CAPABILITY_EXPIRE_SECONDS,
+)
+
+# Capability tokens carry an audience so they are never accepted as access tokens (and vice versa)
+COURSE_CAPABILITY_AUDIENCE = "rpl_activities_api"
 
 
 hasher = PasswordHash((BcryptHasher(rounds=10),))
@@ -44,6 +52,21 @@ def verify_access_token(token: str) -> str:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid JWT token")
 
 
+def create_course_capability_token(
+    course_user_id: int, user_id: int, course_id: int, permissions: list[str]
+) -> str:
+    payload = {
+        "sub": str(user_id),
+        "aud": COURSE_CAPABILITY_AUDIENCE,
+        "course_id": course_id,
+        "course_user_id": course_user_id,
+        "permissions": permissions,
+        "exp": datetime.now(timezone.utc) + timedelta(seconds=COURSE_CAPABILITY_EXPIRE_SECONDS),
+    }
+    token = jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
+    return token
+
+
 def is_login_via_email(username_or_email: str) -> bool:
     email_regex = r"^[a-zA-Z0-9_!#$%&’*+/=?`{|}~^.-]+@[a-zA-Z0-9.-]+$"
     if not re.match(email_regex, username_or_email):
@@ -155,3 +155,8 @@ class CourseUserResponseDTO(BaseModel):
             date_created=(course_user.date_created - datetime.timedelta(hours=3)),
             last_updated=(course_user.last_updated - datetime.timedelta(hours=3)),
         )
+
+
+class CourseCapabilityResponseDTO(BaseModel):
+    capability_token: str
+    expires_in: int
@@ -5,6 +5,7 @@ from rpl_users.src.deps.auth import CurrentUserDependency
 from rpl_users.src.deps.database import DBSessionDependency
 from rpl_users.src.deps.email import EmailHandlerDependency
 from rpl_users.src.dtos.course_dtos import (
+    CourseCapabilityResponseDTO,
     CourseCreationRequestDTO,
     CourseUptateRequestDTO,
     CourseUserScoreResponseDTO,
@@ -75,22 +76,29 @@ def update_course_user(
     current_user: CurrentUserDependency,
     email_handler: EmailHandlerDependency,
     db: DBSessionDependency,
+    auth_header: AuthDependency,
 ):
     return CoursesService(db).update_course_user(
-        course_id, user_id, new_course_user_data, current_user, email_handler
+        course_id, user_id, new_course_user_data, current_user, email_handler, auth_header
     )
 
 
 @router.post("/courses/{course_id}/unenroll", status_code=status.HTTP_204_NO_CONTENT)
-def unenroll_course_user(course_id: int, current_user: CurrentUserDependency, db: DBSessionDependency):
-    CoursesService(db).unenroll_course_user(course_id, current_user)
+def unenroll_course_user(
+    course_id: int, current_user: CurrentUserDependency, db: DBSessionDependency, auth_header: AuthDependency
+):
+    CoursesService(db).unenroll_course_user(course_id, current_user, auth_header)
 
 
 @router.delete("/courses/{course_id}/users/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_course_user(
-    course_id: int, user_id: int, current_user: CurrentUserDependency, db: DBSessionDependency
+    course_id: int,
+    user_id: int,
+    current_user: CurrentUserDependency,
+    db: DBSessionDependency,
+    auth_header: AuthDependency,
 ):
-    CoursesService(db).delete_course_user(course_id, user_id, current_user)
+    CoursesService(db).delete_course_user(course_id, user_id, current_user, auth_header)
 
 
 # ====================== QUERYING - COURSE USERS ====================== #
@@ -149,3 +157,10 @@ def course_user_auth_from_activities_api(
     course_id: int, current_user: CurrentUserDependency, db: DBSessionDependency
 ):
     return CoursesService(db).get_course_user_for_ext_service(course_id, current_user)
+
+
+@router.get("/auth/courseCapability", response_model=CourseCapabilityResponseDTO)
+def course_capability_for_activities_api(
+    course_id: int, current_user: CurrentUserDependency, db: DBSessionDependency
+):
+    return CoursesService(db).get_course_capability_for_ext_service(course_id, current_user)
@@ -6,7 +6,9 @@ import httpx
 import uvicorn
 from rpl_users.src.config import env
 from rpl_users.src.deps.email import EmailHandler
+from rpl_users.src.deps.security import create_course_capability_token
 from rpl_users.src.dtos.course_dtos import (
+    CourseCapabilityResponseDTO,
     CourseCreationRequestDTO,
     CourseUptateRequestDTO,
     CourseUserScoreResponseDTO,
@@ -174,6 +176,26 @@ class CoursesService:
         )
         return sorted_score_data_per_user
 
+    def __expire_course_user_auth_in_activities_api(
+        self, course_id: int, user_id: int, auth_header: HTTPAuthorizationCredentials
+    ):
+        # Best effort: the activities API caches course users' auth for a short TTL anyway
+        try:
+            response = self.activities_api_client.delete(
+                url=f"/courses/{course_id}/authCache/users/{user_id}",
+                headers={"Authorization": f"{auth_header.scheme} {auth_header.credentials}"},
+                timeout=httpx.Timeout(5.0),
+            )
+        except httpx.RequestError as e:
+            logging.getLogger("uvicorn.error").warning(
+                f"Failed to expire cached auth of user {user_id} at course {course_id} in activities API: {e}"
+            )
+            return
+        if response.status_code != status.HTTP_204_NO_CONTENT:
+            logging.getLogger("uvicorn.error").info(
+                f"Activities API did not expire cached auth of user {user_id} at course {course_id}: {response.text}"
+            )
+
     # ====================== MANAGING - COURSES ====================== #
 
     def create_course(
@@ -251,6 +273,7 @@ class CoursesService:
         new_course_user_data: CourseUserUptateRequestDTO,
         current_user: User,
         email_handler: EmailHandler,
+        auth_header: HTTPAuthorizationCredentials,
     ) -> CourseUserResponseDTO:
         self.__assert_user_exists(user_id)
         self.__assert_course_exists(course_id)
@@ -262,6 +285,7 @@ class CoursesService:
         self.course_users_repo.update_course_user(
             course_id, user_id, role.id if new_course_user_data.role else None, new_course_user_data.accepted
         )
+        self.__expire_course_user_auth_in_activities_api(course_id, user_id, auth_header)
 
         if new_course_user_data.accepted:
             email_handler.send_course_acceptance_email(
@@ -270,19 +294,40 @@ class CoursesService:
 
         return CourseUserResponseDTO.from_course_user(course_user)
 
-    def unenroll_course_user(self, course_id: int, current_user: User):
+    def get_course_capability_for_ext_service(
+        self, course_id: int, current_user: User
+    ) -> CourseCapabilityResponseDTO:
+        course_user = self.__assert_course_user_exists_and_has_permissions(course_id, current_user.id)
+
+        capability_token = create_course_capability_token(
+            course_user_id=course_user.id,
+            user_id=course_user.user_id,
+            course_id=course_user.course_id,
+            permissions=course_user.get_permissions(),
+        )
+        return CourseCapabilityResponseDTO(
+            capability_token=capability_token, expires_in=env.COURSE_CAPABILITY_EXPIRE_SECONDS
+        )
+
+    def unenroll_course_user(
+        self, course_id: int, current_user: User, auth_header: HTTPAuthorizationCredentials
+    ):
         self.__assert_course_exists(course_id)
         self.__assert_course_user_exists_and_has_permissions(course_id, current_user.id)
 
         self.course_users_repo.delete_course_user(course_id=course_id, user_id=current_user.id)
+        self.__expire_course_user_auth_in_activities_api(course_id, current_user.id, auth_header)
 
-    def delete_course_user(self, course_id: int, user_id: int, current_user: User):
+    def delete_course_user(
+        self, course_id: int, user_id: int, current_user: User, auth_header: HTTPAuthorizationCredentials
+    ):
         self.__assert_user_exists(user_id)
         self.__assert_course_exists(course_id)
         self.__assert_course_user_exists_and_has_permissions(course_id, current_user.id, ["user_manage"])
         self.__assert_course_user_exists_and_has_permissions(course_id, user_id)
 
         self.course_users_repo.delete_course_user(course_id=course_id, user_id=user_id)
+        self.__expire_course_user_auth_in_activities_api(course_id, user_id, auth_header)
 
     # ====================== QUERYING - COURSE USERS ====================== #
 
@@ -1,7 +1,12 @@
 from fastapi.testclient import TestClient
 from fastapi import status
+import httpx
+import jwt
+from pytest_httpx import HTTPXMock
 import sqlalchemy as sa
 
+from rpl_users.src.config import env
+
 from rpl_users.src.repositories.models.course_user import CourseUser
 from rpl_users.src.repositories.models.role import Role
 
@@ -204,6 +209,65 @@ def test_cannot_get_course_user_permissions_using_user_that_has_not_been_enrolle
     assert "Couser user not found or does not have required permissions" in result["detail"]
 
 
+# ====================== COURSE CAPABILITY ====================== #
+
+
+def test_get_course_capability_of_user_with_student_role(
+    users_api_client: TestClient,
+    regular_auth_headers,
+    example_users,
+    base_roles: dict[str, Role],
+    course_with_superadmin_as_admin_user,
+):
+    course_id = course_with_superadmin_as_admin_user["course"].id
+    users_api_client.post(f"/api/v3/courses/{course_id}/enroll", headers=regular_auth_headers)
+
+    response = users_api_client.get(
+        "/api/v3/auth/courseCapability", params={"course_id": course_id}, headers=regular_auth_headers
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+
+    result = response.json()
+    assert result["expires_in"] == env.COURSE_CAPABILITY_EXPIRE_SECONDS
+    claims = jwt.decode(
+        result["capability_token"],
+        env.JWT_SECRET,
+        algorithms=[env.JWT_ALGORITHM],
+        audience="rpl_activities_api",
+    )
+    assert claims["sub"] == str(example_users["regular"].id)
+    assert claims["course_id"] == course_id
+    assert claims["permissions"] == base_roles["student"].get_permissions()
+
+
+def test_course_capability_cannot_be_used_as_access_token(
+    users_api_client: TestClient, admin_auth_headers, course_with_superadmin_as_admin_user
+):
+    course_id = course_with_superadmin_as_admin_user["course"].id
+    capability_token = users_api_client.get(
+        "/api/v3/auth/courseCapability", params={"course_id": course_id}, headers=admin_auth_headers
+    ).json()["capability_token"]
+
+    response = users_api_client.get(
+        "/api/v3/auth/externalUserMainAuth", headers={"Authorization": f"Bearer {capability_token}"}
+    )
+
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+def test_cannot_get_course_capability_using_user_that_has_not_been_enrolled_yet(
+    users_api_client: TestClient, regular_auth_headers, course_with_superadmin_as_admin_user
+):
+    course_id = course_with_superadmin_as_admin_user["course"].id
+
+    response = users_api_client.get(
+        "/api/v3/auth/courseCapability", params={"course_id": course_id}, headers=regular_auth_headers
+    )
+
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
 # ====================== GET COURSE USERS ====================== #
 
 
@@ -549,6 +613,38 @@ def test_update_course_user_using_admin_user(
     assert result["last_updated"] is not None
 
 
+def test_update_course_user_expires_its_cached_auth_in_activities_api(
+    httpx_mock: HTTPXMock,
+    users_api_client: TestClient,
+    example_users,
+    admin_auth_headers,
+    regular_auth_headers,
+    base_roles,
+    course_with_regular_user_as_admin_user,
+):
+    course_id = course_with_regular_user_as_admin_user["course"].id
+
+    response = users_api_client.post(f"/api/v3/courses/{course_id}/enroll", headers=admin_auth_headers)
+
+    httpx_mock.add_response(
+        status_code=status.HTTP_204_NO_CONTENT,
+        method="DELETE",
+        url=httpx.URL(
+            f"{env.ACTIVITIES_API_URL}/api/v3/courses/{course_id}/authCache/users/{example_users["admin"].id}"
+        ),
+        match_headers=regular_auth_headers,
+    )
+
+    response = users_api_client.patch(
+        f"/api/v3/courses/{course_id}/users/{example_users["admin"].id}",
+        json={"accepted": True, "role": base_roles["course_admin"].name},
+        headers=regular_auth_headers,
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert len(httpx_mock.get_requests()) == 1
+
+
 def test_accept_user_should_send_course_acceptance_email(
     users_api_client: TestClient,
     email_handler,